@@ -3,7 +3,27 @@ import pandas as pd
 import plotly.express as px
 import plotly.graph_objects as go
 from datetime import datetime, date
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from collections import deque
+from contextlib import closing
+import codecs
+import csv
+import functools
+import hashlib
+import io
+from itertools import islice
+import json
+import os
+import re
+import sqlite3
+import tempfile
+import threading
+import time
+import unicodedata
+import uuid
+import zipfile
 import numpy as np
+from streamlit.runtime.scriptrunner import add_script_run_ctx, get_script_run_ctx
 from supabase import create_client
 
 # ========================================
@@ -199,8 +219,525 @@ def init_supabase():
 supabase = init_supabase()
 
 
+# =============================================================================
+# テーブル単位のキャッシュ無効化
+# =============================================================================
+
+# キャッシュ関数が参照するテーブル（いずれかのバージョンが上がるとキャッシュを再構築）
+CONTACTS_CACHE_TABLES = ('contacts', 'companies', 'target_companies', 'priority_levels', 'search_assignees')
+MASTER_CACHE_TABLES = ('companies', 'target_companies', 'client_companies', 'projects',
+                       'search_assignees', 'priority_levels', 'approach_methods')
+KPI_CACHE_TABLES = ('projects', 'project_assignments', 'contacts', 'contact_approaches', 'search_assignees')
+EMAIL_SNAPSHOT_TABLES = ('companies', 'target_companies', 'company_email_patterns', 'company_confirmed_emails',
+                         'company_misdelivery_emails')
+EMAIL_CACHE_TABLES = ('contacts',) + EMAIL_SNAPSHOT_TABLES
+
+
+@st.cache_resource
+def _table_version_store():
+    """全セッションで共有するテーブルごとのバージョンカウンタ"""
+    return {'lock': threading.Lock(), 'versions': {}}
+
+
+def get_table_versions(tables):
+    """指定テーブルの現在のバージョンをタプルで返す（キャッシュキーに使用）"""
+    store = _table_version_store()
+    with store['lock']:
+        return tuple(store['versions'].get(table, 0) for table in tables)
+
+
+def invalidate_tables(*tables):
+    """書き込みを行ったテーブルのバージョンを上げ、依存するキャッシュのみを無効化"""
+    store = _table_version_store()
+    with store['lock']:
+        for table in tables:
+            store['versions'][table] = store['versions'].get(table, 0) + 1
+
+
+def cache_by_tables(tables, ttl=300):
+    """参照テーブルのバージョンをキーに含めて st.cache_data でキャッシュするデコレータ
+
+    invalidate_tables() で参照テーブルのいずれかが更新されると、
+    次回呼び出し時にそのキャッシュだけが再取得される。
+    """
+    def decorator(func):
+        def cached(table_versions, *args, **kwargs):
+            return func(*args, **kwargs)
+
+        # 関数ごとに別のキャッシュになるよう元の関数名を引き継ぐ
+        cached.__module__ = func.__module__
+        cached.__qualname__ = func.__qualname__
+        cached = st.cache_data(ttl=ttl)(cached)
+
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            return cached(get_table_versions(tables), *args, **kwargs)
+
+        wrapper.clear = cached.clear
+        return wrapper
+    return decorator
+
+
+# =============================================================================
+# ページ分割読み込み（PostgRESTの最大取得件数対策）
+# =============================================================================
+
+# 1リクエストで取得する行数（PostgRESTのmax-rows以下にする）
+PAGED_READ_SIZE = 1000
+
+# テーブルの主キー（ページ分割時の並び順・差分同期に使用）
+TABLE_PRIMARY_KEYS = {
+    'contacts': 'contact_id',
+    'companies': 'company_id',
+    'target_companies': 'target_company_id',
+    'client_companies': 'client_company_id',
+    'projects': 'project_id',
+    'search_assignees': 'assignee_id',
+    'priority_levels': 'priority_id',
+    'approach_methods': 'method_id',
+    'project_assignments': 'assignment_id',
+    'contact_approaches': 'approach_id',
+}
+
+
+def iter_table_rows(table_name, select_columns='*', order_by=None, filters=None,
+                    page_size=PAGED_READ_SIZE, parallel=False, on_page=None):
+    """テーブルを .range() のウィンドウに分けて取得し、全行を順に返すジェネレータ
+
+    PostgRESTの max-rows が page_size より小さい場合も行が欠けないよう、
+    逐次取得は空のページが返るまで、並列取得は各ウィンドウの行数に達するまで続きを取得する。
+
+    Args:
+        order_by: ページ間で行が重複・欠落しないよう一意な列で並べる（省略時は主キー）
+        filters: クエリを受け取りフィルターを追加して返す関数
+        parallel: Trueの場合は件数を取得してから全ウィンドウを並列に取得
+            （件数取得時点の行数分だけ取得し、空ページの確認リクエストは行わない）
+        on_page: ページを返し終えるたびに (完了ページ数, 総ページ数) で呼ばれる関数
+            （総ページ数は parallel の場合のみ分かる。それ以外は None）
+    """
+    order_by = order_by or TABLE_PRIMARY_KEYS.get(table_name)
+
+    def build_query(columns, **select_options):
+        query = supabase.table(table_name).select(columns, **select_options)
+        if filters:
+            query = filters(query)
+        return query
+
+    def fetch_page(offset, limit=page_size):
+        query = build_query(select_columns)
+        if order_by:
+            query = query.order(order_by)
+        return query.range(offset, offset + limit - 1).execute().data or []
+
+    def fetch_window(offset, size):
+        rows = fetch_page(offset, size)
+        while rows and len(rows) < size:
+            more = fetch_page(offset + len(rows), size - len(rows))
+            if not more:
+                break
+            rows.extend(more)
+        return rows
+
+    # 並び順が決まらないと並列取得したウィンドウ同士で行が重複・欠落するため逐次取得
+    if parallel and order_by:
+        total = build_query(order_by, count='exact').limit(1).execute().count or 0
+        total_pages = -(-total // page_size)
+        offsets = iter(range(0, total, page_size))
+        # 同時に保持するページ数を TABLE_FETCH_MAX_WORKERS 件に抑え、取得順ではなくページ順に返す
+        with ThreadPoolExecutor(max_workers=TABLE_FETCH_MAX_WORKERS, thread_name_prefix='page-fetch') as executor:
+            def submit(offset):
+                return executor.submit(fetch_window, offset, min(page_size, total - offset))
+
+            window = deque(submit(o) for o in islice(offsets, TABLE_FETCH_MAX_WORKERS))
+            pages_done = 0
+            while window:
+                yield from window.popleft().result()
+                pages_done += 1
+                if on_page:
+                    on_page(pages_done, total_pages)
+                next_offset = next(offsets, None)
+                if next_offset is not None:
+                    window.append(submit(next_offset))
+        return
+
+    offset = 0
+    pages_done = 0
+    while True:
+        rows = fetch_page(offset)
+        if not rows:
+            return
+        yield from rows
+        pages_done += 1
+        if on_page:
+            on_page(pages_done, None)
+        offset += len(rows)
+
+
+def read_table_frame(table_name, select_columns='*', order_by=None, filters=None, parallel=False):
+    """iter_table_rows で全行を取得してDataFrameにする"""
+    return pd.DataFrame(list(iter_table_rows(table_name, select_columns, order_by, filters, parallel=parallel)))
+
+
+# =============================================================================
+# updated_at による差分同期
+# =============================================================================
+
+# 差分同期の対象テーブル（updated_at カラムを持つテーブル）
+SYNC_TABLES = ('contacts', 'companies', 'target_companies', 'client_companies', 'projects', 'search_assignees')
+# 前回の最大 updated_at からさかのぼって再取得する秒数
+# （前回取得後にコミットされた、それより前の updated_at を持つ行を取りこぼさないため）
+SYNC_OVERLAP_SECONDS = 300
+# この秒数を過ぎたスナップショットは差分ではなく全件を取り直す（さかのぼり幅より長いトランザクション対策）
+SYNC_FULL_REFRESH_SECONDS = 3600
+
+
+@st.cache_resource
+def _table_snapshot_store():
+    """全セッションで共有するテーブルのスナップショット（取得済み行と最終更新日時）"""
+    return {'lock': threading.Lock(), 'snapshots': {}}
+
+
+def reset_table_snapshots():
+    """スナップショットを破棄し、次回取得時に全件を再取得させる"""
+    store = _table_snapshot_store()
+    with store['lock']:
+        store['snapshots'].clear()
+
+
+def _updated_at_mark(df):
+    """取得済み行の最大 updated_at（DBから返された文字列のまま）を返す"""
+    if df.empty or 'updated_at' not in df.columns:
+        return None
+    parsed = pd.to_datetime(df['updated_at'], errors='coerce', utc=True, format='ISO8601')
+    if parsed.isna().all():
+        return None
+    return df.loc[parsed.idxmax(), 'updated_at']
+
+
+def _sync_since(mark):
+    """差分取得の開始日時（前回の最大 updated_at から SYNC_OVERLAP_SECONDS さかのぼる）"""
+    parsed = pd.to_datetime(mark, errors='coerce', utc=True)
+    if pd.isna(parsed):
+        return mark
+    return (parsed - pd.Timedelta(seconds=SYNC_OVERLAP_SECONDS)).isoformat()
+
+
+def fetch_table_rows(table_name, select_columns='*', sync_key=None):
+    """テーブルの全行をDataFrameで取得
+
+    SYNC_TABLES のテーブルは前回取得分をスナップショットとして保持し、
+    2回目以降は updated_at が前回の最大値の SYNC_OVERLAP_SECONDS 秒前以降の行と主キー一覧のみを取得して
+    主キーで更新・追加・削除をマージする（DATA_SYNC_MODE = "full" で毎回全件取得）。
+    sync_key が変わった場合（埋め込みJOIN先の更新など）と、
+    全件取得から SYNC_FULL_REFRESH_SECONDS 秒が過ぎた場合は全件を取り直す。
+    """
+    primary_key = TABLE_PRIMARY_KEYS.get(table_name)
+    if table_name not in SYNC_TABLES or get_app_setting("DATA_SYNC_MODE", "incremental") != "incremental":
+        return read_table_frame(table_name, select_columns)
+
+    store = _table_snapshot_store()
+    snapshot_key = (table_name, select_columns)
+    with store['lock']:
+        snapshot = store['snapshots'].get(snapshot_key)
+
+    if (snapshot is None or snapshot['sync_key'] != sync_key or snapshot['mark'] is None
+            or time.monotonic() - snapshot['full_at'] > SYNC_FULL_REFRESH_SECONDS):
+        df = read_table_frame(table_name, select_columns)
+        full_at = time.monotonic()
+    else:
+        df = snapshot['rows']
+        full_at = snapshot['full_at']
+        since = _sync_since(snapshot['mark'])
+        changed = list(iter_table_rows(table_name, select_columns, filters=lambda q: q.gte('updated_at', since)))
+        live_ids = [row[primary_key] for row in iter_table_rows(table_name, primary_key)]
+
+        # 削除された行を除外し、更新・追加された行で置き換える
+        df = df[df[primary_key].isin(live_ids)]
+        if changed:
+            changed_df = pd.DataFrame(changed)
+            df = df[~df[primary_key].isin(changed_df[primary_key])]
+            df = pd.concat([df, changed_df], ignore_index=True)
+        df = df.sort_values(primary_key, ignore_index=True)
+
+    with store['lock']:
+        store['snapshots'][snapshot_key] = {
+            'rows': df, 'mark': _updated_at_mark(df), 'sync_key': sync_key, 'full_at': full_at
+        }
+    return df.copy()
+
+
+# =============================================================================
+# テーブルの並列取得
+# =============================================================================
+
+# 同時に実行するクエリ数の上限
+TABLE_FETCH_MAX_WORKERS = 4
+# 1クエリあたりの待ち時間の上限（秒）。超えたテーブルは空のDataFrameとして扱う
+TABLE_FETCH_TIMEOUT_SECONDS = 30
+
+
+def fetch_tables_concurrently(loaders, max_workers=TABLE_FETCH_MAX_WORKERS, timeout=TABLE_FETCH_TIMEOUT_SECONDS):
+    """独立したテーブル取得をスレッドプールで並列実行
+
+    Args:
+        loaders: {名前: DataFrameを返す関数}
+
+    Returns:
+        ({名前: DataFrame}, {名前: 失敗理由}) 失敗・タイムアウトしたテーブルは空のDataFrame
+    """
+    results = {}
+    failures = {}
+    started_at = {}
+    ctx = get_script_run_ctx()
+
+    def run(name, loader):
+        started_at[name] = time.monotonic()
+        return loader()
+
+    executor = ThreadPoolExecutor(
+        max_workers=max(1, min(max_workers, len(loaders))),
+        thread_name_prefix='table-fetch',
+        initializer=lambda: add_script_run_ctx(threading.current_thread(), ctx)
+    )
+    futures = {executor.submit(run, name, loader): name for name, loader in loaders.items()}
+    pending = set(futures)
+    try:
+        while pending:
+            done, pending = wait(pending, timeout=0.1, return_when=FIRST_COMPLETED)
+            for future in done:
+                name = futures[future]
+                try:
+                    results[name] = future.result()
+                except Exception as e:
+                    results[name] = pd.DataFrame()
+                    failures[name] = str(e)
+
+            # 実行開始から timeout を超えたクエリは待たずに空扱い
+            now = time.monotonic()
+            for future in list(pending):
+                name = futures[future]
+                if name in started_at and now - started_at[name] > timeout:
+                    pending.discard(future)
+                    results[name] = pd.DataFrame()
+                    failures[name] = f"{timeout}秒以内に応答がありませんでした"
+    finally:
+        executor.shutdown(wait=False, cancel_futures=True)
+
+    return results, failures
+
+
+# contacts取得時の埋め込みJOIN
+# company_idが存在する場合は優先、なければtarget_company_idを使用（後方互換性）
+CONTACTS_SELECT = (
+    '*, ' +
+    'companies!contacts_company_id_fkey(company_id, company_name), ' +
+    'target_companies!contacts_target_company_id_fkey(target_company_id, company_name), ' +
+    'priority_levels!project_contacts_priority_id_fkey(priority_name, priority_value), ' +
+    'search_assignees!project_contacts_search_assignee_id_fkey(assignee_name)'
+)
+
+
+# =============================================================================
+# 年齢の正規化
+# =============================================================================
+
+# 推定年齢の表記パターン（NFKC正規化後に判定）
+AGE_RANGE_PATTERN = re.compile(r'^\s*(\d{1,3})\s*(?:歳|才)?\s*[-~〜ー]\s*(\d{1,3})\s*(?:歳|才)?')
+AGE_DECADE_PATTERN = re.compile(r'^\s*(\d{1,3})\s*代\s*(前半|後半)?')
+AGE_SINGLE_PATTERN = re.compile(r'^\s*(\d{1,3})\s*(?:歳|才|$)')
+
+
+@functools.lru_cache(maxsize=4096)
+def parse_age_bounds(text):
+    """推定年齢の表記を (下限, 上限) に変換（"30代" → (30, 39)、"35歳" → (35, 35)、"30-35" → (30, 35)）
+
+    解析できない場合は None
+    """
+    if not text:
+        return None
+    value = unicodedata.normalize('NFKC', str(text))
+
+    match = AGE_RANGE_PATTERN.match(value)
+    if match:
+        low, high = sorted((int(match.group(1)), int(match.group(2))))
+        return low, high
+
+    match = AGE_DECADE_PATTERN.match(value)
+    if match:
+        decade = int(match.group(1))
+        if match.group(2) == '前半':
+            return decade, decade + 4
+        if match.group(2) == '後半':
+            return decade + 5, decade + 9
+        return decade, decade + 9
+
+    match = AGE_SINGLE_PATTERN.match(value)
+    if match:
+        age = int(match.group(1))
+        return age, age
+    return None
+
+
+def age_bounds_midpoint(low, high):
+    """年齢の下限・上限から代表値を求める（"30代" → 35）"""
+    return (low + high + 1) // 2
+
+
+def _age_from_birth_dates(birth_dates, today):
+    """生年月日（datetime64のSeries）から満年齢を計算"""
+    had_birthday = (birth_dates.dt.month < today.month) | (
+        (birth_dates.dt.month == today.month) & (birth_dates.dt.day <= today.day)
+    )
+    return today.year - birth_dates.dt.year - (~had_birthday).astype(int)
+
+
+def add_age_bounds(df, today=None):
+    """age_min / age_max / age_parse_error カラムを追加
+
+    優先順位は 生年月日 → actual_age → estimated_age。
+    DBの生成カラム（contacts_age_bounds.sql）で age_min / age_max が取得済みの場合は
+    推定年齢の文字列解析を行わず、生年月日による補正のみ行う。
+    推定年齢の解析は表記ごとに一度だけ行う（parse_age_bounds のキャッシュ）。
+    """
+    today = today or date.today()
+    if df.empty:
+        return df.assign(age_min=pd.Series(dtype='Int64'), age_max=pd.Series(dtype='Int64'),
+                         age_parse_error=pd.Series(dtype=bool))
+
+    estimated = df['estimated_age'] if 'estimated_age' in df.columns else pd.Series(None, index=df.index, dtype=object)
+    if 'age_min' in df.columns and 'age_max' in df.columns:
+        age_min = pd.to_numeric(df['age_min'], errors='coerce')
+        age_max = pd.to_numeric(df['age_max'], errors='coerce')
+    else:
+        bounds = {value: parse_age_bounds(value) for value in estimated.dropna().unique()}
+        age_min = estimated.map({value: b[0] for value, b in bounds.items() if b}).astype(float)
+        age_max = estimated.map({value: b[1] for value, b in bounds.items() if b}).astype(float)
+        actual = pd.to_numeric(df['actual_age'], errors='coerce') if 'actual_age' in df.columns else age_min * np.nan
+        age_min = actual.fillna(age_min)
+        age_max = actual.fillna(age_max)
+
+    if 'birth_date' in df.columns:
+        birth_age = _age_from_birth_dates(pd.to_datetime(df['birth_date'], errors='coerce'), today)
+        age_min = birth_age.fillna(age_min)
+        age_max = birth_age.fillna(age_max)
+
+    has_estimate = estimated.notna() & (estimated.astype('string').str.strip() != '')
+    return df.assign(
+        age_min=age_min.round().astype('Int64'),
+        age_max=age_max.round().astype('Int64'),
+        age_parse_error=(has_estimate & age_min.isna()).fillna(False).astype(bool)
+    )
+
+
+def unparseable_age_contacts(df):
+    """推定年齢を解析できなかったコンタクトを返す"""
+    if 'age_parse_error' not in df.columns:
+        df = add_age_bounds(df)
+    columns = [col for col in ['contact_id', 'full_name', 'company_name', 'estimated_age'] if col in df.columns]
+    return df.loc[df['age_parse_error'], columns]
+
+
+# 繰り返しの多い文字列カラム（category型にしてメモリを削減）
+CONTACT_CATEGORY_COLUMNS = ['company', 'company_name', 'priority_name', 'search_assignee']
+
+
+def _master_lookup(masters, table, key_col, value_col):
+    """マスタDataFrameから {ID: 値} のSeriesを作成（map用）"""
+    master_df = masters.get(table, pd.DataFrame())
+    if master_df.empty or key_col not in master_df.columns or value_col not in master_df.columns:
+        return pd.Series(dtype=object)
+    return master_df.drop_duplicates(key_col).set_index(key_col)[value_col]
+
+
+def _map_foreign_key(df, fk_col, masters, table, key_col, value_col):
+    """外部キー列をマスタの値に変換（ベクトル化）"""
+    if fk_col not in df.columns:
+        return pd.Series(None, index=df.index, dtype=object)
+    return df[fk_col].map(_master_lookup(masters, table, key_col, value_col))
+
+
+def _embedded_value(df, embed_col, key):
+    """埋め込みJOIN（dict列）から値を取り出す（ベクトル化）"""
+    if embed_col not in df.columns:
+        return pd.Series(None, index=df.index, dtype=object)
+    return df[embed_col].str.get(key)
+
+
+def normalize_contacts_frame(df, masters=None):
+    """contactsの取得結果を表示用に整形（企業・優先度・担当者の展開・カラム名の調整）
+
+    masters を渡した場合は外部キーをマスタDataFrameにmapして展開し、
+    省略した場合は CONTACTS_SELECT の埋め込みJOIN列から展開する。
+    """
+    column_mapping = {
+        # Keep full_name as-is for consistency with display logic
+        # 'full_name': 'name',  # Commented out - keep original column name
+        'last_name': 'last_name',
+        'first_name': 'first_name',
+        # 'company_name': 'company',  # target_companies関連で処理
+        'department_name': 'department',
+        'position_name': 'position'
+    }
+    
+    # 存在するカラムのみマッピング
+    df = df.rename(columns={old: new for old, new in column_mapping.items() if old in df.columns})
+    
+    if masters is not None:
+        company = _map_foreign_key(df, 'company_id', masters, 'companies', 'company_id', 'company_name')
+        target_company = _map_foreign_key(df, 'target_company_id', masters, 'target_companies', 'target_company_id', 'company_name')
+        priority_name = _map_foreign_key(df, 'priority_id', masters, 'priority_levels', 'priority_id', 'priority_name')
+        priority_value = _map_foreign_key(df, 'priority_id', masters, 'priority_levels', 'priority_id', 'priority_value')
+        search_assignee = _map_foreign_key(df, 'search_assignee_id', masters, 'search_assignees', 'assignee_id', 'assignee_name')
+    else:
+        company = _embedded_value(df, 'companies', 'company_name')
+        target_company = _embedded_value(df, 'target_companies', 'company_name')
+        priority_name = _embedded_value(df, 'priority_levels', 'priority_name')
+        priority_value = _embedded_value(df, 'priority_levels', 'priority_value')
+        search_assignee = _embedded_value(df, 'search_assignees', 'assignee_name')
+    
+    # 企業名の処理（新構造対応）
+    # company_idがある場合はcompaniesテーブルから、なければtarget_companiesから取得
+    df['company'] = company.fillna(target_company).fillna('Unknown')
+    df['company_name'] = df['company']
+    
+    # priority_levels関連データの処理
+    df['priority_name'] = priority_name
+    df['priority_value'] = priority_value
+    
+    # search_assignees関連データの処理
+    df['search_assignee'] = search_assignee
+    
+    for col in CONTACT_CATEGORY_COLUMNS:
+        df[col] = df[col].astype('category')
+    
+    # 年齢の下限・上限（推定年齢の解析はここで一度だけ行う）
+    df = add_age_bounds(df)
+    
+    # 全項目検索用の生成カラムは表示しない
+    if 'search_text' in df.columns:
+        df = df.drop(columns=['search_text'])
+    
+    # contactsテーブルの物理カラムのみを使用
+    # 追加の計算カラムやダミーデータは生成しない
+    
+    return df
+
+
 # データ取得関数
-@st.cache_data(ttl=300)
+@cache_by_tables(CONTACTS_CACHE_TABLES)
+def load_contacts_frame():
+    """実データのコンタクトを表示用に正規化して取得
+
+    サンプルデータには切り替えず、取得エラーは例外として呼び出し元に伝える。
+    外部キーのみを取得し、企業・優先度・担当者はキャッシュ済みマスタから展開する。
+    """
+    df = fetch_table_rows('contacts')
+    if df.empty:
+        return df
+    return normalize_contacts_frame(df, fetch_master_data(strict=True))
+
+
+@cache_by_tables(CONTACTS_CACHE_TABLES)
 def fetch_contacts():
     """プロジェクトコンタクトデータを取得"""
     if supabase is None:
@@ -210,61 +747,9 @@ def fetch_contacts():
     try:
         # 新しいDB構造に対応：companiesテーブルを参照
         # company_idが存在する場合は優先、なければtarget_company_idを使用（後方互換性）
-        response = supabase.table('contacts').select(
-            '*, ' + 
-            'companies!contacts_company_id_fkey(company_id, company_name), ' + 
-            'target_companies!contacts_target_company_id_fkey(target_company_id, company_name), ' + 
-            'priority_levels!project_contacts_priority_id_fkey(priority_name, priority_value), ' + 
-            'search_assignees!project_contacts_search_assignee_id_fkey(assignee_name)'
-        ).execute()
-        if response.data:
-            df = pd.DataFrame(response.data)
-            # HR Dashboardに合わせてカラム名を調整
-            if not df.empty:
-                column_mapping = {
-                    # Keep full_name as-is for consistency with display logic
-                    # 'full_name': 'name',  # Commented out - keep original column name
-                    'last_name': 'last_name',
-                    'first_name': 'first_name',
-                    # 'company_name': 'company',  # target_companies関連で処理
-                    'department_name': 'department',
-                    'position_name': 'position'
-                }
-                
-                # 存在するカラムのみマッピング
-                for old_col, new_col in column_mapping.items():
-                    if old_col in df.columns:
-                        df = df.rename(columns={old_col: new_col})
-                
-                # 企業名の処理（新構造対応）
-                # company_idがある場合はcompaniesテーブルから、なければtarget_companiesから取得
-                if 'companies' in df.columns:
-                    df['company'] = df.apply(
-                        lambda x: x['companies']['company_name'] if x.get('companies') else
-                                 (x['target_companies']['company_name'] if x.get('target_companies') else 'Unknown'),
-                        axis=1
-                    )
-                    df['company_name'] = df['company']
-                elif 'target_companies' in df.columns:
-                    # 後方互換性：旧データ用
-                    df['company'] = df['target_companies'].apply(lambda x: x['company_name'] if x else 'Unknown')
-                    df['company_name'] = df['company']
-                
-                # priority_levels関連データの処理
-                if 'priority_levels' in df.columns:
-                    df['priority_name'] = df['priority_levels'].apply(lambda x: x['priority_name'] if x else None)
-                    df['priority_value'] = df['priority_levels'].apply(lambda x: x['priority_value'] if x else None)
-                
-                # search_assignees関連データの処理
-                if 'search_assignees' in df.columns:
-                    df['search_assignee'] = df['search_assignees'].apply(lambda x: x['assignee_name'] if x else None)
-                
-                # contactsテーブルの物理カラムのみを使用
-                # 追加の計算カラムやダミーデータは生成しない
-                
-                return df
-            else:
-                return generate_sample_data()
+        df = load_contacts_frame()
+        if not df.empty:
+            return df
         else:
             # データが空の場合はサンプルデータを使用
             return generate_sample_data()
@@ -526,6 +1011,7 @@ def insert_contact(contact_data):
     if supabase is None:
         return None
     response = supabase.table('contacts').insert(contact_data).execute()
+    invalidate_tables('contacts')
     return response
 
 
@@ -534,6 +1020,7 @@ def update_contact(contact_id, update_data):
     if supabase is None:
         return None
     response = supabase.table('contacts').update(update_data).eq('contact_id', contact_id).execute()
+    invalidate_tables('contacts')
     return response
 
 
@@ -542,37 +1029,61 @@ def delete_contact(contact_id):
     if supabase is None:
         return None
     response = supabase.table('contacts').delete().eq('contact_id', contact_id).execute()
+    invalidate_tables('contacts')
     return response
 
 
-@st.cache_data(ttl=300)
-def fetch_master_data():
-    """マスターデータを取得"""
-    if supabase is None:
-        return {}
-    
-    masters = {}
+class MasterDataFetchError(Exception):
+    """マスターテーブルの一部を取得できなかった（取得できたテーブルと失敗理由を保持）"""
+
+    def __init__(self, masters, failures):
+        super().__init__("マスターデータ取得エラー: " + ", ".join(f"{name}: {reason}" for name, reason in failures.items()))
+        self.masters = masters
+        self.failures = failures
+
+
+@cache_by_tables(MASTER_CACHE_TABLES)
+def _fetch_master_tables():
+    """マスターテーブルを並列取得（1つでも失敗した場合は例外にして、欠けた結果をキャッシュしない）"""
     # 統一企業マスタを含む全テーブル
     tables = ['companies', 'target_companies', 'client_companies', 'projects', 'search_assignees', 'priority_levels', 'approach_methods']
-    
-    for table in tables:
-        try:
-            response = supabase.table(table).select('*').execute()
-            masters[table] = pd.DataFrame(response.data) if response.data else pd.DataFrame()
-        except Exception as e:
-            masters[table] = pd.DataFrame()
+    masters, failures = fetch_tables_concurrently(
+        {table: (lambda table=table: fetch_table_rows(table)) for table in tables}
+    )
     
     # キー名の統一（コンタクト管理機能との互換性のため）
     masters['priorities'] = masters.get('priority_levels', pd.DataFrame())
     
+    if failures:
+        raise MasterDataFetchError(masters, failures)
     return masters
 
 
+def fetch_master_data(strict=False):
+    """マスターデータを取得
+
+    一部のテーブルを取得できなかった場合は警告を表示し、失敗したテーブルを空のDataFrameとして
+    キャッシュせずに返す。strict=True の場合は MasterDataFetchError を送出する
+    （マスタから展開した結果をキャッシュする関数で、欠けたマスタによる結果をキャッシュしないため）。
+    """
+    if supabase is None:
+        return {}
+
+    try:
+        return _fetch_master_tables()
+    except MasterDataFetchError as e:
+        if strict:
+            raise
+        UIComponents.show_warning(f"{e} - 企業名・優先度・担当者などが表示されない場合があります")
+        return e.masters
+
+
 def insert_master_data(table_name, data):
     """マスターデータを挿入"""
     if supabase is None:
         return None
     response = supabase.table(table_name).insert(data).execute()
+    invalidate_tables(table_name)
     return response
 
 
@@ -709,6 +1220,7 @@ def main():
     # データ更新ボタン
     if st.sidebar.button("🔄 データ更新", width="stretch"):
         st.cache_data.clear()
+        reset_table_snapshots()
         st.sidebar.success("データを更新しました")
         st.rerun()
     
@@ -741,55 +1253,57 @@ def main():
 
 
 # 人材紹介会社向けKPIデータ取得関数群
-@st.cache_data(ttl=300)
+@cache_by_tables(KPI_CACHE_TABLES)
 def fetch_recruitment_kpis():
     """人材紹介会社のKPIデータを取得"""
     if supabase is None:
         # サンプルデータを返す
         return generate_sample_recruitment_kpis()
     
-    try:
-        # 案件データ取得（シンプルなクエリでエラーを減らす）
-        projects_response = supabase.table('projects').select(
-            'project_id, project_name, project_status, required_headcount, created_at, target_company_id, client_company_id'
-        ).execute()
+    def select_frame(table, columns):
+        return read_table_frame(table, columns)
 
+    # 5つのテーブルを並列取得（失敗したテーブルは空のDataFrame）
+    frames, failures = fetch_tables_concurrently({
+        # 案件データ取得（シンプルなクエリでエラーを減らす）
+        'projects': lambda: select_frame(
+            'projects',
+            'project_id, project_name, project_status, required_headcount, created_at, target_company_id, client_company_id, co_manager, re_manager'
+        ),
         # 別途必要なリレーションデータを取得
-        assignments_response = supabase.table('project_assignments').select(
+        'assignments': lambda: select_frame(
+            'project_assignments',
             'assignment_id, assignment_status, contact_id, project_id'
-        ).execute()
-        
+        ),
         # コンタクトデータ取得
-        contacts_response = supabase.table('contacts').select(
+        'contacts': lambda: select_frame(
+            'contacts',
             '*, target_companies!contacts_target_company_id_fkey(company_name), project_assignments(project_id, assignment_status)'
-        ).execute()
-        
+        ),
         # アプローチデータ取得
-        approaches_response = supabase.table('contact_approaches').select(
+        'approaches': lambda: select_frame(
+            'contact_approaches',
             '*, approach_methods(method_name), contacts(full_name)'
-        ).execute()
-        
+        ),
         # 担当者データ取得
-        assignees_response = supabase.table('search_assignees').select('*').execute()
-        
-        # データフレーム作成とカラム名の正規化
-        projects_df = pd.DataFrame(projects_response.data) if projects_response.data else pd.DataFrame()
-        if not projects_df.empty and 'project_status' in projects_df.columns:
-            projects_df = projects_df.rename(columns={'project_status': 'status'})
-
-        return {
-            'projects': projects_df,
-            'contacts': pd.DataFrame(contacts_response.data) if contacts_response.data else pd.DataFrame(),
-            'approaches': pd.DataFrame(approaches_response.data) if approaches_response.data else pd.DataFrame(),
-            'assignees': pd.DataFrame(assignees_response.data) if assignees_response.data else pd.DataFrame(),
-            'assignments': pd.DataFrame(assignments_response.data) if assignments_response.data else pd.DataFrame()
-        }
-    except Exception as e:
-        error_msg = f"KPIデータ取得エラー: {str(e)}"
-        if "Server disconnected" in str(e):
+        'assignees': lambda: select_frame('search_assignees', '*'),
+    })
+
+    if failures:
+        error_msg = "KPIデータ取得エラー: " + ", ".join(f"{name}: {reason}" for name, reason in failures.items())
+        if any("Server disconnected" in reason for reason in failures.values()):
             error_msg += " - データベース接続が切断されました。少し待ってから再試行してください。"
-        UIComponents.show_warning(f"{error_msg} - サンプルデータを使用します")
-        return generate_sample_recruitment_kpis()
+        if len(failures) == len(frames):
+            UIComponents.show_warning(f"{error_msg} - サンプルデータを使用します")
+            return generate_sample_recruitment_kpis()
+        UIComponents.show_warning(error_msg)
+
+    # カラム名の正規化
+    projects_df = frames['projects']
+    if not projects_df.empty and 'project_status' in projects_df.columns:
+        frames['projects'] = projects_df.rename(columns={'project_status': 'status'})
+
+    return frames
 
 
 def generate_sample_recruitment_kpis():
@@ -935,23 +1449,174 @@ def generate_sample_recruitment_kpis():
     }
 
 
+# =============================================================================
+# ダッシュボードKPI集計
+# =============================================================================
+
+# 集計済みKPI（マテリアライズドビュー）の最大経過時間（秒）。超えていればRPC呼び出し時に再集計
+KPI_REFRESH_SECONDS = 300
+# 成約を表すアサインステータス
+CONTRACT_STATUS = '成約'
+
+
+def _count_dict(series):
+    """value_counts の結果を {値: 件数} に変換"""
+    return {str(key): int(count) for key, count in series.value_counts().items()}
+
+
+def _explode_records(df, list_col, parent_cols=()):
+    """リスト（dictの配列）を持つ列を1件1行に展開し、dictのキーを列にする"""
+    if df.empty or list_col not in df.columns:
+        return pd.DataFrame()
+    exploded = df[[*parent_cols, list_col]].explode(list_col, ignore_index=True)
+    exploded = exploded[exploded[list_col].map(lambda record: isinstance(record, dict))]
+    if exploded.empty:
+        return pd.DataFrame()
+    records = pd.json_normalize(exploded[list_col].tolist())
+    # 親の列はレコード側に同名の列がない場合のみ補う
+    parents = exploded[[col for col in parent_cols if col not in records.columns]].reset_index(drop=True)
+    return pd.concat([parents, records], axis=1)
+
+
+def flatten_kpi_data(kpi_data):
+    """KPIデータの入れ子構造（アサインのリスト・埋め込みJOIN）を一度だけ平坦化
+
+    fetch_recruitment_kpis（DB）と generate_sample_recruitment_kpis（サンプル）の
+    どちらのデータも同じ形の projects / contacts / assignments / approaches に揃える。
+
+    Returns:
+        assignments: project_id, contact_id, assignment_status を持つ1アサイン1行のDataFrame
+        approaches: contact_id, approach_date, method_name を持つ1アプローチ1行のDataFrame
+    """
+    projects_df = kpi_data.get('projects', pd.DataFrame())
+    contacts_df = kpi_data.get('contacts', pd.DataFrame())
+    approaches_df = kpi_data.get('approaches', pd.DataFrame())
+
+    # アサイン（DBは project_assignments テーブル、サンプルは案件・候補者ごとのリスト）
+    assignments = kpi_data.get('assignments', pd.DataFrame())
+    if assignments.empty:
+        assignments = _explode_records(projects_df, 'project_assignments', ['project_id'])
+    if assignments.empty:
+        assignments = _explode_records(contacts_df, 'project_assignments', ['contact_id'])
+    for col in ['project_id', 'contact_id', 'assignment_status']:
+        if col not in assignments.columns:
+            assignments[col] = pd.Series(dtype=object)
+
+    # アプローチ（埋め込みJOINの approach_methods(method_name) を列に展開）
+    approaches = approaches_df.copy()
+    if not approaches.empty:
+        if 'approach_methods' in approaches.columns:
+            methods = pd.json_normalize(
+                approaches['approach_methods'].map(lambda m: m if isinstance(m, dict) else {}).tolist()
+            )
+            method_names = methods['method_name'] if 'method_name' in methods.columns else pd.Series(None, index=methods.index)
+            approaches['method_name'] = method_names.fillna('未設定').to_numpy()
+        if 'approach_date' in approaches.columns:
+            approaches['approach_date'] = pd.to_datetime(approaches['approach_date'], errors='coerce')
+
+    return {
+        'projects': projects_df,
+        'contacts': contacts_df,
+        'assignments': assignments,
+        'approaches': approaches
+    }
+
+
+def compute_dashboard_kpis(kpi_data):
+    """fetch_recruitment_kpis / generate_sample_recruitment_kpis のデータからダッシュボードKPIを集計
+
+    get_dashboard_kpis RPC（dashboard_kpis.sql）と同じ形式の集計結果を返す。
+    """
+    flat = flatten_kpi_data(kpi_data)
+    projects_df = flat['projects']
+    contacts_df = flat['contacts']
+    assignments_df = flat['assignments']
+    approaches_df = flat['approaches']
+    is_contract = assignments_df['assignment_status'] == CONTRACT_STATUS
+
+    # 案件別候補者数（TOP10）
+    project_candidates = []
+    if 'project_id' in projects_df.columns and 'project_name' in projects_df.columns:
+        candidate_counts = assignments_df['project_id'].value_counts()
+        per_project = projects_df[['project_id', 'project_name']].assign(
+            candidates=projects_df['project_id'].map(candidate_counts).fillna(0).astype(int)
+        )
+        project_candidates = per_project.sort_values('candidates', ascending=False, kind='stable').head(10)[
+            ['project_name', 'candidates']
+        ].to_dict('records')
+
+    # 候補者ごとのアサイン状況（1件以上アサイン → アクティブ、成約を含む → 成約済み）
+    contact_ids = contacts_df['contact_id'] if 'contact_id' in contacts_df.columns else pd.Series(dtype=object)
+    has_contract = is_contract.groupby(assignments_df['contact_id']).any()
+    active_candidates = int(contact_ids.isin(has_contract.index).sum())
+    contracted_candidates = int(contact_ids.isin(has_contract.index[has_contract.to_numpy(dtype=bool)]).sum())
+
+    # アプローチ
+    method_counts = _count_dict(approaches_df['method_name']) if 'method_name' in approaches_df.columns else {}
+    monthly_approaches = {}
+    if 'approach_date' in approaches_df.columns:
+        monthly = approaches_df['approach_date'].dt.to_period('M').value_counts().sort_index()
+        monthly_approaches = {str(period): int(count) for period, count in monthly.items()}
+
+    # 担当者別成約実績（CLOSED案件）
+    closed_projects = projects_df[projects_df['status'] == 'CLOSED'] if 'status' in projects_df.columns else projects_df.iloc[0:0]
+
+    return {
+        'source': 'pandas',
+        'project_count': len(projects_df),
+        'status_counts': _count_dict(projects_df['status']) if 'status' in projects_df.columns else {},
+        'total_candidates': len(assignments_df),
+        'total_contracts': int(is_contract.sum()),
+        'project_candidates': project_candidates,
+        'contact_count': len(contacts_df),
+        'screening_counts': _count_dict(contacts_df['screening_status']) if 'screening_status' in contacts_df.columns else {},
+        'active_candidates': active_candidates,
+        'contracted_candidates': contracted_candidates,
+        'approach_count': len(approaches_df),
+        'approached_contacts': int(approaches_df['contact_id'].nunique()) if 'contact_id' in approaches_df.columns else 0,
+        'method_counts': method_counts,
+        'monthly_approaches': monthly_approaches,
+        'co_performance': _count_dict(closed_projects['co_manager']) if 'co_manager' in closed_projects.columns else {},
+        're_performance': _count_dict(closed_projects['re_manager']) if 're_manager' in closed_projects.columns else {},
+    }
+
+
+@cache_by_tables(KPI_CACHE_TABLES)
+def fetch_dashboard_kpis():
+    """ダッシュボードKPIの集計結果を取得
+
+    get_dashboard_kpis RPC（dashboard_kpis.sql）で集計済みの値のみを取得する。
+    RPCが未作成・エラーの場合は全テーブルを取得してpandasで集計する。
+    """
+    if supabase is None:
+        return compute_dashboard_kpis(generate_sample_recruitment_kpis())
+
+    try:
+        kpis = supabase.rpc('get_dashboard_kpis', {
+            'p_max_age_seconds': int(get_app_setting("KPI_REFRESH_SECONDS", KPI_REFRESH_SECONDS))
+        }).execute().data
+        if kpis:
+            return {**kpis, 'source': 'server'}
+    except Exception:
+        pass
+
+    return compute_dashboard_kpis(fetch_recruitment_kpis())
+
+
 def show_dashboard(use_sample_data=False):
     st.subheader("📊 人材紹介ダッシュボード")
     
-    # KPIデータ取得
+    # KPI集計データ取得
     if use_sample_data:
-        kpi_data = generate_sample_recruitment_kpis()
+        kpis = compute_dashboard_kpis(generate_sample_recruitment_kpis())
     else:
-        kpi_data = fetch_recruitment_kpis()
-    projects_df = kpi_data['projects']
-    contacts_df = kpi_data['contacts']
-    approaches_df = kpi_data['approaches']
+        kpis = fetch_dashboard_kpis()
     
     # データソース表示
     if use_sample_data:
-        UIComponents.show_info(f"🎯 サンプルデータを表示中（案件{len(projects_df)}件、候補者{len(contacts_df)}人）")
-    elif not projects_df.empty and 'project_name' in projects_df.columns:
-        UIComponents.show_success(f"データベース接続中（案件{len(projects_df)}件、候補者{len(contacts_df)}人）")
+        UIComponents.show_info(f"🎯 サンプルデータを表示中（案件{kpis['project_count']}件、候補者{kpis['contact_count']}人）")
+    elif kpis['project_count'] > 0:
+        UIComponents.show_success(f"データベース接続中（案件{kpis['project_count']}件、候補者{kpis['contact_count']}人）")
     else:
         UIComponents.show_warning("データが見つかりません。サンプルデータを使用するには左側のチェックボックスを有効にしてください")
     
@@ -961,29 +1626,18 @@ def show_dashboard(use_sample_data=False):
     # デバッグ情報を表示
     if st.sidebar.checkbox("🐛 デバッグ情報を表示"):
         st.write("**デバッグ情報:**")
-        st.write(f"projects_df empty: {projects_df.empty}")
-        if not projects_df.empty:
-            st.write(f"projects_df shape: {projects_df.shape}")
-            st.write(f"projects_df columns: {list(projects_df.columns)}")
-            st.write("**サンプルデータ:**")
-            st.write(projects_df.head(3))
+        st.write(f"集計方法: {'サーバー集計（get_dashboard_kpis）' if kpis['source'] == 'server' else 'pandas集計'}")
+        if kpis.get('refreshed_at'):
+            st.write(f"集計日時: {kpis['refreshed_at']}")
+        st.write(kpis)
     
-    if not projects_df.empty:
+    if kpis['project_count'] > 0:
         # 案件ステータス集計
-        if 'status' in projects_df.columns:
-            status_counts = projects_df['status'].value_counts()
-        else:
-            status_counts = pd.Series()
+        status_counts = pd.Series(kpis['status_counts'], dtype=int)
         
-        # 候補者総数・成約数計算
-        total_candidates = 0
-        total_contracts = 0
-        
-        if 'project_assignments' in projects_df.columns:
-            for assignments in projects_df['project_assignments']:
-                if isinstance(assignments, list):
-                    total_candidates += len(assignments)
-                    total_contracts += len([a for a in assignments if isinstance(a, dict) and a.get('assignment_status') == '成約'])
+        # 候補者総数・成約数
+        total_candidates = kpis['total_candidates']
+        total_contracts = kpis['total_contracts']
         
         # 成約率計算
         contract_rate = (total_contracts / total_candidates * 100) if total_candidates > 0 else 0
@@ -1020,20 +1674,11 @@ def show_dashboard(use_sample_data=False):
         
         with col2:
             st.subheader("案件別候補者数")
-            # 案件別候補者数集計
-            project_candidates = []
-            for _, row in projects_df.iterrows():
-                assignments = row['project_assignments'] if isinstance(row['project_assignments'], list) else []
-                candidate_count = len(assignments)
-                project_candidates.append({
-                    'project_name': row['project_name'],
-                    'candidates': candidate_count
-                })
-            
-            if project_candidates:
-                candidates_df = pd.DataFrame(project_candidates)
+            # 案件別候補者数（集計済みTOP10）
+            if kpis['project_candidates']:
+                candidates_df = pd.DataFrame(kpis['project_candidates'])
                 fig_bar = px.bar(
-                    candidates_df.head(10),
+                    candidates_df,
                     x='project_name',
                     y='candidates',
                     title="案件別候補者数（TOP10）"
@@ -1048,29 +1693,20 @@ def show_dashboard(use_sample_data=False):
     # 👥 人材・候補者KPIセクション
     st.markdown("### 👥 人材・候補者KPI")
     
-    if not contacts_df.empty:
+    contact_count = kpis['contact_count']
+    if contact_count > 0:
         # スクリーニング状況集計
-        if 'screening_status' in contacts_df.columns:
-            screening_counts = contacts_df['screening_status'].value_counts()
-        else:
-            screening_counts = pd.Series()
+        screening_counts = pd.Series(kpis['screening_counts'], dtype=int)
         
         # アサイン状況集計
-        active_candidates = 0
-        contracted_candidates = 0
-        
-        if 'project_assignments' in contacts_df.columns:
-            for assignments in contacts_df['project_assignments']:
-                if isinstance(assignments, list) and len(assignments) > 0:
-                    active_candidates += 1
-                    if any(isinstance(a, dict) and a.get('assignment_status') == '成約' for a in assignments):
-                        contracted_candidates += 1
+        active_candidates = kpis['active_candidates']
+        contracted_candidates = kpis['contracted_candidates']
         
         # 候補者KPIメトリクス表示
         col1, col2, col3, col4 = st.columns(4)
         
         with col1:
-            st.metric("📋 総候補者数", len(contacts_df))
+            st.metric("📋 総候補者数", contact_count)
         
         with col2:
             st.metric("🎯 アクティブ候補者", active_candidates)
@@ -1079,7 +1715,7 @@ def show_dashboard(use_sample_data=False):
             st.metric("✅ 成約済み候補者", contracted_candidates)
         
         with col4:
-            candidate_success_rate = (contracted_candidates / len(contacts_df) * 100) if len(contacts_df) > 0 else 0
+            candidate_success_rate = (contracted_candidates / contact_count * 100) if contact_count > 0 else 0
             st.metric("📊 候補者成約率", f"{candidate_success_rate:.1f}%")
         
         # スクリーニング状況・成約状況グラフ
@@ -1103,7 +1739,7 @@ def show_dashboard(use_sample_data=False):
             st.subheader("候補者アサイン状況")
             assignment_status = pd.DataFrame({
                 'status': ['アクティブ', '待機中', '成約済み'],
-                'count': [active_candidates - contracted_candidates, len(contacts_df) - active_candidates, contracted_candidates]
+                'count': [active_candidates - contracted_candidates, contact_count - active_candidates, contracted_candidates]
             })
             
             fig_assignment = px.pie(
@@ -1119,25 +1755,23 @@ def show_dashboard(use_sample_data=False):
     # 📞 営業・アプローチKPIセクション
     st.markdown("### 📞 営業・アプローチKPI")
     
-    if not approaches_df.empty:
+    approach_count = kpis['approach_count']
+    if approach_count > 0:
         # アプローチ手法別集計
-        method_counts = pd.Series()
-        if 'approach_methods' in approaches_df.columns:
-            methods = [m['method_name'] if isinstance(m, dict) else str(m) for m in approaches_df['approach_methods']]
-            method_counts = pd.Series(methods).value_counts()
+        method_counts = pd.Series(kpis['method_counts'], dtype=int)
         
         # アプローチKPIメトリクス表示
         col1, col2, col3, col4 = st.columns(4)
         
         with col1:
-            st.metric("📞 総アプローチ数", len(approaches_df))
+            st.metric("📞 総アプローチ数", approach_count)
         
         with col2:
-            unique_contacts = approaches_df['contact_id'].nunique() if 'contact_id' in approaches_df.columns else 0
+            unique_contacts = kpis['approached_contacts']
             st.metric("👤 アプローチ済み候補者", unique_contacts)
         
         with col3:
-            avg_approaches = len(approaches_df) / unique_contacts if unique_contacts > 0 else 0
+            avg_approaches = approach_count / unique_contacts if unique_contacts > 0 else 0
             st.metric("📈 平均アプローチ回数", f"{avg_approaches:.1f}回")
         
         with col4:
@@ -1162,20 +1796,16 @@ def show_dashboard(use_sample_data=False):
         
         with col2:
             st.subheader("月次アプローチ推移")
-            if 'approach_date' in approaches_df.columns:
-                approaches_df['approach_date'] = pd.to_datetime(approaches_df['approach_date'])
-                monthly_approaches = approaches_df.groupby(approaches_df['approach_date'].dt.to_period('M')).size()
-                
-                if not monthly_approaches.empty:
-                    fig_monthly = px.line(
-                        x=[str(period) for period in monthly_approaches.index],
-                        y=monthly_approaches.values,
-                        title="月次アプローチ数推移"
-                    )
-                    fig_monthly.update_layout(xaxis_title="月", yaxis_title="アプローチ数")
-                    st.plotly_chart(fig_monthly, width="stretch")
-                else:
-                    UIComponents.show_info("データがありません")
+            monthly_approaches = pd.Series(kpis['monthly_approaches'], dtype=int).sort_index()
+            
+            if not monthly_approaches.empty:
+                fig_monthly = px.line(
+                    x=monthly_approaches.index.tolist(),
+                    y=monthly_approaches.values,
+                    title="月次アプローチ数推移"
+                )
+                fig_monthly.update_layout(xaxis_title="月", yaxis_title="アプローチ数")
+                st.plotly_chart(fig_monthly, width="stretch")
             else:
                 UIComponents.show_info("データがありません")
     else:
@@ -1184,11 +1814,10 @@ def show_dashboard(use_sample_data=False):
     # 📊 パフォーマンス分析セクション
     st.markdown("### 📊 担当者別パフォーマンス")
     
-    if not projects_df.empty and 'co_manager' in projects_df.columns and 'status' in projects_df.columns:
-        # CO・RE別成約数集計
-        closed_projects = projects_df[projects_df['status'] == 'CLOSED']
-        co_performance = closed_projects['co_manager'].value_counts() if not closed_projects.empty else pd.Series()
-        re_performance = closed_projects['re_manager'].value_counts() if 're_manager' in closed_projects.columns and not closed_projects.empty else pd.Series()
+    if kpis['project_count'] > 0 and kpis['status_counts']:
+        # CO・RE別成約数（集計済み）
+        co_performance = pd.Series(kpis['co_performance'], dtype=int)
+        re_performance = pd.Series(kpis['re_performance'], dtype=int)
         
         col1, col2 = st.columns(2)
         
@@ -1345,21 +1974,197 @@ def show_contacts():
         show_contacts_delete()
 
 
-def show_contacts_list():
-    st.markdown("### 📋 コンタクト一覧・検索")
-    
-    df = fetch_contacts()
-    
-    if df.empty:
-        UIComponents.show_warning("データが見つかりません。")
-        return
-    
-    # サンプルデータかどうかを判定
-    is_sample_data = 'company' in df.columns and df['company'].str.contains('Demo Company サンプル', na=False).any()
-    
-    if is_sample_data:
-        UIComponents.show_info("💡 現在表示されているのはデモ用のサンプルデータです。編集・削除機能を使用するには、「新規登録」タブから実際のデータを登録してください。")
-    
+# =============================================================================
+# コンタクト全項目検索（転置インデックス）
+# =============================================================================
+
+# 全項目検索の対象カラム（normalize_contacts_frame 後のカラム名。department_name → department, position_name → position）
+# サーバー側の search_text（CONTACT_SEARCH_COLUMNS）と同じ項目に、展開済みの企業名・優先度を加えたもの
+CONTACT_FULLTEXT_COLUMNS = [
+    'full_name', 'furigana', 'company_name', 'department', 'position', 'profile',
+    'email_address', 'screening_status', 'primary_screening_comment',
+    'work_comment', 'name_search_key', 'url', 'priority_name'
+]
+
+
+def get_app_setting(key, default=None):
+    """アプリ設定を st.secrets から取得（secrets未設定・キーなしの場合はdefault）"""
+    try:
+        return st.secrets.get(key, default)
+    except Exception:
+        return default
+
+
+def normalize_search_text(text):
+    """検索用の文字列正規化（NFKCで全角/半角を統一し、小文字化）"""
+    return unicodedata.normalize('NFKC', str(text)).lower()
+
+
+class ContactSearchIndex:
+    """コンタクト全項目検索用の転置インデックス
+
+    各行の検索対象カラムを連結・正規化した文書から文字1-gram/2-gramの
+    ポスティングリストを作成する。漢字・かなは単語区切りがないため、
+    n-gramで候補行を絞り込んだ後に部分一致で確認する。
+    """
+
+    def __init__(self, df, columns):
+        columns = [col for col in columns if col in df.columns]
+        self.labels = df.index.to_numpy()
+        if columns:
+            combined = df[columns[0]].astype('string').fillna('')
+            for col in columns[1:]:
+                combined = combined + '\n' + df[col].astype('string').fillna('')
+            self.documents = combined.str.normalize('NFKC').str.lower().tolist()
+        else:
+            self.documents = [''] * len(df)
+
+        postings = {}
+        for position, document in enumerate(self.documents):
+            grams = set(document)
+            grams.update(document[i:i + 2] for i in range(len(document) - 1))
+            for gram in grams:
+                postings.setdefault(gram, []).append(position)
+        self.postings = {gram: np.array(positions, dtype=np.int32) for gram, positions in postings.items()}
+
+    def search(self, text):
+        """部分一致する行のindexラベルを返す"""
+        query = normalize_search_text(text).strip()
+        if not query:
+            return self.labels
+
+        grams = {query} if len(query) == 1 else {query[i:i + 2] for i in range(len(query) - 1)}
+        posting_lists = sorted((self.postings.get(gram) for gram in grams), key=lambda p: 0 if p is None else len(p))
+        if posting_lists[0] is None:
+            return self.labels[:0]
+
+        candidates = posting_lists[0]
+        for positions in posting_lists[1:]:
+            candidates = np.intersect1d(candidates, positions, assume_unique=True)
+            if candidates.size == 0:
+                break
+
+        matched = [position for position in candidates if query in self.documents[position]]
+        return self.labels[np.array(matched, dtype=np.int64)]
+
+
+def contacts_data_version(df):
+    """コンタクトDataFrameのデータバージョン（件数・最終更新日時・ID合計）"""
+    updated_at = str(df['updated_at'].max()) if 'updated_at' in df.columns else ''
+    id_sum = int(df['contact_id'].sum()) if 'contact_id' in df.columns else 0
+    return len(df), updated_at, id_sum
+
+
+@st.cache_resource(max_entries=4)
+def get_contact_search_index(_df, data_version):
+    """データバージョンごとに一度だけ全項目検索インデックスを構築"""
+    return ContactSearchIndex(_df, CONTACT_FULLTEXT_COLUMNS)
+
+
+def _escape_like(text):
+    """LIKEパターン中のワイルドカード文字をエスケープ"""
+    return text.replace('\\', '\\\\').replace('%', '\\%').replace('_', '\\_')
+
+
+# コンタクト一覧のページサイズ選択肢
+CONTACT_LIST_PAGE_SIZES = [50, 100, 200]
+# 件数の取得方法（'exact' / 'planned' / 'estimated'）。大規模テーブルでは 'estimated' で件数取得を軽くできる
+CONTACT_LIST_COUNT_METHOD = 'exact'
+# 全項目検索でサーバー側の部分一致検索を行うcontactsのテキストカラム
+CONTACT_SEARCH_COLUMNS = [
+    'full_name', 'furigana', 'department_name', 'position_name', 'profile',
+    'email_address', 'screening_status', 'primary_screening_comment',
+    'work_comment', 'name_search_key', 'url'
+]
+
+
+def _postgrest_quote(value):
+    """PostgRESTのor/andフィルタ用に値をダブルクォートで囲む（カンマ・括弧を含む値に対応）"""
+    escaped = str(value).replace('\\', '\\\\').replace('"', '\\"')
+    return f'"{escaped}"'
+
+
+def _ilike_any(columns, text):
+    """複数カラムのいずれかに部分一致する条件（orフィルタの中身）を生成（% と _ は文字として扱う）"""
+    pattern = _postgrest_quote(f"*{_escape_like(text)}*")
+    return ','.join(f"{col}.ilike.{pattern}" for col in columns)
+
+
+def apply_or_groups(query, or_groups):
+    """複数のor条件グループをAND結合してクエリに適用"""
+    if len(or_groups) == 1:
+        query = query.or_(or_groups[0])
+    elif len(or_groups) > 1:
+        query = query.or_(f"and({','.join(f'or({group})' for group in or_groups)})")
+    return query
+
+
+@cache_by_tables(CONTACTS_CACHE_TABLES)
+def fetch_contacts_page(search_text, search_all_text, company_name, priority_name, screening, page, page_size):
+    """フィルター条件をサーバー側で適用し、指定ページのコンタクトと総件数を取得
+
+    Returns:
+        (DataFrame, 総件数)
+    """
+    masters = fetch_master_data(strict=True)
+    query = supabase.table('contacts').select(CONTACTS_SELECT, count=CONTACT_LIST_COUNT_METHOD)
+    or_groups = []
+
+    # 氏名・フリガナ検索
+    if search_text:
+        or_groups.append(_ilike_any(['full_name', 'furigana'], search_text))
+
+    # 全項目検索（CONTACT_SEARCH_BACKEND = "server" の場合はtrigramインデックス付きの search_text カラムを使用）
+    if search_all_text:
+        if get_app_setting("CONTACT_SEARCH_BACKEND", "memory") == "server":
+            query = query.ilike('search_text', f"*{_escape_like(normalize_search_text(search_all_text))}*")
+        else:
+            or_groups.append(_ilike_any(CONTACT_SEARCH_COLUMNS, search_all_text))
+
+    # 企業（companies / target_companies のどちらで紐付いていても対象）
+    if company_name != "すべて":
+        company_conditions = []
+        for table, id_col, contact_col in [('companies', 'company_id', 'company_id'),
+                                           ('target_companies', 'target_company_id', 'target_company_id')]:
+            master_df = masters.get(table, pd.DataFrame())
+            if not master_df.empty and 'company_name' in master_df.columns:
+                ids = master_df.loc[master_df['company_name'] == company_name, id_col].tolist()
+                if ids:
+                    company_conditions.append(f"{contact_col}.in.({','.join(str(i) for i in ids)})")
+        if not company_conditions:
+            return pd.DataFrame(), 0
+        or_groups.append(','.join(company_conditions))
+
+    query = apply_or_groups(query, or_groups)
+
+    # 優先度
+    if priority_name != "すべて":
+        priority_df = masters.get('priority_levels', pd.DataFrame())
+        priority_ids = priority_df.loc[priority_df['priority_name'] == priority_name, 'priority_id'].tolist() \
+            if not priority_df.empty else []
+        if not priority_ids:
+            return pd.DataFrame(), 0
+        query = query.in_('priority_id', priority_ids)
+
+    # 精査状況
+    if screening == "精査済み":
+        query = query.not_.is_('screening_status', 'null')
+    elif screening == "未精査":
+        query = query.is_('screening_status', 'null')
+
+    offset = (page - 1) * page_size
+    response = query.order('contact_id').range(offset, offset + page_size - 1).execute()
+    df = pd.DataFrame(response.data) if response.data else pd.DataFrame()
+    if not df.empty:
+        df = normalize_contacts_frame(df)
+    return df, response.count or 0
+
+
+def show_contact_filter_inputs(companies, priorities):
+    """コンタクト一覧の検索・フィルター入力（URLパラメータと同期）
+
+    companies / priorities がNoneの場合はそのフィルターを表示しない。
+    """
     # URLパラメータから初期値を取得
     default_search = get_url_param("contact_search", "")
     default_search_all = get_url_param("contact_search_all", "")
@@ -1389,8 +2194,8 @@ def show_contacts_list():
     col1, col2, col3, col4 = st.columns(4)
     
     with col1:
-        if 'company_name' in df.columns:
-            companies = ["すべて"] + sorted(df['company_name'].dropna().unique().tolist())
+        if companies is not None:
+            companies = ["すべて"] + companies
             selected_company = st.selectbox("企業", companies,
                                           index=get_selectbox_index(companies, default_company))
             set_url_param("contact_company", selected_company)
@@ -1398,8 +2203,8 @@ def show_contacts_list():
             selected_company = "すべて"
     
     with col2:
-        if 'priority_name' in df.columns:
-            priorities = ["すべて"] + sorted(df['priority_name'].dropna().unique().tolist())
+        if priorities is not None:
+            priorities = ["すべて"] + priorities
             selected_priority = st.selectbox("優先度", priorities,
                                            index=get_selectbox_index(priorities, default_priority))
             set_url_param("contact_priority", selected_priority)
@@ -1417,6 +2222,53 @@ def show_contacts_list():
         selected_ap = st.selectbox("AP状況", ap_statuses,
                                   index=get_selectbox_index(ap_statuses, default_ap))
         set_url_param("contact_ap", selected_ap)
+
+    return {
+        'search_text': search_text,
+        'search_all_text': search_all_text,
+        'company': selected_company,
+        'priority': selected_priority,
+        'screening': selected_screening,
+        'ap': selected_ap
+    }
+
+
+def show_contacts_list():
+    st.markdown("### 📋 コンタクト一覧・検索")
+
+    # DB接続時はサーバー側で絞り込み・ページ分割して取得
+    if supabase is not None:
+        server_mode = st.checkbox(
+            "⚡ サーバー側で検索・ページ分割する",
+            value=get_url_param("contact_mode", "server") == "server",
+            help="大量のコンタクトがある場合は有効にしてください。無効にすると全件を取得して画面側で絞り込みます"
+        )
+        set_url_param("contact_mode", "server" if server_mode else "local")
+        if server_mode:
+            show_contacts_list_paginated()
+            return
+    
+    df = fetch_contacts()
+    
+    if df.empty:
+        UIComponents.show_warning("データが見つかりません。")
+        return
+    
+    # サンプルデータかどうかを判定
+    is_sample_data = 'company' in df.columns and df['company'].str.contains('Demo Company サンプル', na=False).any()
+    
+    if is_sample_data:
+        UIComponents.show_info("💡 現在表示されているのはデモ用のサンプルデータです。編集・削除機能を使用するには、「新規登録」タブから実際のデータを登録してください。")
+    
+    filters = show_contact_filter_inputs(
+        sorted(df['company_name'].dropna().unique().tolist()) if 'company_name' in df.columns else None,
+        sorted(df['priority_name'].dropna().unique().tolist()) if 'priority_name' in df.columns else None
+    )
+    search_text = filters['search_text']
+    search_all_text = filters['search_all_text']
+    selected_company = filters['company']
+    selected_priority = filters['priority']
+    selected_screening = filters['screening']
     
     # フィルター適用
     filtered_df = df.copy()
@@ -1446,24 +2298,10 @@ def show_contacts_list():
         
         filtered_df = filtered_df[name_filter]
     
-    # 全項目検索
+    # 全項目検索（データバージョンごとに構築した転置インデックスで検索）
     if search_all_text:
-        all_filter = pd.Series(False, index=filtered_df.index)
-        
-        # 検索対象の全カラム（テキスト系）
-        search_columns = [
-            'full_name', 'furigana', 'company_name', 'department_name', 'position_name',
-            'profile', 'comments', 'email', 'phone', 'linkedin_url', 'wantedly_url',
-            'other_urls', 'work_history', 'skills', 'certifications', 'education',
-            'note', 'screening_status', 'priority_name', 'approach_method',
-            'last_contact_date', 'next_action', 'work_comment'
-        ]
-        
-        for col in search_columns:
-            if col in filtered_df.columns:
-                all_filter |= filtered_df[col].astype(str).str.contains(search_all_text, case=False, na=False)
-        
-        filtered_df = filtered_df[all_filter]
+        search_index = get_contact_search_index(df, contacts_data_version(df))
+        filtered_df = filtered_df[filtered_df.index.isin(search_index.search(search_all_text))]
     
     if selected_company != "すべて" and 'company_name' in df.columns:
         filtered_df = filtered_df[filtered_df['company_name'] == selected_company]
@@ -1478,6 +2316,77 @@ def show_contacts_list():
     
     st.info(f"表示件数: {len(filtered_df)}件 / 全{len(df)}件")
     
+    # 推定年齢を解析できないコンタクト（年齢フィルター・マッチングでは年齢不明として扱う）
+    age_errors = unparseable_age_contacts(df)
+    if not age_errors.empty:
+        with st.expander(f"⚠️ 推定年齢を解析できないコンタクト（{len(age_errors)}件）"):
+            st.caption("「30代」「35歳」「30-35」などの形式で入力すると年齢として扱われます")
+            st.dataframe(age_errors.astype(object).fillna(''), hide_index=True, width="stretch")
+    
+    show_contacts_table(filtered_df)
+
+
+def show_contacts_list_paginated():
+    """コンタクト一覧（サーバー側フィルター・ページ分割）"""
+    masters = fetch_master_data()
+    company_names = set()
+    for table in ['companies', 'target_companies']:
+        master_df = masters.get(table, pd.DataFrame())
+        if not master_df.empty and 'company_name' in master_df.columns:
+            company_names.update(master_df['company_name'].dropna().tolist())
+    priority_df = masters.get('priority_levels', pd.DataFrame())
+    priorities = sorted(priority_df['priority_name'].dropna().unique().tolist()) \
+        if not priority_df.empty and 'priority_name' in priority_df.columns else None
+
+    filters = show_contact_filter_inputs(sorted(company_names), priorities)
+
+    # ページサイズ・ページ番号（フィルター変更時は1ページ目に戻す）
+    col_size, col_page, col_count = st.columns([1, 1, 2])
+    with col_size:
+        default_page_size = get_url_param("contact_page_size", str(CONTACT_LIST_PAGE_SIZES[0]))
+        page_size_options = [str(size) for size in CONTACT_LIST_PAGE_SIZES]
+        page_size = int(st.selectbox("表示件数/ページ", page_size_options,
+                                     index=get_selectbox_index(page_size_options, default_page_size)))
+        set_url_param("contact_page_size", page_size)
+
+    filter_key = (filters['search_text'], filters['search_all_text'], filters['company'],
+                  filters['priority'], filters['screening'], page_size)
+    previous_filter_key = st.session_state.get('contact_list_filter_key')
+    st.session_state.contact_list_filter_key = filter_key
+    if previous_filter_key is not None and previous_filter_key != filter_key:
+        set_url_param("contact_page", "")
+
+    try:
+        current_page = max(int(get_url_param("contact_page", "1") or 1), 1)
+    except ValueError:
+        current_page = 1
+
+    try:
+        page_df, total_count = fetch_contacts_page(
+            filters['search_text'], filters['search_all_text'], filters['company'],
+            filters['priority'], filters['screening'], current_page, page_size
+        )
+    except Exception as e:
+        ErrorHandler.handle_database_error(e)
+        return
+
+    total_pages = max((total_count + page_size - 1) // page_size, 1)
+    with col_page:
+        page = st.number_input("ページ", min_value=1, max_value=total_pages,
+                               value=min(current_page, total_pages), step=1)
+        if page != current_page:
+            set_url_param("contact_page", page if page > 1 else "")
+            st.rerun()
+    with col_count:
+        start = (page - 1) * page_size + 1 if total_count else 0
+        end = min(page * page_size, total_count)
+        st.info(f"表示件数: {start}〜{end}件 / 該当{total_count}件（{page}/{total_pages}ページ）")
+
+    show_contacts_table(page_df)
+
+
+def show_contacts_table(filtered_df):
+    """コンタクト一覧テーブルと選択行の詳細情報を表示"""
     # 詳細なデータ表示（contactsテーブルの全項目表示）
     if not filtered_df.empty:
         st.markdown("### 📋 詳細データ一覧")
@@ -1514,7 +2423,7 @@ def show_contacts_list():
         if display_columns:
             # 選択可能なデータフレームとして表示
             selected_row = st.dataframe(
-                filtered_df[display_columns].fillna(''),
+                filtered_df[display_columns].astype(object).fillna(''),
                 use_container_width=True,
                 hide_index=True,
                 column_config=column_config,
@@ -2072,7 +2981,7 @@ def show_add_contact():
                                         st.warning(f"AP履歴{i}の登録でエラー: {str(e)}")
                     
                     UIComponents.show_success("コンタクトが正常に登録されました！")
-                    st.cache_data.clear()
+                    invalidate_tables('contact_approaches', 'work_locations')
                 else:
                     UIComponents.show_error("登録に失敗しました")
                 
@@ -3171,9 +4080,7 @@ def show_projects_list(use_sample_data=False):
                                     # target_companiesテーブルから詳細情報を取得
                                     target_company_details = None
                                     try:
-                                        tc_result = supabase.table('target_companies').select('*').eq('company_name', company_name).execute()
-                                        if tc_result.data:
-                                            target_company_details = tc_result.data[0]
+                                        target_company_details = fetch_target_company(company_name)
                                     except Exception as e:
                                         st.error(f"ターゲット企業詳細取得エラー: {str(e)}")
                                     
@@ -3461,40 +4368,32 @@ def show_projects_list(use_sample_data=False):
                                             except:
                                                 pass
 
-                                        # メール関連情報
-                                        if any([target_company_data.get('email_search_patterns'),
-                                               target_company_data.get('confirmed_emails'),
-                                               target_company_data.get('misdelivery_emails'),
-                                               target_company_data.get('email_search_memo')]):
+                                        # メール関連情報（パターン・確認済みメールは子テーブルから取得）
+                                        email_snapshot = {}
+                                        try:
+                                            email_company_id = resolve_company_ids([company_name]).get(company_name)
+                                            if email_company_id is not None:
+                                                email_snapshot = load_company_email_snapshot(email_company_id, company_name)
+                                        except Exception:
+                                            pass
+                                        email_patterns = [row['pattern'] for row in email_snapshot.get('patterns', [])]
+                                        confirmed_emails = email_snapshot.get('confirmed', [])
+                                        email_memo = email_snapshot.get('email_search_memo') or target_company_data.get('email_search_memo')
+                                        if email_patterns or confirmed_emails or email_snapshot.get('misdelivery') or email_memo:
                                             st.markdown("**✉️ メール関連情報**")
 
-                                            if target_company_data.get('email_search_patterns'):
+                                            if email_patterns:
                                                 st.text("検索パターン:")
-                                                try:
-                                                    patterns = target_company_data['email_search_patterns']
-                                                    if isinstance(patterns, (list, dict)):
-                                                        st.json(patterns)
-                                                    else:
-                                                        st.text(f"  {patterns}")
-                                                except:
-                                                    pass
-
-                                            if target_company_data.get('confirmed_emails'):
+                                                for pattern in email_patterns:
+                                                    st.text(f"  • {pattern}")
+
+                                            if confirmed_emails:
                                                 st.text("確認済みメール:")
-                                                try:
-                                                    emails = target_company_data['confirmed_emails']
-                                                    if isinstance(emails, list):
-                                                        for email in emails:
-                                                            st.text(f"  • {email}")
-                                                    elif isinstance(emails, dict):
-                                                        st.json(emails)
-                                                    else:
-                                                        st.text(f"  {emails}")
-                                                except:
-                                                    pass
-
-                                            if target_company_data.get('email_search_memo'):
-                                                st.text(f"📝 メモ: {target_company_data['email_search_memo']}")
+                                                for email in confirmed_emails:
+                                                    st.text(f"  • {email['email']}" + (f" ({email['name']})" if email.get('name') else ""))
+
+                                            if email_memo:
+                                                st.text(f"📝 メモ: {email_memo}")
 
                                         # ターゲット企業検索履歴編集・企業マスタ管理へのリンクボタン
                                         if company_name and company_name != '不明':
@@ -3940,22 +4839,8 @@ def show_projects_create():
                                 }
                                 supabase.table('company_project_roles').insert(client_data).execute()
                         
-                        # ターゲット企業を company_project_roles に追加
-                        for target in st.session_state.target_companies_list:
-                            target_company_data = {
-                                'project_id': int(project_id) if project_id is not None else None,
-                                'company_id': int(target['company_id']) if target.get('company_id') is not None else None,
-                                'role_type': 'target',  # ターゲット企業として登録
-                                'department_name': target.get('department_name') if target.get('department_name') else None,
-                                'priority_id': int(target['priority_id']) if target.get('priority_id') is not None else None,
-                                'is_active': True
-                            }
-
-                            # 必須フィールドがNoneの場合はスキップ
-                            if target_company_data['project_id'] is None or target_company_data['company_id'] is None:
-                                continue
-
-                            supabase.table('company_project_roles').insert(target_company_data).execute()
+                        # ターゲット企業を company_project_roles に一括追加
+                        save_company_project_roles(project_id, 'target', st.session_state.target_companies_list)
                         
                         # 担当者情報を保存
                         save_project_managers(project_id, managers_data)
@@ -4259,7 +5144,6 @@ def show_projects_edit():
                                 
                                 # 2. target_companiesテーブルにも詳細情報を保存（旧構造・検索履歴用）
                                 target_companies_data = {
-                                    'company_name': selected_company_name,
                                     'company_url': company_url if company_url else None,
                                     'classification': classification if classification else None,
                                     'target_department': department_name,
@@ -4273,15 +5157,8 @@ def show_projects_edit():
                                 # company_project_rolesに挿入
                                 insert_response = supabase.table('company_project_roles').insert(target_company_data).execute()
                                 
-                                # target_companiesにも挿入（既存チェック付き）
-                                existing_target_company = supabase.table('target_companies').select('target_company_id').eq('company_name', selected_company_name).execute()
-                                if not existing_target_company.data:
-                                    # 新規の場合はtarget_companiesに挿入
-                                    supabase.table('target_companies').insert(target_companies_data).execute()
-                                else:
-                                    # 既存の場合は詳細情報を更新
-                                    target_company_id = existing_target_company.data[0]['target_company_id']
-                                    supabase.table('target_companies').update(target_companies_data).eq('target_company_id', target_company_id).execute()
+                                # target_companiesにも保存（名寄せした既存行は更新、なければ作成）
+                                save_target_company_fields(selected_company_name, target_companies_data)
                                 
                                 if insert_response.data:
                                     # 挿入されたレコードのIDを更新
@@ -4569,46 +5446,18 @@ def show_projects_edit():
                     # 1. 案件本体を更新
                     response = supabase.table('projects').update(update_data).eq('project_id', project_id).execute()
                     
-                    # 2. 依頼企業の更新
+                    # 2. 依頼企業の更新（変更があった場合のみ書き込み）
                     if selected_client_company_name:
-                        # 既存の依頼企業を削除
-                        supabase.table('company_project_roles').delete().eq('project_id', project_id).eq('role_type', 'client').execute()
-
-                        # 新しい依頼企業を追加
                         client_company = next((c for c in companies if c['company_name'] == selected_client_company_name), None)
                         if client_company:
-                            client_data = {
-                                'project_id': int(project_id),
-                                'company_id': client_company['company_id'],
-                                'role_type': 'client',
-                                'is_active': True
-                            }
-                            supabase.table('company_project_roles').insert(client_data).execute()
+                            save_company_project_roles(project_id, 'client', [{'company_id': client_company['company_id']}])
                     
                     # 3. 担当者情報を保存
                     save_project_managers(project_id, managers_data)
                     
-                    # 4. 既存のターゲット企業関連付けを削除
-                    supabase.table('company_project_roles').delete().eq('project_id', project_id).eq('role_type', 'target').execute()
-
-                    # 5. 新しいターゲット企業・部門・優先度を挿入
+                    # 4. ターゲット企業・部門・優先度をDBとの差分で保存
                     target_count = len(st.session_state[edit_key])
-                    for target in st.session_state[edit_key]:
-                        # None値チェックを追加
-                        target_company_data = {
-                            'project_id': int(project_id) if project_id is not None else None,
-                            'company_id': int(target['company_id']) if target.get('company_id') is not None else None,
-                            'role_type': 'target',
-                            'department_name': target.get('department_name') if target.get('department_name') else None,
-                            'priority_id': int(target['priority_id']) if target.get('priority_id') is not None else None,
-                            'is_active': True
-                        }
-
-                        # 必須フィールドがNoneの場合はスキップ
-                        if target_company_data['project_id'] is None or target_company_data['company_id'] is None:
-                            continue
-
-                        supabase.table('company_project_roles').insert(target_company_data).execute()
+                    save_company_project_roles(project_id, 'target', st.session_state[edit_key])
                     
                     # データベース更新成功時、次回の比較用にDBのハッシュを更新
                     db_hash_key = f"db_hash_{project_id}"
@@ -4622,7 +5471,7 @@ def show_projects_edit():
                     # 担当者数をカウント
                     manager_count = len([m for m in managers_data if m['name'].strip()])
                     UIComponents.show_success(f"案件が正常に更新されました！（ターゲット設定: {target_count}件、担当者: {manager_count}人）")
-                    st.cache_data.clear()
+                    invalidate_tables('projects', 'company_project_roles', 'project_managers')
                     
                 except Exception as e:
                     ErrorHandler.handle_database_error(e)
@@ -4699,7 +5548,7 @@ def show_projects_delete():
                     response = supabase.table('projects').delete().eq('project_id', project_id).execute()
                     
                     UIComponents.show_success(f"案件「{selected_project.get('project_name', 'N/A')}」が正常に削除されました")
-                    st.cache_data.clear()
+                    invalidate_tables('projects', 'project_assignments')
                     st.rerun()
                     
                 except Exception as e:
@@ -4790,40 +5639,137 @@ def get_manager_types():
         return []
 
 
+def fetch_project_managers(project_id):
+    """指定案件の担当者を取得（取得エラーは呼び出し元に伝える。差分保存用）"""
+    response = supabase.table('project_managers').select('*').eq('project_id', project_id).execute()
+    return response.data if response.data else []
+
+
 def get_project_managers(project_id):
-    """指定案件の担当者を取得"""
+    """指定案件の担当者を取得（表示用。取得できない場合は空リスト）"""
     if supabase is None or not project_id:
         return []
     
     try:
-        response = supabase.table('project_managers').select('*').eq('project_id', project_id).execute()
-        return response.data if response.data else []
+        return fetch_project_managers(project_id)
     except:
         return []
 
 
+# ============================================
+# 行差分による保存
+# ============================================
+
+# company_project_roles の一意制約（company_id, project_id, role_type, department_name）
+COMPANY_PROJECT_ROLE_KEY = ('company_id', 'project_id', 'role_type', 'department_name')
+
+
+def apply_row_diff(table_name, existing_rows, edited_rows, key_columns, id_column='id'):
+    """DBの行と編集後の行を比較し、差分だけを書き込む
+
+    編集後の行は id_column を持っていればその行、なければ key_columns が一致する行と対応付ける。
+    追加・変更された行は id_column をキーに1回の一括upsert、編集後に対応する行がないDBの行は
+    id_column の一括deleteで反映する。upsertを先に行うため、保存中に行が0件になる時間がない。
+
+    Args:
+        key_columns: id_column を持たない編集後の行をDBの行と対応付ける列
+    Returns:
+        {'upserted': 件数, 'deleted': 件数, 'unchanged': 件数}
+    """
+    def row_key(row):
+        return tuple(row.get(col) for col in key_columns)
+
+    existing_by_id = {row[id_column]: row for row in existing_rows}
+    existing_by_key = {row_key(row): row for row in existing_rows}
+
+    upserts = []
+    kept_ids = set()
+    for row in edited_rows:
+        current = existing_by_id.get(row.get(id_column)) if row.get(id_column) is not None else existing_by_key.get(row_key(row))
+        if current is not None:
+            kept_ids.add(current[id_column])
+            if all(current.get(col) == value for col, value in row.items() if col != id_column):
+                continue
+            # 一意制約はNULLを区別するため（department_name が空の行など）、キー列ではなくIDで更新する
+            row = {**row, id_column: current[id_column]}
+        upserts.append(row)
+
+    deleted_ids = [row_id for row_id in existing_by_id if row_id not in kept_ids]
+
+    if upserts:
+        # id の有無が混在する行を1回で送れるよう、欠けている列はDBの既定値（id は採番）にする
+        supabase.table(table_name).upsert(upserts, on_conflict=id_column, default_to_null=False).execute()
+    if deleted_ids:
+        supabase.table(table_name).delete().in_(id_column, deleted_ids).execute()
+
+    return {
+        'upserted': len(upserts),
+        'deleted': len(deleted_ids),
+        'unchanged': len(edited_rows) - len(upserts)
+    }
+
+
+def fetch_company_project_roles(project_id, role_type):
+    """案件の company_project_roles を役割別に取得（差分比較用）"""
+    response = supabase.table('company_project_roles').select(
+        'id, company_id, project_id, role_type, department_name, priority_id, is_active'
+    ).eq('project_id', project_id).eq('role_type', role_type).execute()
+    return response.data or []
+
+
+def save_company_project_roles(project_id, role_type, roles):
+    """案件の企業役割（依頼企業・ターゲット企業）を差分で保存
+
+    Args:
+        roles: company_id / department_name / priority_id を持つ辞書のリスト
+    """
+    # 一意制約と同じキーで重複を除く（同じ行を1回のupsertに2回含めるとエラーになるため）
+    edited_rows = {}
+    for role in roles:
+        if role.get('company_id') is None:
+            continue
+        row = {
+            'company_id': int(role['company_id']),
+            'project_id': int(project_id),
+            'role_type': role_type,
+            'department_name': role.get('department_name') or None,
+            'priority_id': int(role['priority_id']) if role.get('priority_id') is not None else None,
+            'is_active': True
+        }
+        edited_rows[tuple(row[col] for col in COMPANY_PROJECT_ROLE_KEY)] = row
+    return apply_row_diff(
+        'company_project_roles',
+        fetch_company_project_roles(project_id, role_type),
+        list(edited_rows.values()),
+        COMPANY_PROJECT_ROLE_KEY
+    )
+
+
 def save_project_managers(project_id, managers_data):
-    """案件担当者を保存（既存データを削除して新規作成）"""
+    """案件担当者を保存（DBの担当者との差分のみを一括upsert・一括削除）"""
     if supabase is None or not project_id:
         return False
     
     try:
-        # 既存の担当者を削除
-        supabase.table('project_managers').delete().eq('project_id', project_id).execute()
-        
-        # 新しい担当者を追加
+        edited_rows = []
         for manager in managers_data:
-            if manager.get('manager_name') and manager.get('manager_type_code'):
+            # 編集UIで追加した担当者は manager_name、DBから読み込んだ担当者は name を持つ
+            manager_name = manager.get('manager_name') or manager.get('name')
+            if manager_name and manager.get('manager_type_code'):
                 manager_data = {
                     'project_id': int(project_id),
                     'manager_type_code': manager.get('manager_type_code'),
-                    'name': manager['manager_name'],
+                    'name': manager_name,
                     'email': manager.get('email', ''),
                     'phone': manager.get('phone', ''),
                     'is_primary': manager.get('is_primary', False)
                 }
-                supabase.table('project_managers').insert(manager_data).execute()
+                if manager.get('id') is not None:
+                    manager_data['id'] = manager['id']
+                edited_rows.append(manager_data)
         
+        # 取得に失敗した場合に「削除なし・全件追加」として保存しないよう、エラーはそのまま保存エラーにする
+        apply_row_diff('project_managers', fetch_project_managers(project_id), edited_rows, ('id',))
         return True
         
     except Exception as e:
@@ -5005,9 +5951,6 @@ def show_masters():
                         'eight_search': company.get('eight_search', ''),
                         'keyword_searches': company.get('keyword_searches', {}),
                         'other_searches': company.get('other_searches', {}),
-                        'email_search_patterns': company.get('email_search_patterns', {}),
-                        'confirmed_emails': company.get('confirmed_emails', {}),
-                        'misdelivery_emails': company.get('misdelivery_emails', {}),
                         'email_search_memo': company.get('email_search_memo', ''),
                         'roles': ', '.join(roles) if roles else '未使用',
                         'created_at': company.get('created_at', ''),
@@ -5294,9 +6237,7 @@ def show_masters():
                             # target_companiesテーブルから既存データを取得
                             tc_data = None
                             if selected_row.get('company_name'):
-                                tc_check = supabase.table('target_companies').select('keyword_searches').eq('company_name', selected_row['company_name']).execute()
-                                if tc_check.data:
-                                    tc_data = tc_check.data[0]
+                                tc_data = fetch_target_company(selected_row['company_name'], 'keyword_searches')
                             
                             existing_searches = tc_data.get('keyword_searches', []) if tc_data else []
                             if not isinstance(existing_searches, list):
@@ -5376,7 +6317,7 @@ def show_masters():
                                             
                                             if response.data:
                                                 st.success(f"✅ 企業 '{edited_name}' の情報を更新しました")
-                                                st.cache_data.clear()
+                                                invalidate_tables('companies')
                                                 st.rerun()
                                             else:
                                                 st.error("❌ 更新に失敗しました")
@@ -5409,7 +6350,7 @@ def show_masters():
                                             response = supabase.table('companies').delete().eq('company_id', selected_row['company_id']).execute()
                                             if response.data:
                                                 st.success(f"✅ 企業 '{selected_row['company_name']}' を削除しました")
-                                                st.cache_data.clear()
+                                                invalidate_tables('companies')
                                                 st.rerun()
                                             else:
                                                 st.error("❌ 削除に失敗しました")
@@ -5554,10 +6495,10 @@ def show_masters():
             if st.form_submit_button("🏢 企業を追加", type="primary"):
                 if new_company_name:
                     try:
-                        # 重複チェック
-                        existing_check = supabase.table('companies').select('company_id').eq('company_name', new_company_name).execute()
-                        if existing_check.data:
-                            st.error(f"❌ 企業名 '{new_company_name}' は既に登録されています")
+                        # 重複チェック（法人格の位置・略記、全角半角、空白の違いを含む）
+                        existing_id = resolve_company_ids([new_company_name], fuzzy=False).get(new_company_name)
+                        if existing_id is not None:
+                            st.error(f"❌ 企業名 '{company_canonical_name(existing_id) or new_company_name}' は既に登録されています")
                         else:
                             insert_data = {
                                 'company_name': new_company_name,
@@ -5581,7 +6522,7 @@ def show_masters():
                             response = supabase.table('companies').insert(insert_data).execute()
                             if response.data:
                                 st.success(f"✅ 企業 '{new_company_name}' を追加しました")
-                                st.cache_data.clear()
+                                invalidate_tables('companies')
                                 st.rerun()
                             else:
                                 st.error("❌ 追加に失敗しました")
@@ -5655,7 +6596,7 @@ def show_masters():
                         response = None
                         if response:
                             st.success(f"部署 '{department_name}' を追加しました")
-                            st.cache_data.clear()
+                            invalidate_tables('departments')
                             st.rerun()
                         else:
                             st.error("追加に失敗しました")
@@ -5689,7 +6630,6 @@ def show_masters():
                         response = insert_master_data('search_assignees', {'assignee_name': assignee_name})
                         if response:
                             st.success(f"担当者 '{assignee_name}' を追加しました")
-                            st.cache_data.clear()
                             st.rerun()
                         else:
                             st.error("追加に失敗しました")
@@ -5736,7 +6676,6 @@ def show_masters():
                         })
                         if response:
                             st.success(f"優先度 '{priority_name}' を追加しました")
-                            st.cache_data.clear()
                             st.rerun()
                         else:
                             st.error("追加に失敗しました")
@@ -5779,7 +6718,6 @@ def show_masters():
                         })
                         if response:
                             st.success(f"AP手法 '{method_name}' を追加しました")
-                            st.cache_data.clear()
                             st.rerun()
                         else:
                             st.error("追加に失敗しました")
@@ -5827,7 +6765,7 @@ CREATE TABLE project_managers (
         if st.button("🔧 担当者管理テーブルを初期化", type="primary"):
             if create_project_manager_tables():
                 st.success("✅ 担当者管理テーブルが正常に作成されました！")
-                st.cache_data.clear()
+                invalidate_tables('project_managers', 'manager_types')
             else:
                 st.error("❌ テーブル作成に失敗しました。Supabase Dashboardで手動作成してください。")
         
@@ -6126,8 +7064,8 @@ def show_specifications():
         st.markdown("### 🔧 技術的注意点")
         st.markdown("""
         **キャッシュ戦略**:
-        - `@st.cache_data(ttl=300)`: 5分間のデータキャッシュ
-        - データ更新時に `st.cache_data.clear()` でキャッシュクリア
+        - `@cache_by_tables(...)`: 参照テーブルのバージョンをキーにした5分間のデータキャッシュ
+        - データ更新時に `invalidate_tables()` で更新したテーブルに依存するキャッシュのみ無効化
         
         **エラーハンドリング**:
         - Supabase接続失敗時はサンプルデータにフォールバック
@@ -6371,6 +7309,7 @@ def show_contacts_create():
                 contact_data = {k: v for k, v in contact_data.items() if v is not None}
                 
                 response = supabase.table('contacts').insert(contact_data).execute()
+                invalidate_tables('contacts', 'contact_approaches')
                 st.success(f"コンタクト「{full_name}」が正常に登録されました")
                 st.rerun()
                 
@@ -6737,6 +7676,7 @@ def show_contacts_edit():
                     update_data = {k: v for k, v in update_data.items() if v is not None}
                     
                     response = supabase.table('contacts').update(update_data).eq('contact_id', contact_id).execute()
+                    invalidate_tables('contacts', 'contact_approaches')
                     st.success(f"コンタクト「{full_name}」が正常に更新されました")
                     st.rerun()
                     
@@ -6848,8 +7788,8 @@ def show_contacts_delete():
                         check_response = supabase.table('contacts').select('contact_id').eq('contact_id', contact_id).execute()
 
                     if not check_response.data:  # データが存在しない = 削除成功
-                        # キャッシュをクリアして確実に最新データを取得
-                        st.cache_data.clear()
+                        # 関連テーブルのキャッシュを無効化して確実に最新データを取得
+                        invalidate_tables('contacts', 'project_assignments', 'contact_approaches', 'work_locations')
 
                         # 削除結果の詳細表示
                         st.success(f"✅ コンタクト「{selected_contact.get('full_name', 'N/A')}」が正常に削除されました")
@@ -6872,6 +7812,302 @@ def show_contacts_delete():
 
 
 # CSV インポート関数
+# =============================================================================
+# CSVストリーミング読み込み
+# =============================================================================
+
+# インポート時に1回で読み込む行数
+IMPORT_CSV_CHUNK_SIZE = 5000
+# 文字コード判定で一度に読み込むバイト数
+CSV_ENCODING_BLOCK_BYTES = 64 * 1024
+
+
+def detect_csv_encoding(uploaded_file):
+    """CSVの文字コードを判定（utf-8-sig / utf-8 / cp932）
+
+    先頭だけがASCIIのcp932ファイルをutf-8と誤判定して途中のチャンクで失敗しないよう、
+    ファイル全体をブロック単位でUTF-8として検証する。
+    """
+    uploaded_file.seek(0)
+    try:
+        if uploaded_file.read(len(codecs.BOM_UTF8)) == codecs.BOM_UTF8:
+            return 'utf-8-sig'
+        uploaded_file.seek(0)
+        decoder = codecs.getincrementaldecoder('utf-8')()
+        while True:
+            block = uploaded_file.read(CSV_ENCODING_BLOCK_BYTES)
+            # ブロック境界で途切れたマルチバイト文字は次のブロックと合わせて検証する
+            decoder.decode(block, final=not block)
+            if not block:
+                return 'utf-8'
+    except UnicodeDecodeError:
+        return 'cp932'
+    finally:
+        uploaded_file.seek(0)
+
+
+def read_csv_preview(uploaded_file, nrows=5):
+    """CSVの先頭数行だけを読み込む（カラム名の取得・プレビュー用）"""
+    encoding = detect_csv_encoding(uploaded_file)
+    preview_df = pd.read_csv(uploaded_file, encoding=encoding, nrows=nrows)
+    uploaded_file.seek(0)
+    return preview_df
+
+
+def iter_csv_chunks(uploaded_file, chunksize=IMPORT_CSV_CHUNK_SIZE, usecols=None):
+    """CSVをchunksize行ずつ読み込むジェネレータ（indexはファイル全体で連番）"""
+    encoding = detect_csv_encoding(uploaded_file)
+    with pd.read_csv(uploaded_file, encoding=encoding, chunksize=chunksize, usecols=usecols) as reader:
+        for chunk in reader:
+            yield chunk
+
+
+def merge_import_results(total, partial):
+    """チャンク単位のインポート結果を集計結果に加算"""
+    for key in ['success_count', 'update_count', 'skip_count']:
+        total[key] += partial.get(key, 0)
+    total['errors'].extend(partial.get('errors', []))
+    total['skipped_records'].extend(partial.get('skipped_records', []))
+    return total
+
+
+def run_chunked_import(uploaded_file, import_chunk, label, import_type=None, settings=None, force_rerun=False):
+    """アップロードCSVをチャンク単位で読み込み・インポートし、結果を集計して返す
+
+    import_chunk(chunk) はチャンクのDataFrameを受け取り、_new_import_result() 形式の辞書を返す。
+    プログレスバーは読み込み済みバイト数から更新する。
+
+    import_type を指定するとインポートジョブとして記録し、チャンクごとにチェックポイントを保存する。
+    同じファイル・同じ設定のジョブが中断していれば最後に完了したチャンクの次から再開し、
+    完了済みであれば（force_rerun=False の場合）インポートを行わずに前回の結果を案内し、None を返す。
+    """
+    job = None
+    chunksize = IMPORT_CSV_CHUNK_SIZE
+    if import_type:
+        file_hash = compute_file_hash(uploaded_file)
+        settings_hash = compute_settings_hash(settings or {})
+        job = find_import_job(import_type, file_hash, settings_hash)
+
+        if job and job['status'] == 'completed' and not force_rerun:
+            UIComponents.show_info(
+                f"同じファイルは {job['updated_at'][:16].replace('T', ' ')} にインポート済みです"
+                f"（新規登録 {job['success_count']}件, 更新 {job['update_count']}件, スキップ {job['skip_count']}件）。"
+                "再実行する場合は「インポート済みの同一ファイルも再実行する」を選択してください。"
+            )
+            return None
+
+        if job and job['status'] == 'running':
+            chunksize = job['chunk_size']
+            if job['last_committed_chunk'] >= 0:
+                UIComponents.show_info(
+                    f"前回中断したインポートを再開します（{(job['last_committed_chunk'] + 1) * chunksize:,}行目まで処理済み）"
+                )
+        else:
+            job = create_import_job(import_type, file_hash, settings_hash, getattr(uploaded_file, 'name', None), chunksize)
+
+    result = load_import_job_result(job) if job else _new_import_result()
+    progress_bar = st.progress(0)
+    progress_text = st.empty()
+    total_size = max(getattr(uploaded_file, 'size', 0) or len(uploaded_file.getvalue()), 1)
+    processed_rows = 0
+
+    for chunk_index, chunk in enumerate(iter_csv_chunks(uploaded_file, chunksize=chunksize)):
+        processed_rows += len(chunk)
+        if job and chunk_index <= job['last_committed_chunk']:
+            continue  # チェックポイント済みのチャンクは処理しない
+
+        chunk_result = import_chunk(chunk)
+        merge_import_results(result, chunk_result)
+        if job:
+            commit_import_job_chunk(job['job_id'], chunk_index, (chunk.index + 2).tolist(), chunk_result)
+
+        progress_bar.progress(min(uploaded_file.tell() / total_size, 1.0))
+        progress_text.text(f"{label}: {processed_rows:,}行を処理しました")
+
+    if job:
+        complete_import_job(job['job_id'])
+    progress_bar.progress(1.0)
+    progress_text.text(f"{label}: 全{processed_rows:,}行の処理が完了しました")
+    uploaded_file.seek(0)
+    return result
+
+
+def summarize_matching_csv(uploaded_file, required_columns):
+    """案件マッチングCSVの空値件数・候補者数・案件数・企業数をチャンク単位で集計"""
+    empty_counts = pd.Series(0, index=required_columns)
+    project_names = set()
+    company_names = set()
+    total_rows = 0
+    for chunk in iter_csv_chunks(uploaded_file, usecols=required_columns):
+        empty_counts += chunk[required_columns].isnull().sum()
+        project_names.update(chunk['project_name'].unique())
+        company_names.update(chunk['company_name'].unique())
+        total_rows += len(chunk)
+    uploaded_file.seek(0)
+    return {
+        'empty_counts': empty_counts,
+        'total_rows': total_rows,
+        'project_count': len(project_names),
+        'company_count': len(company_names)
+    }
+
+
+# =============================================================================
+# インポートジョブ管理（チェックポイント・再開）
+# =============================================================================
+
+# インポートジョブを記録するローカルSQLiteファイル
+IMPORT_JOB_DB_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), '.import_jobs.sqlite3')
+
+
+def _import_job_connection():
+    """インポートジョブDBへの接続を開く（テーブルがなければ作成）"""
+    conn = sqlite3.connect(IMPORT_JOB_DB_PATH, timeout=30)
+    conn.row_factory = sqlite3.Row
+    conn.executescript("""
+        CREATE TABLE IF NOT EXISTS import_jobs (
+            job_id TEXT PRIMARY KEY,
+            import_type TEXT NOT NULL,
+            file_hash TEXT NOT NULL,
+            settings_hash TEXT NOT NULL,
+            file_name TEXT,
+            chunk_size INTEGER NOT NULL,
+            status TEXT NOT NULL,
+            last_committed_chunk INTEGER NOT NULL DEFAULT -1,
+            success_count INTEGER NOT NULL DEFAULT 0,
+            update_count INTEGER NOT NULL DEFAULT 0,
+            skip_count INTEGER NOT NULL DEFAULT 0,
+            created_at TEXT NOT NULL,
+            updated_at TEXT NOT NULL
+        );
+        CREATE INDEX IF NOT EXISTS idx_import_jobs_file
+            ON import_jobs (import_type, file_hash, settings_hash);
+        CREATE TABLE IF NOT EXISTS import_job_rows (
+            job_id TEXT NOT NULL,
+            chunk_index INTEGER NOT NULL,
+            row_number INTEGER,
+            outcome TEXT NOT NULL,
+            detail TEXT
+        );
+        CREATE INDEX IF NOT EXISTS idx_import_job_rows_job
+            ON import_job_rows (job_id, outcome);
+    """)
+    return conn
+
+
+def compute_file_hash(uploaded_file, block_size=1024 * 1024):
+    """アップロードファイルのSHA-256ハッシュを計算"""
+    digest = hashlib.sha256()
+    uploaded_file.seek(0)
+    for block in iter(lambda: uploaded_file.read(block_size), b''):
+        digest.update(block)
+    uploaded_file.seek(0)
+    return digest.hexdigest()
+
+
+def compute_settings_hash(settings):
+    """インポート設定（カラムマッピング・重複処理方法など）のハッシュを計算"""
+    return hashlib.sha256(json.dumps(settings, ensure_ascii=False, sort_keys=True).encode('utf-8')).hexdigest()
+
+
+def find_import_job(import_type, file_hash, settings_hash):
+    """同じファイル・同じ設定の最新のインポートジョブを取得"""
+    with closing(_import_job_connection()) as conn:
+        row = conn.execute(
+            """SELECT * FROM import_jobs
+               WHERE import_type = ? AND file_hash = ? AND settings_hash = ?
+               ORDER BY created_at DESC LIMIT 1""",
+            (import_type, file_hash, settings_hash)
+        ).fetchone()
+    return dict(row) if row else None
+
+
+def create_import_job(import_type, file_hash, settings_hash, file_name, chunk_size):
+    """インポートジョブを新規作成し、ジョブ情報を返す"""
+    now = datetime.now().isoformat()
+    job = {
+        'job_id': uuid.uuid4().hex,
+        'import_type': import_type,
+        'file_hash': file_hash,
+        'settings_hash': settings_hash,
+        'file_name': file_name,
+        'chunk_size': chunk_size,
+        'status': 'running',
+        'last_committed_chunk': -1,
+        'success_count': 0,
+        'update_count': 0,
+        'skip_count': 0,
+        'created_at': now,
+        'updated_at': now
+    }
+    with closing(_import_job_connection()) as conn, conn:
+        conn.execute(
+            f"INSERT INTO import_jobs ({', '.join(job)}) VALUES ({', '.join('?' for _ in job)})",
+            list(job.values())
+        )
+    return job
+
+
+def commit_import_job_chunk(job_id, chunk_index, row_numbers, chunk_result):
+    """チャンクの処理結果（件数・行ごとの結果）を記録し、チェックポイントを進める"""
+    failed_rows = set()
+    outcomes = []
+    for error in chunk_result['errors']:
+        failed_rows.add(error['row'])
+        outcomes.append((job_id, chunk_index, error['row'] if isinstance(error['row'], int) else None,
+                         'error', json.dumps(error, ensure_ascii=False)))
+    for record in chunk_result['skipped_records']:
+        failed_rows.add(record['row'])
+        outcomes.append((job_id, chunk_index, record['row'], 'skipped', json.dumps(record, ensure_ascii=False)))
+    outcomes.extend((job_id, chunk_index, row_number, 'processed', None)
+                    for row_number in row_numbers if row_number not in failed_rows)
+
+    with closing(_import_job_connection()) as conn, conn:
+        conn.executemany(
+            "INSERT INTO import_job_rows (job_id, chunk_index, row_number, outcome, detail) VALUES (?, ?, ?, ?, ?)",
+            outcomes
+        )
+        conn.execute(
+            """UPDATE import_jobs
+               SET last_committed_chunk = ?,
+                   success_count = success_count + ?,
+                   update_count = update_count + ?,
+                   skip_count = skip_count + ?,
+                   updated_at = ?
+               WHERE job_id = ?""",
+            (chunk_index, chunk_result['success_count'], chunk_result['update_count'],
+             chunk_result['skip_count'], datetime.now().isoformat(), job_id)
+        )
+
+
+def complete_import_job(job_id):
+    """インポートジョブを完了状態にする"""
+    with closing(_import_job_connection()) as conn, conn:
+        conn.execute(
+            "UPDATE import_jobs SET status = 'completed', updated_at = ? WHERE job_id = ?",
+            (datetime.now().isoformat(), job_id)
+        )
+
+
+def load_import_job_result(job):
+    """記録済みのチャンク結果から _new_import_result() 形式の集計結果を復元"""
+    result = _new_import_result()
+    result['success_count'] = job['success_count']
+    result['update_count'] = job['update_count']
+    result['skip_count'] = job['skip_count']
+    with closing(_import_job_connection()) as conn:
+        rows = conn.execute(
+            """SELECT outcome, detail FROM import_job_rows
+               WHERE job_id = ? AND outcome IN ('error', 'skipped') AND chunk_index <= ?
+               ORDER BY chunk_index, row_number""",
+            (job['job_id'], job['last_committed_chunk'])
+        ).fetchall()
+    for row in rows:
+        target = 'errors' if row['outcome'] == 'error' else 'skipped_records'
+        result[target].append(json.loads(row['detail']))
+    return result
+
+
 def show_data_import():
     """📥 データインポート機能"""
     st.title("📥 データインポート")
@@ -6890,6 +8126,11 @@ def show_data_import():
                 index=0,
                 help="既存データと同じ情報がある場合の処理方法を選択してください"
             )
+            force_rerun = st.checkbox(
+                "🔁 インポート済みの同一ファイルも再実行する",
+                value=False,
+                help="同じファイル・同じ設定で完了済みのインポートは通常スキップされます。中断したインポートは自動的に続きから再開します"
+            )
         
         with col2:
             st.info("""
@@ -6934,8 +8175,8 @@ def show_data_import():
         
         if uploaded_file:
             try:
-                # CSVを読み込み
-                df = pd.read_csv(uploaded_file, encoding='utf-8')
+                # CSVの先頭行のみ読み込み（カラム名・プレビュー用。インポートはチャンク単位で実行）
+                df = read_csv_preview(uploaded_file)
                 
                 # データプレビュー
                 st.write("**データプレビュー:**")
@@ -6971,7 +8212,17 @@ def show_data_import():
                         st.warning("⚠️ データベース接続がありません。サンプルデータモードでは実際のインポートはできません。")
                         return
                         
-                    success_count, error_count, errors, skipped_records = import_company_data(df, company_name_col, industry_col, target_dept_col, duplicate_handling)
+                    result = run_chunked_import(
+                        uploaded_file,
+                        lambda chunk: bulk_import_companies(chunk, company_name_col, industry_col, duplicate_handling),
+                        "企業データ",
+                        import_type='company',
+                        settings={'company_name': company_name_col, 'industry': industry_col, 'duplicate_handling': duplicate_handling},
+                        force_rerun=force_rerun
+                    )
+                    if result is None:
+                        return  # インポート済みのファイル（案内は表示済み）
+                    success_count, error_count, errors, skipped_records = show_company_import_result(result)
                     
                     # 結果サマリー表示
                     st.markdown("### 📊 インポート結果")
@@ -7002,7 +8253,7 @@ def show_data_import():
                                 st.write(f"... 他{len(errors)-20}件のエラー")
                     
                     if success_count > 0:
-                        st.cache_data.clear()
+                        invalidate_tables('companies')
                         st.rerun()
                     
             except Exception as e:
@@ -7037,8 +8288,8 @@ def show_data_import():
         
         if uploaded_file:
             try:
-                # CSVを読み込み
-                df = pd.read_csv(uploaded_file, encoding='utf-8')
+                # CSVの先頭行のみ読み込み（カラム名・プレビュー用。インポートはチャンク単位で実行）
+                df = read_csv_preview(uploaded_file)
                 
                 # データプレビュー
                 st.write("**データプレビュー:**")
@@ -7102,10 +8353,20 @@ def show_data_import():
                         st.warning("⚠️ データベース接続がありません。サンプルデータモードでは実際のインポートはできません。")
                         return
                         
-                    success_count = import_project_data(df, mapping_config, duplicate_handling)
+                    result = run_chunked_import(
+                        uploaded_file,
+                        lambda chunk: import_project_rows(chunk, mapping_config, duplicate_handling),
+                        "案件データ",
+                        import_type='project',
+                        settings={**mapping_config, 'duplicate_handling': duplicate_handling},
+                        force_rerun=force_rerun
+                    )
+                    if result is None:
+                        return  # インポート済みのファイル（案内は表示済み）
+                    success_count = show_project_import_result(result)
                     if success_count > 0:
                         st.success(f"✅ {success_count}件の案件データをインポートしました")
-                        st.cache_data.clear()
+                        invalidate_tables('projects')
                         st.rerun()
                     
             except Exception as e:
@@ -7140,8 +8401,8 @@ def show_data_import():
         
         if uploaded_file:
             try:
-                # CSVを読み込み
-                df = pd.read_csv(uploaded_file, encoding='utf-8')
+                # CSVの先頭行のみ読み込み（カラム名・プレビュー用。インポートはチャンク単位で実行）
+                df = read_csv_preview(uploaded_file)
                 
                 # データプレビュー
                 st.write("**データプレビュー:**")
@@ -7282,10 +8543,20 @@ def show_data_import():
                         st.warning("⚠️ データベース接続がありません。サンプルデータモードでは実際のインポートはできません。")
                         return
                         
-                    success_count = import_contact_data(df, mapping_config, duplicate_handling)
+                    result = run_chunked_import(
+                        uploaded_file,
+                        lambda chunk: bulk_import_contacts(chunk, mapping_config, duplicate_handling),
+                        "コンタクトデータ",
+                        import_type='contact',
+                        settings={**mapping_config, 'duplicate_handling': duplicate_handling},
+                        force_rerun=force_rerun
+                    )
+                    if result is None:
+                        return  # インポート済みのファイル（案内は表示済み）
+                    success_count = show_contact_import_result(result)
                     if success_count > 0:
                         st.success(f"✅ {success_count}件のコンタクトデータをインポートしました")
-                        st.cache_data.clear()
+                        invalidate_tables('contacts', 'contact_approaches')
                         st.rerun()
                     
             except Exception as e:
@@ -7320,8 +8591,8 @@ def show_data_import():
         
         if uploaded_file:
             try:
-                # CSVを読み込み
-                df = pd.read_csv(uploaded_file, encoding='utf-8')
+                # CSVの先頭行のみ読み込み（カラム名・プレビュー用。インポートはチャンク単位で実行）
+                df = read_csv_preview(uploaded_file)
                 
                 # データプレビュー
                 st.write("**データプレビュー:**")
@@ -7343,19 +8614,19 @@ def show_data_import():
                     # データ検証
                     st.write("**データ検証結果:**")
                     
-                    # 空値チェック
-                    empty_check = df[required_columns].isnull().sum()
+                    # 空値チェック・データ概要（必須カラムのみをチャンク単位で集計）
+                    summary = summarize_matching_csv(uploaded_file, required_columns)
+                    empty_check = summary['empty_counts']
                     if empty_check.sum() > 0:
                         st.warning("⚠️ 以下のカラムに空値があります:")
                         for col, count in empty_check[empty_check > 0].items():
                             st.write(f"  - {col}: {count}行")
                     
                     # 案件存在チェック
-                    unique_projects = df['project_name'].unique()
                     st.write(f"**📊 データ概要:**")
-                    st.write(f"- 候補者数: {len(df)}名")
-                    st.write(f"- 案件数: {len(unique_projects)}件")
-                    st.write(f"- 企業数: {len(df['company_name'].unique())}社")
+                    st.write(f"- 候補者数: {summary['total_rows']}名")
+                    st.write(f"- 案件数: {summary['project_count']}件")
+                    st.write(f"- 企業数: {summary['company_count']}社")
                     
                     # インポートボタン
                     if st.button("📥 案件マッチングデータをインポート", type="primary", key="import_matching"):
@@ -7363,7 +8634,19 @@ def show_data_import():
                             st.warning("⚠️ データベース接続がありません。サンプルデータモードでは実際のインポートはできません。")
                         else:
                             with st.spinner("インポート処理中..."):
-                                success_count, error_count, errors = import_matching_data(df, duplicate_handling)
+                                result = run_chunked_import(
+                                    uploaded_file,
+                                    lambda chunk: import_matching_chunk(chunk, duplicate_handling),
+                                    "案件マッチングデータ",
+                                    import_type='matching',
+                                    settings={'duplicate_handling': duplicate_handling},
+                                    force_rerun=force_rerun
+                                )
+                                if result is None:
+                                    return  # インポート済みのファイル（案内は表示済み）
+                                success_count = result['success_count']
+                                errors = result['errors']
+                                error_count = len(errors)
                                 
                                 # 結果サマリー表示
                                 st.markdown("### 📊 インポート結果")
@@ -7406,7 +8689,7 @@ def show_data_import():
                                         st.info("**必須項目エラー**: 姓、名、企業名、メールアドレス、プロフィール、案件名がすべて入力されているか確認してください")
                                 
                                 if success_count > 0:
-                                    st.cache_data.clear()
+                                    invalidate_tables('contacts', 'companies', 'project_assignments')
                                     st.rerun()
                     
             except Exception as e:
@@ -7534,159 +8817,677 @@ def generate_matching_sample_csv():
     return df.to_csv(index=False, encoding='utf-8-sig')
 
 
-def import_company_data(df, company_name_col, industry_col, target_dept_col, duplicate_handling):
-    """企業データをデータベースにインポート"""
-    success_count = 0
-    skip_count = 0
-    update_count = 0
-    error_count = 0
-    errors = []
-    skipped_records = []  # スキップされたレコードの詳細を保存
-    
-    try:
-        for _, row in df.iterrows():
-            company_name = str(row[company_name_col]).strip()
-            
-            # 空の行はスキップ
-            if not company_name or company_name.lower() in ['nan', 'null', '']:
-                row_number = _ + 2  # DataFrameのindexは0から始まるが、CSVは1行目がヘッダーなので+2
-                skipped_records.append({
-                    'row': row_number,
-                    'company': '（空白）',
-                    'reason': '企業名が空白または無効です'
-                })
-                skip_count += 1
+# =============================================================================
+# インポート前処理（カラム単位の正規化・検証）
+# =============================================================================
+
+# 業種マッピング（CSVの略称 → 業種マスタ名）
+INDUSTRY_MAPPING = {
+    'SIer': 'IT・情報通信業',
+    'IT': 'IT・情報通信業',
+    '製造': '製造業',
+    '金融': '金融業',
+    '商社': '卸売業・小売業',
+    'コンサル': 'サービス業'
+}
+
+
+# 空白として扱う値（小文字比較）
+BLANK_IMPORT_VALUES = ['nan', 'null', '']
+
+# メールアドレスの形式チェック（ローカル部@ドメイン.TLD）
+EMAIL_SHAPE_PATTERN = r'^[^@\s]+@[^@\s]+\.[^@\s]+$'
+
+
+def normalize_text_column(series):
+    """カラムを文字列化・前後空白除去し、空白/NaN/nullをNAにしたstring型Seriesを返す"""
+    text = series.astype('string').str.strip()
+    blank = text.isna() | text.str.lower().isin(BLANK_IMPORT_VALUES).fillna(True)
+    return text.mask(blank)
+
+
+def parse_date_column(series):
+    """'YYYY/MM/DD' または 'YYYY-MM-DD' 形式の日付カラムをdatetimeに変換（解析できない値はNaT）"""
+    slash_dates = pd.to_datetime(
+        series.where(series.str.contains('/', regex=False).fillna(False)),
+        format='%Y/%m/%d', errors='coerce'
+    )
+    dash_dates = pd.to_datetime(
+        series.where(series.str.contains('-', regex=False).fillna(False)),
+        format='%Y-%m-%d', errors='coerce'
+    )
+    return slash_dates.fillna(dash_dates)
+
+
+def parse_age_or_birth_column(series, today=None):
+    """年齢/生年月日カラムを解析
+
+    '-'を含む値は生年月日（YYYY-MM-DD）として birth_date / actual_age を、
+    それ以外は年齢表記として estimated_age を返す。生年月日として解析できない値は birth_error=True。
+    """
+    today = today or date.today()
+    is_birth = series.str.contains('-', regex=False).fillna(False)
+    birth_dates = pd.to_datetime(series.where(is_birth), format='%Y-%m-%d', errors='coerce')
+
+    actual_age = _age_from_birth_dates(birth_dates, today)
+
+    return pd.DataFrame({
+        'estimated_age': series.where(~is_birth),
+        'birth_date': birth_dates.dt.strftime('%Y-%m-%d'),
+        'actual_age': actual_age.where(birth_dates.notna()).astype('Int64'),
+        'birth_error': is_birth & birth_dates.isna()
+    }, index=series.index)
+
+
+def prepare_import_frame(df, column_map, required=(), required_reason='必須項目が不足しています',
+                         email_key=None, industry_key=None):
+    """インポート対象のDataFrameをカラム単位で正規化・検証
+
+    column_map: {論理名: CSVカラム名}（'選択しない'・存在しないカラムは全行NA）
+
+    Returns:
+        (values, status)
+        values: 論理名をカラムに持つ正規化済みの値（空白はNA）
+        status: row_number（CSV行番号）/ is_valid / reason を持つ行ステータス
+    """
+    values = pd.DataFrame(index=df.index)
+    for key, col_name in column_map.items():
+        if col_name and col_name != '選択しない' and col_name in df.columns:
+            values[key] = normalize_text_column(df[col_name])
+        else:
+            values[key] = pd.Series(pd.NA, index=df.index, dtype='string')
+
+    if industry_key:
+        # 業種マッピング（マッピングにない値はそのまま）
+        values[industry_key] = values[industry_key].map(INDUSTRY_MAPPING).fillna(values[industry_key])
+
+    status = pd.DataFrame({
+        'row_number': df.index + 2,  # DataFrameのindexは0から始まるが、CSVは1行目がヘッダーなので+2
+        'is_valid': True,
+        'reason': pd.Series(pd.NA, index=df.index, dtype='string')
+    }, index=df.index)
+
+    if required:
+        missing = values[list(required)].isna().any(axis=1)
+        status.loc[missing, 'is_valid'] = False
+        status.loc[missing, 'reason'] = required_reason
+
+    if email_key:
+        bad_email = status['is_valid'] & ~values[email_key].str.match(EMAIL_SHAPE_PATTERN).fillna(True)
+        status.loc[bad_email, 'is_valid'] = False
+        status.loc[bad_email, 'reason'] = 'メールアドレスの形式が不正です'
+
+    return values, status
+
+
+def invalid_import_rows(values, status):
+    """行ステータスで無効と判定された行を(行番号, 理由, 値の辞書)で返す"""
+    invalid = ~status['is_valid']
+    return zip(
+        status.loc[invalid, 'row_number'].tolist(),
+        status.loc[invalid, 'reason'].tolist(),
+        _records_with_none(values[invalid])
+    )
+
+
+def valid_import_rows(values, status):
+    """行ステータスで有効と判定された行を(index, 行番号, 値の辞書)で返す"""
+    valid = status['is_valid']
+    return zip(values.index[valid].tolist(), status.loc[valid, 'row_number'].tolist(), _records_with_none(values[valid]))
+
+
+def _records_with_none(frame):
+    """DataFrameを辞書のリストに変換（NA/NaNはNoneに置換）"""
+    return frame.astype(object).where(frame.notna(), None).to_dict('records')
+
+
+# =============================================================================
+# 企業名の名寄せ（正規化・あいまい一致）
+# =============================================================================
+
+COMPANY_NAME_INDEX_TABLES = ('companies', 'target_companies')
+# 法人格の表記ゆれ → 正規化キーに付ける代表表記（NFKC正規化・小文字化後の表記に対して適用）
+# 法人格は除去せず代表表記に揃えるため、前株・後株や略記（(株)・k.k.）は同じキーになり、法人格の異なる企業は別のキーになる
+_LATIN_WORD_START = r'(?<![a-z0-9])'
+_LATIN_WORD_END = r'(?![a-z0-9])'
+COMPANY_LEGAL_FORMS = tuple((token, re.compile(pattern)) for token, pattern in (
+    ('株式会社', rf'株式会社|\(株\)|{_LATIN_WORD_START}(?:k\.?\s?k|kabushiki\s?kaisha)\.?{_LATIN_WORD_END}'),
+    ('有限会社', rf'有限会社|\(有\)|{_LATIN_WORD_START}yugen\s?kaisha{_LATIN_WORD_END}'),
+    ('合同会社', r'合同会社|\(同\)'),
+    ('合資会社', r'合資会社|\(資\)'),
+    ('合名会社', r'合名会社|\(名\)'),
+    ('一般社団法人', r'一般社団法人'),
+    ('公益社団法人', r'公益社団法人'),
+    ('一般財団法人', r'一般財団法人'),
+    ('公益財団法人', r'公益財団法人'),
+    ('社団法人', r'社団法人|\(社\)'),
+    ('財団法人', r'財団法人|\(財\)'),
+    ('社会福祉法人', r'社会福祉法人|\(福\)'),
+    ('医療法人', r'医療法人|\(医\)'),
+    ('学校法人', r'学校法人|\(学\)'),
+    ('特定非営利活動法人', r'特定非営利活動法人|npo法人'),
+    ('ltd', rf'{_LATIN_WORD_START}(?:co\.?,?\s?)?(?:ltd|limited){_LATIN_WORD_END}\.?'),
+    ('inc', rf'{_LATIN_WORD_START}inc(?:orporated)?{_LATIN_WORD_END}\.?'),
+    ('corp', rf'{_LATIN_WORD_START}corp(?:oration)?{_LATIN_WORD_END}\.?'),
+    ('llc', rf'{_LATIN_WORD_START}llc{_LATIN_WORD_END}\.?'),
+))
+# 比較時に無視する空白・記号
+COMPANY_NAME_NOISE = re.compile(r'[\s・･.,、。\-‐_/\'"&]')
+# あいまい一致（文字bigramのDice係数）で同一企業とみなす下限
+COMPANY_FUZZY_THRESHOLD = 0.85
+
+
+@functools.lru_cache(maxsize=65536)
+def normalize_company_name(name):
+    """企業名の比較用キー（NFKC・小文字化・空白記号の除去、法人格は位置を問わず末尾の代表表記に揃える）"""
+    text = unicodedata.normalize('NFKC', name or '').lower()
+    legal_forms = []
+    for token, pattern in COMPANY_LEGAL_FORMS:
+        text, count = pattern.subn(' ', text)
+        if count:
+            legal_forms.append(token)
+    return COMPANY_NAME_NOISE.sub('', text) + ''.join(legal_forms)
+
+
+def _name_ngrams(key):
+    """文字bigramの集合（1文字の名前はその文字のみ）"""
+    return {key[i:i + 2] for i in range(len(key) - 1)} or {key}
+
+
+@cache_by_tables(COMPANY_NAME_INDEX_TABLES)
+def load_company_name_index():
+    """companies・target_companies の企業名索引を作成（参照テーブルのバージョン単位でキャッシュ）
+
+    Returns:
+        {'keys': {正規化キー: {テーブル名: ID}}, 'names': {テーブル名: {ID: 企業名}}, 'ngrams': {bigram: [正規化キー]}}
+    """
+    index = {'keys': {}, 'names': {}, 'ngrams': {}}
+    for table_name in COMPANY_NAME_INDEX_TABLES:
+        id_column = TABLE_PRIMARY_KEYS[table_name]
+        names = index['names'].setdefault(table_name, {})
+        for row in iter_table_rows(table_name, f'{id_column}, company_name', order_by=id_column, parallel=True):
+            key = normalize_company_name(row['company_name'])
+            if not key:
                 continue
-            
-            # 重複チェック（統合企業マスタを使用）
-            existing_company = supabase.table('companies').select('company_id').eq('company_name', company_name).execute()
-            
-            if existing_company.data:
-                # 重複データが存在する場合
-                if duplicate_handling == "重複をスキップ（新規のみ登録）":
-                    row_number = _ + 2
-                    skipped_records.append({
-                        'row': row_number,
-                        'company': company_name,
-                        'reason': '重複企業（既存のデータが存在）'
-                    })
-                    skip_count += 1
-                    continue
-                elif duplicate_handling == "重複を更新（既存データを更新）":
-                    # 既存データを更新
-                    company_id = existing_company.data[0]['company_id']
-                    update_data = {'updated_at': datetime.now().isoformat()}
-                    
-                    # 業種情報があれば追加
-                    if industry_col != '選択しない' and industry_col in df.columns:
-                        industry = str(row[industry_col]).strip()
-                        if industry and industry.lower() not in ['nan', 'null', '']:
-                            industry_mapping = {
-                                'SIer': 'IT・情報通信業',
-                                'IT': 'IT・情報通信業',
-                                '製造': '製造業',
-                                '金融': '金融業',
-                                '商社': '卸売業・小売業',
-                                'コンサル': 'サービス業'
-                            }
-                            mapped_industry = industry_mapping.get(industry, industry)
-                            update_data['industry'] = mapped_industry
-                    
-                    supabase.table('companies').update(update_data).eq('company_id', company_id).execute()
-                    update_count += 1
-                    continue
-            
-            # 企業データ作成
-            company_data = {
-                'company_name': company_name,
-                'created_at': datetime.now().isoformat(),
-                'updated_at': datetime.now().isoformat()
-            }
-            
-            # 業種情報があれば追加
-            if industry_col != '選択しない' and industry_col in df.columns:
-                industry = str(row[industry_col]).strip()
-                if industry and industry.lower() not in ['nan', 'null', '']:
-                    # 業種マッピング（必要に応じて調整）
-                    industry_mapping = {
-                        'SIer': 'IT・情報通信業',
-                        'IT': 'IT・情報通信業',
-                        '製造': '製造業',
-                        '金融': '金融業',
-                        '商社': '卸売業・小売業',
-                        'コンサル': 'サービス業'
-                    }
-                    mapped_industry = industry_mapping.get(industry, industry)
-                    company_data['industry'] = mapped_industry
-            
-            # 企業をデータベースに挿入
-            company_response = supabase.table('companies').insert(company_data).execute()
+            names[row[id_column]] = row['company_name']
+            # 同じキーの企業が複数ある場合はIDの小さい（先に登録された）方を採用
+            index['keys'].setdefault(key, {}).setdefault(table_name, row[id_column])
+
+    for key in index['keys']:
+        for gram in _name_ngrams(key):
+            index['ngrams'].setdefault(gram, []).append(key)
+    return index
+
+
+def _fuzzy_company_key(key, index, table_name):
+    """table_name に行がある正規化キーのうちbigramの一致率が最も高いものを返す（閾値未満・同率首位が複数の場合はNone）"""
+    grams = _name_ngrams(key)
+    shared = {}
+    for gram in grams:
+        for candidate in index['ngrams'].get(gram, ()):
+            if table_name in index['keys'][candidate]:
+                shared[candidate] = shared.get(candidate, 0) + 1
+    scores = sorted(
+        ((2 * count / (len(grams) + len(_name_ngrams(candidate))), candidate) for candidate, count in shared.items()),
+        reverse=True
+    )
+    if not scores or scores[0][0] < COMPANY_FUZZY_THRESHOLD:
+        return None
+    if len(scores) > 1 and scores[1][0] == scores[0][0]:
+        return None
+    return scores[0][1]
 
-            if company_response.data:
-                company_id = company_response.data[0]['company_id']
-                success_count += 1
-                
-                # ターゲット部署情報があれば部署テーブルに追加
-                if target_dept_col != '選択しない' and target_dept_col in df.columns:
-                    target_dept = str(row[target_dept_col]).strip()
-                    if target_dept and target_dept.lower() not in ['nan', 'null', '']:
-                        dept_data = {
-                            'company_id': company_id,
-                            'department_name': target_dept,
-                            'is_target_department': True,
-                            'created_at': datetime.now().isoformat(),
-                            'updated_at': datetime.now().isoformat()
-                        }
-                        # 部署マスタは廃止：各コンタクトに直接部署名を保存
-                        pass
-        
-        # 結果表示（必ず表示）
-        total_processed = success_count + skip_count + update_count
-        if total_processed > 0:
-            if success_count > 0:
-                st.success(f"✅ 企業データ処理完了: 新規登録 {success_count}件")
-            result_message = f"📊 処理結果詳細: 新規登録 {success_count}件"
-            if skip_count > 0:
-                result_message += f", スキップ {skip_count}件"
-            if update_count > 0:
-                result_message += f", 更新 {update_count}件"
-            st.info(result_message)
+
+def resolve_company_ids(names, table_name='companies', fuzzy=False):
+    """企業名のリストをまとめてIDに解決する
+
+    表記ゆれ（法人格の位置・略記、全角半角、空白）は正規化キーで吸収し、
+    一致しない名前は fuzzy=True の場合のみ文字bigramの類似度で補完する。
+    あいまい一致は別企業に解決されることがあるため、書き込みを伴う処理では使わない。
+
+    Returns:
+        {企業名: ID}（解決できなかった名前は含まない）
+    """
+    index = load_company_name_index()
+    resolved = {}
+    for name in dict.fromkeys(n for n in names if n):
+        key = normalize_company_name(name)
+        ids = index['keys'].get(key)
+        if (not ids or table_name not in ids) and fuzzy:
+            fuzzy_key = _fuzzy_company_key(key, index, table_name)
+            ids = index['keys'].get(fuzzy_key) if fuzzy_key else ids
+        if ids and table_name in ids:
+            resolved[name] = ids[table_name]
+    return resolved
+
+
+def suggest_company_names(names, table_name='companies'):
+    """正規化キーで一致しない企業名に、あいまい一致で見つかった登録済みの企業名を提案する
+
+    Returns:
+        {企業名: 登録済みの企業名}（提案がない名前は含まない）
+    """
+    exact = resolve_company_ids(names, table_name)
+    fuzzy = resolve_company_ids([n for n in names if n and n not in exact], table_name, fuzzy=True)
+    return {name: company_canonical_name(company_id, table_name) for name, company_id in fuzzy.items()}
+
+
+def company_not_found_reason(company_name, suggestions):
+    """企業が見つからない行のスキップ理由（あいまい一致の候補があれば併記）"""
+    reason = f'企業「{company_name}」が見つかりません。先に企業データをインポートしてください。'
+    if suggestions.get(company_name):
+        reason += f'（登録済みの「{suggestions[company_name]}」の誤記の場合は企業名を修正してください）'
+    return reason
+
+
+def company_canonical_name(company_id, table_name='companies'):
+    """索引に登録されている企業名（IDが見つからない場合はNone）"""
+    return load_company_name_index()['names'].get(table_name, {}).get(company_id)
+
+
+def fetch_target_company(company_name, columns='*'):
+    """企業名に対応する target_companies の行を取得（正規化キーでIDを解決、見つからない場合はNone）
+
+    結果は保存先の特定にも使うため、あいまい一致は行わない。
+    """
+    target_company_id = resolve_company_ids([company_name], 'target_companies').get(company_name)
+    query = supabase.table('target_companies').select(columns)
+    if target_company_id is not None:
+        result = query.eq('target_company_id', target_company_id).execute()
+    else:
+        # 索引の更新前に追加された行も拾えるよう完全一致で確認
+        result = query.eq('company_name', company_name).execute()
+    return result.data[0] if result.data else None
+
+
+def save_target_company_fields(company_name, fields):
+    """企業名に対応する target_companies の行を更新（ない場合は作成）し、保存後の行を返す"""
+    existing = fetch_target_company(company_name, 'target_company_id')
+    if existing:
+        result = supabase.table('target_companies').update(fields).eq(
+            'target_company_id', existing['target_company_id']
+        ).execute()
+    else:
+        result = supabase.table('target_companies').insert({'company_name': company_name, **fields}).execute()
+    invalidate_tables('target_companies')
+    return result.data[0] if result.data else None
+
+
+# =============================================================================
+# バルクインポートエンジン
+# =============================================================================
+
+# 一括書き込み1リクエストあたりの行数
+IMPORT_BATCH_SIZE = 500
+# in_()フィルタ1回あたりの値の数（URL長の上限対策）
+IMPORT_LOOKUP_BATCH_SIZE = 200
+
+def _chunked(items, size):
+    """リストをsize件ずつに分割して返す"""
+    for start in range(0, len(items), size):
+        yield items[start:start + size]
+
+
+def prefetch_rows_by_values(table_name, column, values, select_columns='*'):
+    """指定カラムの値に一致する行をin_()でまとめて取得"""
+    unique_values = list(dict.fromkeys(v for v in values if v is not None))
+    rows = []
+    for batch in _chunked(unique_values, IMPORT_LOOKUP_BATCH_SIZE):
+        response = supabase.table(table_name).select(select_columns).in_(column, batch).execute()
+        if response.data:
+            rows.extend(response.data)
+    return rows
+
+
+def prefetch_id_map(table_name, name_column, id_column, names):
+    """名称 → IDの辞書をまとめて取得（同名が複数ある場合は最初の行を採用）"""
+    id_map = {}
+    for row in prefetch_rows_by_values(table_name, name_column, names, f'{id_column}, {name_column}'):
+        id_map.setdefault(row[name_column], row[id_column])
+    return id_map
+
+
+def iter_bulk_writes(table_name, records, on_conflict=None, batch_size=IMPORT_BATCH_SIZE):
+    """(行番号リスト, 書き込みデータ)のリストを一括insert/upsertする
+
+    PostgRESTの一括書き込みは全行のキーが揃っている必要があるため、
+    カラム構成が同じ行同士でまとめてからbatch_size件ずつ送信する。
+    バッチごとに(行番号リスト, 返却データ, エラーメッセージ)を返す。
+    """
+    groups = {}
+    for row_numbers, payload in records:
+        groups.setdefault(tuple(sorted(payload)), []).append((row_numbers, payload))
+
+    for group in groups.values():
+        for batch in _chunked(group, batch_size):
+            row_numbers = [number for numbers, _ in batch for number in numbers]
+            payloads = [payload for _, payload in batch]
+            try:
+                query = supabase.table(table_name)
+                if on_conflict:
+                    response = query.upsert(payloads, on_conflict=on_conflict).execute()
+                else:
+                    response = query.insert(payloads).execute()
+                yield row_numbers, response.data or [], None
+            except Exception as e:
+                yield row_numbers, [], str(e)
+
+
+def _new_import_result():
+    """インポート結果の集計用辞書を生成"""
+    return {
+        'success_count': 0,
+        'update_count': 0,
+        'skip_count': 0,
+        'errors': [],
+        'skipped_records': []
+    }
+
+
+def bulk_import_companies(df, company_name_col, industry_col, duplicate_handling):
+    """企業データを一括インポート（事前取得 + チャンク単位の一括書き込み）"""
+    result = _new_import_result()
+    now = datetime.now().isoformat()
+
+    # 1. カラム単位の正規化・検証
+    values, status = prepare_import_frame(
+        df,
+        {'company_name': company_name_col, 'industry': industry_col},
+        required=['company_name'],
+        required_reason='企業名が空白または無効です',
+        industry_key='industry'
+    )
+    for row_number, reason, _ in invalid_import_rows(values, status):
+        result['skipped_records'].append({'row': row_number, 'company': '（空白）', 'reason': reason})
+        result['skip_count'] += 1
+
+    parsed_rows = [
+        (row_number, row['company_name'], row['industry'])
+        for _, row_number, row in valid_import_rows(values, status)
+    ]
+
+    # 2. 既存企業を名寄せ（法人格の位置・略記、全角半角、空白の表記ゆれのみ吸収し、別企業を統合しないようあいまい一致は使わない）
+    existing_ids = resolve_company_ids([r[1] for r in parsed_rows], fuzzy=False)
+
+    # 3. 重複判定（CSV内の重複も含めメモリ上で解決）
+    inserts = {}  # 正規化した企業名 -> (行番号リスト, データ)
+    updates = {}  # company_id -> (行番号リスト, データ)
+    for row_number, company_name, industry in parsed_rows:
+        company_id = existing_ids.get(company_name)
+        name_key = normalize_company_name(company_name)
+        if company_id is None and name_key not in inserts:
+            company_data = {'company_name': company_name, 'created_at': now, 'updated_at': now}
+            if industry:
+                company_data['industry'] = industry
+            inserts[name_key] = ([row_number], company_data)
+            continue
+
+        if duplicate_handling == "重複をスキップ（新規のみ登録）":
+            result['skipped_records'].append({
+                'row': row_number,
+                'company': company_name,
+                'reason': '重複企業（既存のデータが存在）'
+            })
+            result['skip_count'] += 1
+            continue
+
+        if company_id is not None:
+            # 企業名は登録済みの表記を維持する
+            row_numbers, update_data = updates.setdefault(
+                company_id,
+                ([], {'company_id': company_id, 'company_name': company_canonical_name(company_id) or company_name,
+                      'updated_at': now})
+            )
+        else:
+            # 同じCSV内で先に登録予定の行へ統合
+            row_numbers, update_data = inserts[name_key]
+        row_numbers.append(row_number)
+        if industry:
+            update_data['industry'] = industry
+
+    # 4. 一括書き込み
+    for row_numbers, data, error in iter_bulk_writes('companies', list(inserts.values())):
+        if error:
+            result['errors'].extend({'row': n, 'message': f"登録に失敗しました: {error}"} for n in row_numbers)
+        else:
+            result['success_count'] += len(data)
+            result['update_count'] += len(row_numbers) - len(data)
+
+    for row_numbers, data, error in iter_bulk_writes('companies', list(updates.values()), on_conflict='company_id'):
+        if error:
+            result['errors'].extend({'row': n, 'message': f"更新に失敗しました: {error}"} for n in row_numbers)
+        else:
+            result['update_count'] += len(row_numbers)
+
+    # 次のチャンクの名寄せに登録・更新した企業を反映させる
+    if inserts or updates:
+        invalidate_tables('companies')
+
+    result['skipped_records'].sort(key=lambda record: record['row'])
+    return result
+
+
+def bulk_import_contacts(df, mapping_config, duplicate_handling):
+    """コンタクトデータを一括インポート（事前取得 + チャンク単位の一括書き込み）"""
+    result = _new_import_result()
+    now = datetime.now().isoformat()
+
+    optional_fields = {
+        'department': 'department_name',
+        'position': 'position_name',
+        'age': 'estimated_age',
+        'status': 'screening_status'
+    }
+
+    # 1. カラム単位の正規化と必須項目のバリデーション（企業名、氏名、メールアドレス）
+    column_map = {key: mapping_config.get(key) for key in ['company_name', 'full_name', 'email', 'priority', 'assignee']}
+    column_map.update({key: mapping_config.get(key) for key in optional_fields})
+    values, status = prepare_import_frame(
+        df,
+        column_map,
+        required=['company_name', 'full_name', 'email'],
+        required_reason='必須項目（企業名・氏名・メール）が不足しています',
+        email_key='email'
+    )
+    for row_number, reason, row in invalid_import_rows(values, status):
+        result['skipped_records'].append({
+            'row': row_number,
+            'company': row['company_name'] or '(空欄)',
+            'name': row['full_name'] or '(空欄)',
+            'email': row['email'] or '(空欄)',
+            'reason': reason
+        })
+        result['skip_count'] += 1
+
+    parsed_rows = []
+    for index, row_number, row in valid_import_rows(values, status):
+        parsed_rows.append({
+            'row_number': row_number,
+            'index': index,
+            'company_name': row['company_name'],
+            'full_name': row['full_name'],
+            'email': row['email'],
+            'fields': {db_field: row[key] for key, db_field in optional_fields.items() if row[key] is not None},
+            'priority': row['priority'],
+            'assignee': row['assignee']
+        })
+
+    # 2. 参照データ・既存コンタクトをまとめて取得
+    company_ids = resolve_company_ids([r['company_name'] for r in parsed_rows])
+    company_suggestions = suggest_company_names([r['company_name'] for r in parsed_rows])
+    priority_ids = prefetch_id_map('priority_levels', 'priority_name', 'priority_id', [r['priority'] for r in parsed_rows])
+    assignee_ids = prefetch_id_map('search_assignees', 'assignee_name', 'assignee_id', [r['assignee'] for r in parsed_rows])
+
+    # 重複チェック（氏名 + メールアドレスで判定）
+    # 企業が異なっても同一人物と判定
+    existing_contacts = {}
+    for contact in prefetch_rows_by_values('contacts', 'email_address', [r['email'] for r in parsed_rows],
+                                           'contact_id, full_name, email_address'):
+        existing_contacts.setdefault((contact['full_name'], contact['email_address']), contact['contact_id'])
+
+    # 3. 重複判定（CSV内の重複も含めメモリ上で解決）
+    inserts = {}  # (氏名, メール) -> (行番号リスト, データ)
+    updates = {}  # contact_id -> (行番号リスト, データ)
+    source_rows = {}  # (氏名, メール) -> CSV行のindex（履歴データ用）
+    for parsed in parsed_rows:
+        row_number = parsed['row_number']
+        company_name = parsed['company_name']
+        company_id = company_ids.get(company_name)
+        if company_id is None:
+            result['skipped_records'].append({
+                'row': row_number,
+                'company': company_name,
+                'name': parsed['full_name'],
+                'email': parsed['email'],
+                'reason': company_not_found_reason(company_name, company_suggestions)
+            })
+            result['skip_count'] += 1
+            continue
+
+        contact_data = dict(parsed['fields'])
+        if parsed['priority'] in priority_ids:
+            contact_data['priority_id'] = priority_ids[parsed['priority']]
+        if parsed['assignee'] in assignee_ids:
+            contact_data['search_assignee_id'] = assignee_ids[parsed['assignee']]
+
+        key = (parsed['full_name'], parsed['email'])
+        contact_id = existing_contacts.get(key)
+        if contact_id is None and key not in inserts:
+            contact_data.update({
+                'company_id': company_id,
+                'full_name': parsed['full_name'],
+                'email_address': parsed['email'],  # メールアドレスをemail_addressフィールドに保存
+                'created_at': now,
+                'updated_at': now
+            })
+            inserts[key] = ([row_number], contact_data)
+            source_rows[key] = parsed['index']
+            continue
+
+        if duplicate_handling == "重複をスキップ（新規のみ登録）":
+            result['skipped_records'].append({
+                'row': row_number,
+                'company': company_name,
+                'name': parsed['full_name'],
+                'email': parsed['email'],
+                'reason': '重複コンタクト（同一氏名・メールアドレスが既存）'
+            })
+            result['skip_count'] += 1
+            continue
+
+        if contact_id is not None:
+            row_numbers, update_data = updates.setdefault(contact_id, ([], {
+                'contact_id': contact_id,
+                'full_name': parsed['full_name'],
+                'email_address': parsed['email'],
+                'updated_at': now
+            }))
+        else:
+            # 同じCSV内で先に登録予定の行へ統合
+            row_numbers, update_data = inserts[key]
+        row_numbers.append(row_number)
+        update_data.update(contact_data)
+
+    # 4. 一括書き込み
+    inserted_ids = {}
+    for row_numbers, data, error in iter_bulk_writes('contacts', list(inserts.values())):
+        if error:
+            result['errors'].extend({'row': n, 'message': f"登録に失敗しました: {error}"} for n in row_numbers)
+            continue
+        result['success_count'] += len(data)
+        result['update_count'] += len(row_numbers) - len(data)
+        for contact in data:
+            inserted_ids[(contact['full_name'], contact['email_address'])] = contact['contact_id']
+
+    for row_numbers, data, error in iter_bulk_writes('contacts', list(updates.values()), on_conflict='contact_id'):
+        if error:
+            result['errors'].extend({'row': n, 'message': f"更新に失敗しました: {error}"} for n in row_numbers)
         else:
-            st.warning("⚠️ 処理対象となるデータがありませんでした")
-        
-        return success_count + update_count, error_count, errors, skipped_records  # 処理された件数とエラー・スキップ情報を返す
-        
-    except Exception as e:
-        errors.append({'row': 'システム', 'message': f"インポート中にエラーが発生しました: {str(e)}"})
-        error_count += 1
-        return success_count, error_count, errors, skipped_records
+            result['update_count'] += len(row_numbers)
+
+    # 5. 履歴データの処理（新規コンタクトのみ）
+    if inserted_ids and any('履歴' in str(col) for col in df.columns):
+        import_contact_histories(
+            [(df.loc[source_rows[key]], contact_id) for key, contact_id in inserted_ids.items() if key in source_rows],
+            df.columns
+        )
+
+    result['skipped_records'].sort(key=lambda record: record['row'])
+    return result
+
+
+def show_company_import_result(result):
+    """企業データのインポート結果を表示し、(処理件数, エラー件数, エラー, スキップ)を返す"""
+    success_count = result['success_count']
+    skip_count = result['skip_count']
+    update_count = result['update_count']
+    errors = result['errors']
+
+    # 結果表示（必ず表示）
+    total_processed = success_count + skip_count + update_count
+    if total_processed > 0:
+        if success_count > 0:
+            st.success(f"✅ 企業データ処理完了: 新規登録 {success_count}件")
+        result_message = f"📊 処理結果詳細: 新規登録 {success_count}件"
+        if skip_count > 0:
+            result_message += f", スキップ {skip_count}件"
+        if update_count > 0:
+            result_message += f", 更新 {update_count}件"
+        st.info(result_message)
+    else:
+        st.warning("⚠️ 処理対象となるデータがありませんでした")
+
+    return success_count + update_count, len(errors), errors, result['skipped_records']  # 処理された件数とエラー・スキップ情報を返す
 
 
 def import_project_data(df, mapping_config, duplicate_handling):
     """案件データをデータベースにインポート"""
-    success_count = 0
-    skip_count = 0
-    update_count = 0
+    return show_project_import_result(import_project_rows(df, mapping_config, duplicate_handling))
+
+
+def import_project_rows(df, mapping_config, duplicate_handling):
+    """案件データをインポートし、_new_import_result() 形式の結果を返す"""
+    result = _new_import_result()
+
+    # オプションフィールド（設定キー → DBカラム）
+    optional_fields = {
+        'contract_start': 'contract_start_date',
+        'contract_end': 'contract_end_date',
+        'headcount': 'required_headcount',
+        'co_manager': 'co_manager',
+        're_manager': 're_manager'
+    }
     
     try:
-        for _, row in df.iterrows():
-            company_name = str(row[mapping_config['company_name']]).strip()
-            project_name = str(row[mapping_config['project_name']]).strip()
-            
-            # 空の行はスキップ
-            if not company_name or not project_name or \
-               company_name.lower() in ['nan', 'null', ''] or \
-               project_name.lower() in ['nan', 'null', '']:
-                continue
-            
-            # 企業IDを取得（統合企業マスタを使用）
-            company_response = supabase.table('companies').select('company_id').eq('company_name', company_name).execute()
-
-            if not company_response.data:
-                st.warning(f"⚠️ 企業「{company_name}」が見つかりません。先に企業データをインポートしてください。")
+        # カラム単位の正規化・検証（企業名・案件名が空の行は対象外）
+        column_map = {key: mapping_config.get(key) for key in ['company_name', 'project_name', 'status']}
+        column_map.update({key: mapping_config.get(key) for key in optional_fields})
+        values, status = prepare_import_frame(df, column_map, required=['company_name', 'project_name'])
+        company_ids = resolve_company_ids(values['company_name'].tolist())
+        company_suggestions = suggest_company_names(values['company_name'].tolist())
+
+        # 日付フォーマット変換・人数の数値化（解析できない値は設定しない）
+        for key in ['contract_start', 'contract_end']:
+            values[key] = parse_date_column(values[key]).dt.strftime('%Y-%m-%d')
+        values['headcount'] = np.trunc(pd.to_numeric(values['headcount'], errors='coerce')).astype('Int64')
+
+        for _, row_number, row in valid_import_rows(values, status):
+            company_name = row['company_name']
+            project_name = row['project_name']
+            fields = {db_field: row[key] for key, db_field in optional_fields.items() if row[key] is not None}
+            if 'required_headcount' in fields:
+                fields['required_headcount'] = int(fields['required_headcount'])
+            
+            # 企業IDを取得（統合企業マスタを名寄せして使用）
+            company_id = company_ids.get(company_name)
+
+            if company_id is None:
+                result['skipped_records'].append({
+                    'row': row_number,
+                    'company': company_name,
+                    'reason': company_not_found_reason(company_name, company_suggestions)
+                })
                 continue
-
-            company_id = company_response.data[0]['company_id']
             
             # 重複チェック（企業名 + 案件名で判定）
             existing_project = supabase.table('projects').select('project_id').eq('client_company_id', company_id).eq('project_name', project_name).execute()
@@ -7694,358 +9495,171 @@ def import_project_data(df, mapping_config, duplicate_handling):
             if existing_project.data:
                 # 重複データが存在する場合
                 if duplicate_handling == "重複をスキップ（新規のみ登録）":
-                    skip_count += 1
+                    result['skip_count'] += 1
                     continue
                 elif duplicate_handling == "重複を更新（既存データを更新）":
                     # 既存データを更新
                     project_id = existing_project.data[0]['project_id']
                     update_data = {
-                        'project_status': str(row[mapping_config['status']]).strip(),
+                        'project_status': row['status'],
                         'updated_at': datetime.now().isoformat()
                     }
-                    
-                    # オプションフィールドを追加
-                    optional_fields = {
-                        'contract_start': 'contract_start_date',
-                        'contract_end': 'contract_end_date',
-                        'headcount': 'required_headcount',
-                        'co_manager': 'co_manager',
-                        're_manager': 're_manager'
-                    }
-                    
-                    for config_key, db_field in optional_fields.items():
-                        col_name = mapping_config.get(config_key)
-                        if col_name and col_name != '選択しない' and col_name in df.columns:
-                            value = str(row[col_name]).strip()
-                            if value and value.lower() not in ['nan', 'null', '']:
-                                if 'date' in db_field:
-                                    try:
-                                        if '/' in value:
-                                            date_obj = datetime.strptime(value, '%Y/%m/%d').date()
-                                        elif '-' in value:
-                                            date_obj = datetime.strptime(value, '%Y-%m-%d').date()
-                                        else:
-                                            continue
-                                        update_data[db_field] = date_obj.isoformat()
-                                    except:
-                                        continue
-                                elif 'headcount' in db_field:
-                                    try:
-                                        update_data[db_field] = int(float(value))
-                                    except:
-                                        continue
-                                else:
-                                    update_data[db_field] = value
+                    update_data.update(fields)
                     
                     supabase.table('projects').update(update_data).eq('project_id', project_id).execute()
-                    update_count += 1
+                    result['update_count'] += 1
                     continue
             
             # 案件データ作成
             project_data = {
                 'client_company_id': company_id,
                 'project_name': project_name,
-                'project_status': str(row[mapping_config['status']]).strip(),
+                'project_status': row['status'],
                 'created_at': datetime.now().isoformat(),
                 'updated_at': datetime.now().isoformat()
             }
-            
-            # オプションフィールドを追加
-            optional_fields = {
-                'contract_start': 'contract_start_date',
-                'contract_end': 'contract_end_date',
-                'headcount': 'required_headcount',
-                'co_manager': 'co_manager',
-                're_manager': 're_manager'
-            }
-            
-            for config_key, db_field in optional_fields.items():
-                col_name = mapping_config.get(config_key)
-                if col_name and col_name != '選択しない' and col_name in df.columns:
-                    value = str(row[col_name]).strip()
-                    if value and value.lower() not in ['nan', 'null', '']:
-                        if 'date' in db_field:
-                            # 日付フォーマット変換
-                            try:
-                                if '/' in value:
-                                    date_obj = datetime.strptime(value, '%Y/%m/%d').date()
-                                elif '-' in value:
-                                    date_obj = datetime.strptime(value, '%Y-%m-%d').date()
-                                else:
-                                    continue
-                                project_data[db_field] = date_obj.isoformat()
-                            except:
-                                continue
-                        elif 'headcount' in db_field:
-                            try:
-                                project_data[db_field] = int(float(value))
-                            except:
-                                continue
-                        else:
-                            project_data[db_field] = value
+            project_data.update(fields)
             
             # 案件をデータベースに挿入
             project_response = supabase.table('projects').insert(project_data).execute()
             
             if project_response.data:
-                success_count += 1
-        
-        # 結果表示
-        if success_count > 0 or skip_count > 0 or update_count > 0:
-            result_message = f"📊 案件データ処理結果: 新規登録 {success_count}件"
-            if skip_count > 0:
-                result_message += f", スキップ {skip_count}件"
-            if update_count > 0:
-                result_message += f", 更新 {update_count}件"
-            st.info(result_message)
-        
-        return success_count + update_count
-        
+                result['success_count'] += 1
+
     except Exception as e:
-        st.error(f"❌ インポート中にエラーが発生しました: {str(e)}")
-        return success_count
+        result['errors'].append({'row': 'システム', 'message': f"インポート中にエラーが発生しました: {str(e)}"})
 
+    return result
 
-def import_contact_history(row, columns, contact_id):
-    """コンタクトの履歴データをインポート"""
-    try:
-        # 履歴データが含まれているかチェック
-        history_columns = [col for col in columns if '履歴' in str(col)]
-        if not history_columns:
-            return  # 履歴データなし
-
-        # アプローチ手法のマッピングを取得
-        methods_response = supabase.table('approach_methods').select('*').execute()
-        method_mapping = {m['method_name']: m['method_id'] for m in methods_response.data}
-
-        # 履歴データを処理（最大3回分）
-        for i in range(1, 4):
-            date_col = f'履歴{i}_日付[任意:YYYY-MM-DD]'
-            method_col = f'履歴{i}_手法[任意:メール/電話/LinkedIn等]'
-            notes_col = f'履歴{i}_備考[任意]'
-
-            # CSVカラムが存在するかチェック
-            if date_col not in columns or method_col not in columns or notes_col not in columns:
-                continue
 
-            # データを取得
-            approach_date = str(row[date_col]).strip()
-            approach_method = str(row[method_col]).strip()
-            approach_notes = str(row[notes_col]).strip()
+def show_project_import_result(result):
+    """案件データのインポート結果を表示し、処理件数を返す"""
+    success_count = result['success_count']
+    skip_count = result['skip_count']
+    update_count = result['update_count']
 
-            # データが有効かチェック
-            if (not approach_date or approach_date.lower() in ['nan', 'null', ''] or
-                not approach_method or approach_method.lower() in ['nan', 'null', '']):
-                continue
+    for record in result['skipped_records']:
+        st.warning(f"⚠️ {record['reason']}")
 
-            # 日付の形式チェック
-            try:
-                datetime.strptime(approach_date, '%Y-%m-%d')
-            except ValueError:
-                continue
+    for error in result['errors']:
+        st.error(f"❌ {error['message']}")
 
-            # 手法IDを取得
-            method_id = method_mapping.get(approach_method)
-            if not method_id:
-                continue
+    # 結果表示
+    if success_count > 0 or skip_count > 0 or update_count > 0:
+        result_message = f"📊 案件データ処理結果: 新規登録 {success_count}件"
+        if skip_count > 0:
+            result_message += f", スキップ {skip_count}件"
+        if update_count > 0:
+            result_message += f", 更新 {update_count}件"
+        st.info(result_message)
 
-            # 履歴データを挿入
-            history_data = {
-                'contact_id': int(contact_id),
-                'method_id': int(method_id),
-                'approach_date': approach_date,
-                'approach_order': i,
-                'notes': approach_notes if approach_notes and approach_notes.lower() not in ['nan', 'null', ''] else None,
-                'created_at': datetime.now().isoformat(),
-                'updated_at': datetime.now().isoformat()
-            }
+    return success_count + update_count
 
-            supabase.table('contact_approaches').insert(history_data).execute()
 
-    except Exception as e:
-        # エラーは無視（履歴データは任意のため）
-        pass
+def fetch_approach_method_mapping():
+    """アプローチ手法名 → 手法IDのマッピングを取得"""
+    methods_response = supabase.table('approach_methods').select('*').execute()
+    return {m['method_name']: m['method_id'] for m in methods_response.data}
 
 
-def import_contact_data(df, mapping_config, duplicate_handling):
-    """コンタクトデータをデータベースにインポート"""
-    success_count = 0
-    skip_count = 0
-    update_count = 0
-    skipped_records = []  # スキップされたレコードの詳細情報
+def build_contact_history_rows(row, columns, contact_id, method_mapping):
+    """CSV行から contact_approaches に挿入する履歴データ（最大3回分）を生成"""
+    history_rows = []
+    for i in range(1, 4):
+        date_col = f'履歴{i}_日付[任意:YYYY-MM-DD]'
+        method_col = f'履歴{i}_手法[任意:メール/電話/LinkedIn等]'
+        notes_col = f'履歴{i}_備考[任意]'
 
-    try:
-        for idx, row in df.iterrows():
-            row_number = idx + 2  # CSVの行番号（ヘッダー分+1）
-            company_name = str(row[mapping_config['company_name']]).strip()
-            full_name = str(row[mapping_config['full_name']]).strip()
-            email = str(row[mapping_config['email']]).strip()
-
-            # 必須項目のバリデーション（企業名、氏名、メールアドレス）
-            if not company_name or not full_name or not email or \
-               company_name.lower() in ['nan', 'null', ''] or \
-               full_name.lower() in ['nan', 'null', ''] or \
-               email.lower() in ['nan', 'null', '']:
-                skipped_records.append({
-                    'row': row_number,
-                    'company': company_name if company_name and company_name.lower() not in ['nan', 'null', ''] else '(空欄)',
-                    'name': full_name if full_name and full_name.lower() not in ['nan', 'null', ''] else '(空欄)',
-                    'email': email if email and email.lower() not in ['nan', 'null', ''] else '(空欄)',
-                    'reason': '必須項目（企業名・氏名・メール）が不足しています'
-                })
-                skip_count += 1
-                continue
-            
-            # 企業IDを取得（統合企業マスタを使用）
-            company_response = supabase.table('companies').select('company_id').eq('company_name', company_name).execute()
+        # CSVカラムが存在するかチェック
+        if date_col not in columns or method_col not in columns or notes_col not in columns:
+            continue
 
-            if not company_response.data:
-                skipped_records.append({
-                    'row': row_number,
-                    'company': company_name,
-                    'name': full_name,
-                    'email': email,
-                    'reason': f'企業「{company_name}」が見つかりません。先に企業データをインポートしてください'
-                })
-                skip_count += 1
-                continue
+        # データを取得
+        approach_date = str(row[date_col]).strip()
+        approach_method = str(row[method_col]).strip()
+        approach_notes = str(row[notes_col]).strip()
 
-            company_id = company_response.data[0]['company_id']
-            
-            # 重複チェック（氏名 + メールアドレスで判定）
-            # 企業が異なっても同一人物と判定
-            existing_contact = supabase.table('contacts').select('contact_id').eq('full_name', full_name).eq('email_address', email).execute()
-            
-            if existing_contact.data:
-                # 重複データが存在する場合
-                if duplicate_handling == "重複をスキップ（新規のみ登録）":
-                    skipped_records.append({
-                        'row': row_number,
-                        'company': company_name,
-                        'name': full_name,
-                        'email': email,
-                        'reason': '重複コンタクト（同一氏名・メールアドレスが既存）'
-                    })
-                    skip_count += 1
-                    continue
-                elif duplicate_handling == "重複を更新（既存データを更新）":
-                    # 既存データを更新
-                    contact_id = existing_contact.data[0]['contact_id']
-                    update_data = {'updated_at': datetime.now().isoformat()}
-                    
-                    # メールアドレスを追加（email_addressフィールドを使用）
-                    update_data['email_address'] = email
-                    
-                    # オプションフィールドを追加
-                    optional_fields = {
-                        'department': 'department_name',
-                        'position': 'position_name',
-                        'age': 'estimated_age',
-                        'status': 'screening_status'
-                    }
+        # データが有効かチェック
+        if (not approach_date or approach_date.lower() in ['nan', 'null', ''] or
+            not approach_method or approach_method.lower() in ['nan', 'null', '']):
+            continue
 
-                    for config_key, db_field in optional_fields.items():
-                        col_name = mapping_config.get(config_key)
-                        if col_name and col_name != '選択しない' and col_name in df.columns:
-                            value = str(row[col_name]).strip()
-                            if value and value.lower() not in ['nan', 'null', '']:
-                                update_data[db_field] = value
-                    
-                    # 優先度の処理
-                    if mapping_config.get('priority') and mapping_config['priority'] != '選択しない':
-                        priority_value = str(row[mapping_config['priority']]).strip()
-                        if priority_value and priority_value.lower() not in ['nan', 'null', '']:
-                            priority_response = supabase.table('priority_levels').select('priority_id').eq('priority_name', priority_value).execute()
-                            if priority_response.data:
-                                update_data['priority_id'] = priority_response.data[0]['priority_id']
-                    
-                    # 担当者の処理
-                    if mapping_config.get('assignee') and mapping_config['assignee'] != '選択しない':
-                        assignee_value = str(row[mapping_config['assignee']]).strip()
-                        if assignee_value and assignee_value.lower() not in ['nan', 'null', '']:
-                            assignee_response = supabase.table('search_assignees').select('assignee_id').eq('assignee_name', assignee_value).execute()
-                            if assignee_response.data:
-                                update_data['search_assignee_id'] = assignee_response.data[0]['assignee_id']
-                    
-                    supabase.table('contacts').update(update_data).eq('contact_id', contact_id).execute()
-                    update_count += 1
-                    continue
-            
-            # コンタクトデータ作成
-            contact_data = {
-                'company_id': company_id,
-                'full_name': full_name,
-                'email_address': email,  # メールアドレスをemail_addressフィールドに保存
-                'created_at': datetime.now().isoformat(),
-                'updated_at': datetime.now().isoformat()
-            }
-            
-            # オプションフィールドを追加
-            optional_fields = {
-                'department': 'department_name',
-                'position': 'position_name',
-                'age': 'estimated_age',
-                'status': 'screening_status'
-            }
+        # 日付の形式チェック
+        try:
+            datetime.strptime(approach_date, '%Y-%m-%d')
+        except ValueError:
+            continue
+
+        # 手法IDを取得
+        method_id = method_mapping.get(approach_method)
+        if not method_id:
+            continue
+
+        history_rows.append({
+            'contact_id': int(contact_id),
+            'method_id': int(method_id),
+            'approach_date': approach_date,
+            'approach_order': i,
+            'notes': approach_notes if approach_notes and approach_notes.lower() not in ['nan', 'null', ''] else None,
+            'created_at': datetime.now().isoformat(),
+            'updated_at': datetime.now().isoformat()
+        })
+    return history_rows
 
-            for config_key, db_field in optional_fields.items():
-                col_name = mapping_config.get(config_key)
-                if col_name and col_name != '選択しない' and col_name in df.columns:
-                    value = str(row[col_name]).strip()
-                    if value and value.lower() not in ['nan', 'null', '']:
-                        contact_data[db_field] = value
-            
-            # 優先度の処理
-            if mapping_config.get('priority') and mapping_config['priority'] != '選択しない':
-                priority_value = str(row[mapping_config['priority']]).strip()
-                if priority_value and priority_value.lower() not in ['nan', 'null', '']:
-                    priority_response = supabase.table('priority_levels').select('priority_id').eq('priority_name', priority_value).execute()
-                    if priority_response.data:
-                        contact_data['priority_id'] = priority_response.data[0]['priority_id']
-            
-            # 担当者の処理
-            if mapping_config.get('assignee') and mapping_config['assignee'] != '選択しない':
-                assignee_value = str(row[mapping_config['assignee']]).strip()
-                if assignee_value and assignee_value.lower() not in ['nan', 'null', '']:
-                    assignee_response = supabase.table('search_assignees').select('assignee_id').eq('assignee_name', assignee_value).execute()
-                    if assignee_response.data:
-                        contact_data['search_assignee_id'] = assignee_response.data[0]['assignee_id']
-            
-            # データベースに挿入
-            response = supabase.table('contacts').insert(contact_data).execute()
-
-            if response.data:
-                contact_id = response.data[0]['contact_id']
-                success_count += 1
 
-                # 履歴データの処理（新規コンタクトのみ）
-                import_contact_history(row, df.columns, contact_id)
-        
-        # 結果表示（必ず表示）
-        total_processed = success_count + skip_count + update_count
-        if total_processed > 0:
-            if success_count > 0:
-                st.success(f"✅ コンタクトデータ処理完了: 新規登録 {success_count}件")
-            result_message = f"📊 処理結果詳細: 新規登録 {success_count}件"
-            if skip_count > 0:
-                result_message += f", スキップ {skip_count}件"
-            if update_count > 0:
-                result_message += f", 更新 {update_count}件"
-            st.info(result_message)
-
-            # スキップされたレコードの詳細表示
-            if skipped_records:
-                st.warning("⚠️ スキップされたレコード:")
-                for record in skipped_records:
-                    st.write(f"• 行{record['row']}: {record['company']}・{record['name']} ({record['email']}) - {record['reason']}")
-        else:
-            st.warning("⚠️ 処理対象となるデータがありませんでした")
-        
-        return success_count + update_count
-        
+def import_contact_histories(rows_with_ids, columns):
+    """複数コンタクトの履歴データをまとめてインポート（手法マスタは1回だけ取得）"""
+    try:
+        method_mapping = fetch_approach_method_mapping()
+        history_rows = []
+        for row, contact_id in rows_with_ids:
+            history_rows.extend(build_contact_history_rows(row, columns, contact_id, method_mapping))
+
+        for batch in _chunked(history_rows, IMPORT_BATCH_SIZE):
+            supabase.table('contact_approaches').insert(batch).execute()
+
     except Exception as e:
-        st.error(f"❌ インポート中にエラーが発生しました: {str(e)}")
-        return success_count
+        # エラーは無視（履歴データは任意のため）
+        pass
+
+
+def show_contact_import_result(result):
+    """コンタクトデータのインポート結果を表示し、処理件数を返す"""
+    success_count = result['success_count']
+    skip_count = result['skip_count']
+    update_count = result['update_count']
+    skipped_records = result['skipped_records']
+
+    # 結果表示（必ず表示）
+    total_processed = success_count + skip_count + update_count
+    if total_processed > 0:
+        if success_count > 0:
+            st.success(f"✅ コンタクトデータ処理完了: 新規登録 {success_count}件")
+        result_message = f"📊 処理結果詳細: 新規登録 {success_count}件"
+        if skip_count > 0:
+            result_message += f", スキップ {skip_count}件"
+        if update_count > 0:
+            result_message += f", 更新 {update_count}件"
+        st.info(result_message)
+
+        # スキップされたレコードの詳細表示
+        if skipped_records:
+            st.warning("⚠️ スキップされたレコード:")
+            for record in skipped_records:
+                st.write(f"• 行{record['row']}: {record['company']}・{record['name']} ({record['email']}) - {record['reason']}")
+    elif not result['errors']:
+        st.warning("⚠️ 処理対象となるデータがありませんでした")
+
+    # 書き込みエラーの表示
+    if result['errors']:
+        st.error(f"❌ 書き込みエラー: {len(result['errors'])}件")
+        with st.expander(f"エラー一覧 ({len(result['errors'])}件)", expanded=len(result['errors']) <= 5):
+            for error in result['errors'][:20]:
+                st.write(f"📍 **行{error['row']}**: {error['message']}")
+            if len(result['errors']) > 20:
+                st.write(f"... 他{len(result['errors'])-20}件のエラー")
+
+    return success_count + update_count
 
 
 def import_matching_data(df, duplicate_handling):
@@ -8053,39 +9667,56 @@ def import_matching_data(df, duplicate_handling):
     success_count = 0
     error_count = 0
     errors = []
+
+    required_columns = ['last_name', 'first_name', 'company_name', 'email', 'profile', 'project_name']
+    optional_columns = ['screening_comment', 'position_name', 'age_or_birth', 'screening_status', 'assignment_status']
     
     try:
-        for idx, row in df.iterrows():
+        # カラム単位の正規化・検証（空値チェックは必須項目のみ）
+        values, status = prepare_import_frame(
+            df,
+            {col: col for col in required_columns + optional_columns},
+            required=required_columns,
+            required_reason='必須項目（姓、名、企業名、メールアドレス、プロフィール、案件名）が不足しています',
+            email_key='email'
+        )
+        values['screening_status'] = values['screening_status'].fillna('未評価')
+        values['assignment_status'] = values['assignment_status'].fillna('検討中')
+
+        # 年齢/生年月日の解析
+        ages = parse_age_or_birth_column(values['age_or_birth'])
+        bad_birth = status['is_valid'] & ages['birth_error']
+        status.loc[bad_birth, 'is_valid'] = False
+        status.loc[bad_birth, 'reason'] = '生年月日の形式が不正です（YYYY-MM-DD）'
+        values = values.join(ages[['estimated_age', 'birth_date', 'actual_age']])
+
+        for row_number, reason, _ in invalid_import_rows(values, status):
+            errors.append({'row': row_number, 'message': reason})
+            error_count += 1
+
+        company_ids = resolve_company_ids(values['company_name'].tolist())
+
+        for _, row_number, row in valid_import_rows(values, status):
             try:
-                # 必須項目の取得
-                last_name = str(row['last_name']).strip()
-                first_name = str(row['first_name']).strip()
-                company_name = str(row['company_name']).strip()
-                email = str(row['email']).strip()
-                profile = str(row['profile']).strip()
-                project_name = str(row['project_name']).strip()
-                screening_comment = str(row['screening_comment']).strip()
-                
-                # 任意項目の取得
-                position_name = str(row.get('position_name', '')).strip()
-                age_or_birth = str(row.get('age_or_birth', '')).strip()
-                screening_status = str(row.get('screening_status', '未評価')).strip()
-                assignment_status = str(row.get('assignment_status', '検討中')).strip()
-                
-                # 空値チェック（必須項目のみ）
-                if not all([last_name, first_name, company_name, email, profile, project_name]):
-                    errors.append({
-                        'row': idx + 2,  # ヘッダー行を考慮
-                        'message': '必須項目（姓、名、企業名、メールアドレス、プロフィール、案件名）が不足しています'
-                    })
-                    error_count += 1
-                    continue
+                last_name = row['last_name']
+                first_name = row['first_name']
+                company_name = row['company_name']
+                email = row['email']
+                project_name = row['project_name']
+
+                # 年齢/生年月日
+                age_fields = {}
+                if row['birth_date']:  # 生年月日形式
+                    age_fields['birth_date'] = row['birth_date']
+                    age_fields['actual_age'] = int(row['actual_age'])
+                elif row['estimated_age']:  # 年齢形式
+                    age_fields['estimated_age'] = row['estimated_age']
                 
                 # 1. 案件の存在確認
                 project_response = supabase.table('projects').select('project_id').eq('project_name', project_name).execute()
                 if not project_response.data:
                     errors.append({
-                        'row': idx + 2,
+                        'row': row_number,
                         'message': f'案件「{project_name}」が見つかりません'
                     })
                     error_count += 1
@@ -8093,17 +9724,17 @@ def import_matching_data(df, duplicate_handling):
                 project_id = project_response.data[0]['project_id']
                 
                 # 2. 企業の確認/登録
-                company_response = supabase.table('companies').select('company_id').eq('company_name', company_name).execute()
-                if company_response.data:
-                    company_id = company_response.data[0]['company_id']
-                else:
-                    # 新規企業登録
+                company_id = company_ids.get(company_name)
+                if company_id is None:
+                    # 新規企業登録（同じファイル内の後続行は登録済みのIDを使う）
                     new_company = supabase.table('companies').insert({
                         'company_name': company_name,
                         'created_at': datetime.now().isoformat(),
                         'updated_at': datetime.now().isoformat()
                     }).execute()
                     company_id = new_company.data[0]['company_id']
+                    company_ids[company_name] = company_id
+                    invalidate_tables('companies')
                 
                 # 3. 候補者の確認/登録
                 full_name = f"{last_name}{first_name}"
@@ -8127,23 +9758,12 @@ def import_matching_data(df, duplicate_handling):
                     elif duplicate_handling == "重複を更新（既存データを更新）":
                         # 候補者情報を更新
                         update_data = {
-                            'position_name': position_name,
-                            'profile': profile,
+                            'position_name': row['position_name'],
+                            'profile': row['profile'],
                             'email_address': email,  # emailをemail_addressフィールドに保存
                             'updated_at': datetime.now().isoformat()
                         }
-                        
-                        # 年齢/生年月日の処理
-                        if age_or_birth:
-                            if '-' in age_or_birth:  # 生年月日形式
-                                update_data['birth_date'] = age_or_birth
-                                # 実年齢を計算
-                                birth_date = datetime.strptime(age_or_birth, '%Y-%m-%d').date()
-                                today = date.today()
-                                actual_age = today.year - birth_date.year - ((today.month, today.day) < (birth_date.month, birth_date.day))
-                                update_data['actual_age'] = actual_age
-                            else:  # 年齢形式
-                                update_data['estimated_age'] = age_or_birth
+                        update_data.update(age_fields)
                         
                         supabase.table('contacts').update(update_data).eq('contact_id', contact_id).execute()
                 else:
@@ -8153,26 +9773,15 @@ def import_matching_data(df, duplicate_handling):
                         'full_name': full_name,
                         'last_name': last_name,
                         'first_name': first_name,
-                        'position_name': position_name,
-                        'profile': profile,
+                        'position_name': row['position_name'],
+                        'profile': row['profile'],
                         'email_address': email,  # emailをemail_addressフィールドに保存
-                        'screening_status': screening_status,
-                        'primary_screening_comment': screening_comment,
+                        'screening_status': row['screening_status'],
+                        'primary_screening_comment': row['screening_comment'],
                         'created_at': datetime.now().isoformat(),
                         'updated_at': datetime.now().isoformat()
                     }
-                    
-                    # 年齢/生年月日の処理
-                    if age_or_birth:
-                        if '-' in age_or_birth:  # 生年月日形式
-                            contact_data['birth_date'] = age_or_birth
-                            # 実年齢を計算
-                            birth_date = datetime.strptime(age_or_birth, '%Y-%m-%d').date()
-                            today = date.today()
-                            actual_age = today.year - birth_date.year - ((today.month, today.day) < (birth_date.month, birth_date.day))
-                            contact_data['actual_age'] = actual_age
-                        else:  # 年齢形式
-                            contact_data['estimated_age'] = age_or_birth
+                    contact_data.update(age_fields)
                     
                     new_contact = supabase.table('contacts').insert(contact_data).execute()
                     contact_id = new_contact.data[0]['contact_id']
@@ -8185,7 +9794,7 @@ def import_matching_data(df, duplicate_handling):
                     # 既存の紐付けを更新
                     if duplicate_handling == "重複を更新（既存データを更新）":
                         supabase.table('project_assignments').update({
-                            'assignment_status': assignment_status,
+                            'assignment_status': row['assignment_status'],
                             'updated_at': datetime.now().isoformat()
                         }).eq('assignment_id', assignment_check.data[0]['assignment_id']).execute()
                 else:
@@ -8193,7 +9802,7 @@ def import_matching_data(df, duplicate_handling):
                     supabase.table('project_assignments').insert({
                         'project_id': project_id,
                         'contact_id': contact_id,
-                        'assignment_status': assignment_status,
+                        'assignment_status': row['assignment_status'],
                         'created_at': datetime.now().isoformat(),
                         'updated_at': datetime.now().isoformat()
                     }).execute()
@@ -8202,7 +9811,7 @@ def import_matching_data(df, duplicate_handling):
                 
             except Exception as e:
                 errors.append({
-                    'row': idx + 2,
+                    'row': row_number,
                     'message': str(e)
                 })
                 error_count += 1
@@ -8211,8 +9820,16 @@ def import_matching_data(df, duplicate_handling):
     except Exception as e:
         st.error(f"インポート処理中にエラーが発生しました: {str(e)}")
     
+    errors.sort(key=lambda error: error['row'])
     return success_count, error_count, errors
 
+def import_matching_chunk(df, duplicate_handling):
+    """案件マッチングデータのチャンクをインポートし、_new_import_result() 形式の結果を返す"""
+    result = _new_import_result()
+    result['success_count'], _, result['errors'] = import_matching_data(df, duplicate_handling)
+    return result
+
+
 # =============================================================================
 # 新しいDB機能（検索管理系）
 # =============================================================================
@@ -8400,24 +10017,18 @@ def show_target_companies_search_history():
         company_name = cpr_result.data[0]['companies']['company_name']
         actual_company_id = cpr_result.data[0]['companies']['company_id']
         
-        # target_companiesから対応するレコードを取得（または作成）
-        target_result = supabase.table('target_companies').select('*').eq('company_name', company_name).execute()
-        
-        target_company_data = None
+        # target_companiesから対応するレコードを取得（企業名を名寄せ、なければ作成）
+        target_company_data = fetch_target_company(company_name)
         target_company_id = None
         
-        if target_result.data:
+        if target_company_data:
             # 既存のtarget_companiesレコードがある場合
-            target_company_data = target_result.data[0]
             target_company_id = target_company_data['target_company_id']
         else:
             # target_companiesにレコードがない場合は作成
             try:
-                insert_result = supabase.table('target_companies').insert({
-                    'company_name': company_name
-                }).execute()
-                if insert_result.data:
-                    target_company_data = insert_result.data[0]
+                target_company_data = save_target_company_fields(company_name, {})
+                if target_company_data:
                     target_company_id = target_company_data['target_company_id']
             except Exception as e:
                 st.error(f"ターゲット企業レコードの作成に失敗しました: {str(e)}")
@@ -8863,21 +10474,12 @@ def show_email_management():
         company_options = {"選択してください": None}
         
         try:
-            # target_companiesテーブルから企業を取得
-            companies_result = supabase.table('target_companies').select(
-                'target_company_id, company_name'
-            ).order('company_name').execute()
-            
-            if companies_result.data:
-                for c in companies_result.data:
-                    company_name = c['company_name']
-                    # target_company_idからcompany_idを取得
-                    company_query = supabase.table('companies').select(
-                        'company_id'
-                    ).eq('company_name', company_name).execute()
-                    
-                    if company_query.data:
-                        company_options[company_name] = company_query.data[0]['company_id']
+            # target_companiesの企業名を企業名索引でcompany_idに名寄せ
+            target_names = sorted(load_company_name_index()['names'].get('target_companies', {}).values())
+            company_ids = resolve_company_ids(target_names)
+            for company_name in target_names:
+                if company_name in company_ids:
+                    company_options[company_name] = company_ids[company_name]
         except Exception as e:
             st.warning(f"企業データ取得エラー: {str(e)}")
         
@@ -8914,7 +10516,7 @@ def show_email_management():
         st.subheader(f"📧 {selected_company} のメール管理")
         
         # タブで機能を分割
-        tabs = st.tabs(["🔍 メアドパターン", "✅ 実在メアド集", "❌ 別人到達履歴"])
+        tabs = st.tabs(["🔍 メアドパターン", "✅ 実在メアド集", "❌ 別人到達履歴", "🧮 候補アドレス生成"])
         
         with tabs[0]:
             show_email_patterns_tab(company_id, selected_company)
@@ -8927,6 +10529,9 @@ def show_email_management():
         
         with tabs[2]:
             show_misdelivery_emails_tab(company_id, selected_company)
+        
+        with tabs[3]:
+            show_email_candidates_tab(company_id, selected_company)
     else:
         if selection_method == "案件から選択":
             st.info("📌 案件とターゲット企業を選択してください")
@@ -8934,38 +10539,459 @@ def show_email_management():
             st.info("📌 ターゲット企業を選択してください")
 
 
+# ============================================
+# 企業別メール情報（子テーブル）
+# ============================================
+
+# メール情報の種類ごとの子テーブル（company_email_tables.sql で作成）
+COMPANY_EMAIL_TABLES = {
+    'patterns': {'table': 'company_email_patterns', 'id': 'pattern_id', 'order': 'pattern'},
+    'confirmed': {'table': 'company_confirmed_emails', 'id': 'confirmed_email_id', 'order': 'email_key'},
+    'misdelivery': {'table': 'company_misdelivery_emails', 'id': 'misdelivery_id', 'order': 'email_key'},
+}
+
+
+def normalize_email_key(email):
+    """メールアドレスの比較用キー（前後の空白除去・小文字化、DBの email_key と同じ）"""
+    return (email or '').strip().lower()
+
+
+@cache_by_tables(EMAIL_SNAPSHOT_TABLES)
+def load_company_email_snapshot(company_id, company_name):
+    """企業のメール情報一式をまとめて取得（企業ID・参照テーブルのバージョン単位でキャッシュ）
+
+    子テーブル3種と企業URLは companies からの埋め込みで1リクエストにまとめる。
+    メアドサーチ完了日・メモは target_companies に企業名で紐づくため、名寄せしたIDで別に取得する。
+
+    Returns:
+        {'patterns', 'confirmed', 'misdelivery': 行のリスト, 'company_url', 'email_searched', 'email_search_memo'}
+    """
+    embeds = ', '.join(f"{spec['table']}(*)" for spec in COMPANY_EMAIL_TABLES.values())
+    company_result = supabase.table('companies').select(
+        f'company_id, company_url, {embeds}'
+    ).eq('company_id', company_id).execute()
+    company = company_result.data[0] if company_result.data else {}
+
+    snapshot = {'company_url': company.get('company_url')}
+    for kind, spec in COMPANY_EMAIL_TABLES.items():
+        snapshot[kind] = sorted(company.get(spec['table']) or [], key=lambda row: str(row.get(spec['order']) or ''))
+
+    target = fetch_target_company(company_name, 'email_searched, email_search_memo') or {}
+    snapshot['email_searched'] = target.get('email_searched')
+    snapshot['email_search_memo'] = target.get('email_search_memo')
+    return snapshot
+
+
+def add_company_email(kind, company_id, record):
+    """企業のメール情報を1件追加"""
+    spec = COMPANY_EMAIL_TABLES[kind]
+    response = supabase.table(spec['table']).insert({'company_id': int(company_id), **record}).execute()
+    invalidate_tables(spec['table'])
+    return response.data[0] if response.data else None
+
+
+def delete_company_email(kind, row_id):
+    """企業のメール情報を1件削除"""
+    spec = COMPANY_EMAIL_TABLES[kind]
+    supabase.table(spec['table']).delete().eq(spec['id'], row_id).execute()
+    invalidate_tables(spec['table'])
+
+
+def find_email_companies(email, kinds=('confirmed', 'misdelivery')):
+    """メールアドレスを登録している企業を横断検索（email_key のインデックスを使用）
+
+    Returns:
+        {種類: [company_id, companies(company_name) を含む行]}
+    """
+    email_key = normalize_email_key(email)
+    results = {}
+    for kind in kinds:
+        spec = COMPANY_EMAIL_TABLES[kind]
+        response = supabase.table(spec['table']).select(
+            f"{spec['id']}, company_id, email, companies(company_name)"
+        ).eq('email_key', email_key).execute()
+        results[kind] = response.data or []
+    return results
+
+
+def show_company_email_storage_error(e):
+    """子テーブル未作成時の案内"""
+    st.error(f"データ取得エラー: {str(e)}")
+    st.info("メール情報の子テーブルがない場合は company_email_tables.sql をSupabase Dashboard SQLエディタで実行してください。")
+
+
+# ============================================
+# メールアドレスのパターン推定・候補生成
+# ============================================
+
+# ひらがな → ローマ字（ヘボン式）
+KANA_ROMAJI = {
+    'あ': 'a', 'い': 'i', 'う': 'u', 'え': 'e', 'お': 'o',
+    'か': 'ka', 'き': 'ki', 'く': 'ku', 'け': 'ke', 'こ': 'ko',
+    'さ': 'sa', 'し': 'shi', 'す': 'su', 'せ': 'se', 'そ': 'so',
+    'た': 'ta', 'ち': 'chi', 'つ': 'tsu', 'て': 'te', 'と': 'to',
+    'な': 'na', 'に': 'ni', 'ぬ': 'nu', 'ね': 'ne', 'の': 'no',
+    'は': 'ha', 'ひ': 'hi', 'ふ': 'fu', 'へ': 'he', 'ほ': 'ho',
+    'ま': 'ma', 'み': 'mi', 'む': 'mu', 'め': 'me', 'も': 'mo',
+    'や': 'ya', 'ゆ': 'yu', 'よ': 'yo',
+    'ら': 'ra', 'り': 'ri', 'る': 'ru', 'れ': 're', 'ろ': 'ro',
+    'わ': 'wa', 'ゐ': 'i', 'ゑ': 'e', 'を': 'o', 'ん': 'n',
+    'が': 'ga', 'ぎ': 'gi', 'ぐ': 'gu', 'げ': 'ge', 'ご': 'go',
+    'ざ': 'za', 'じ': 'ji', 'ず': 'zu', 'ぜ': 'ze', 'ぞ': 'zo',
+    'だ': 'da', 'ぢ': 'ji', 'づ': 'zu', 'で': 'de', 'ど': 'do',
+    'ば': 'ba', 'び': 'bi', 'ぶ': 'bu', 'べ': 'be', 'ぼ': 'bo',
+    'ぱ': 'pa', 'ぴ': 'pi', 'ぷ': 'pu', 'ぺ': 'pe', 'ぽ': 'po',
+    'ゔ': 'vu', 'ぁ': 'a', 'ぃ': 'i', 'ぅ': 'u', 'ぇ': 'e', 'ぉ': 'o',
+}
+SMALL_KANA_VOWELS = {'ゃ': 'a', 'ゅ': 'u', 'ょ': 'o'}
+
+# メールアドレスの名前テンプレートと、確認済みメールがない場合の事前スコア（日本企業で多い順）
+EMAIL_TEMPLATE_PRIORS = {
+    '{last}.{first}': 0.16,
+    '{first}.{last}': 0.14,
+    '{f}-{last}': 0.10,
+    '{last}-{f}': 0.06,
+    '{f}.{last}': 0.08,
+    '{f}{last}': 0.08,
+    '{last}_{first}': 0.05,
+    '{first}_{last}': 0.05,
+    '{last}{first}': 0.04,
+    '{first}{last}': 0.04,
+    '{last}.{f}': 0.04,
+    '{last}{f}': 0.03,
+    '{first}-{last}': 0.02,
+    '{last}-{first}': 0.02,
+    '{last}': 0.03,
+    '{first}': 0.02,
+}
+# 登録済みメアドパターンは確認済みメール何件分として数えるか
+EMAIL_REGISTERED_PATTERN_WEIGHT = 2
+# 確認済みメールから推定したスコアと事前スコアの配分
+EMAIL_EVIDENCE_WEIGHT = 0.8
+# メアドパターン（手入力）の名前の書き方 → テンプレートの記号
+EMAIL_PATTERN_ALIASES = {
+    'firstname': '{first}', 'first_name': '{first}', 'first': '{first}', 'mei': '{first}',
+    'lastname': '{last}', 'last_name': '{last}', 'last': '{last}', 'sei': '{last}',
+    'f': '{f}', 'l': '{l}',
+}
+EMAIL_TEMPLATE_TOKEN = re.compile(r'(\{(?:first|last|f|l)\})')
+
+
+@functools.lru_cache(maxsize=4096)
+def romanize_kana(text):
+    """カタカナ・ひらがなをヘボン式ローマ字（小文字）に変換。かな以外の文字が含まれる場合はNone"""
+    text = unicodedata.normalize('NFKC', text or '').strip().replace(' ', '')
+    # カタカナ → ひらがな
+    text = ''.join(chr(ord(c) - 0x60) if 'ァ' <= c <= 'ヶ' else c for c in text)
+    romaji = []
+    double_next = False
+    for i, c in enumerate(text):
+        if c == 'ー':
+            continue
+        if c == 'っ':
+            double_next = True
+            continue
+        if c in SMALL_KANA_VOWELS:
+            if not romaji:
+                return None
+            # きゃ → kya、しゃ → sha、ちゃ → cha、じゃ → ja
+            prev = romaji.pop()
+            stem = prev[:-1] if prev.endswith(('shi', 'chi', 'ji')) else prev[:-1] + 'y'
+            romaji.append(stem + SMALL_KANA_VOWELS[c])
+            continue
+        if c not in KANA_ROMAJI:
+            return None
+        syllable = KANA_ROMAJI[c]
+        if double_next:
+            syllable = ('t' if syllable.startswith('ch') else syllable[0]) + syllable
+            double_next = False
+        romaji.append(syllable)
+    return ''.join(romaji) or None
+
+
+def shorten_long_vowels(romaji):
+    """長音を省いた表記（satou → sato、yuuki → yuki、oono → ono）"""
+    if romaji is None:
+        return None
+    return re.sub(r'(?<=o)u|(?<=[ou])o|(?<=u)u', '', romaji)
+
+
+def romanize_name_part(text):
+    """名前（姓または名）をローマ字にする。英字はそのまま小文字化、かなはローマ字化"""
+    text = unicodedata.normalize('NFKC', text or '').strip()
+    if not text:
+        return None
+    if re.fullmatch(r'[A-Za-z][A-Za-z\- ]*', text):
+        return re.sub(r'[\s\-]', '', text).lower()
+    return romanize_kana(text)
+
+
+def contact_romaji_names(contacts_df):
+    """コンタクトの姓・名のローマ字（長音あり・省略の2通り）の列を作る
+
+    フリガナ（姓・名）を優先し、姓名欄が英字の場合はそれを使う。
+    """
+    def pick(furigana_col, name_col):
+        values = pd.Series(None, index=contacts_df.index, dtype=object)
+        for col in (furigana_col, name_col):
+            if col in contacts_df.columns:
+                values = values.fillna(contacts_df[col].map(romanize_name_part, na_action='ignore'))
+        return values
+
+    last = pick('furigana_last_name', 'last_name')
+    first = pick('furigana_first_name', 'first_name')
+    return pd.DataFrame({
+        'last': last,
+        'first': first,
+        'last_short': last.map(shorten_long_vowels, na_action='ignore'),
+        'first_short': first.map(shorten_long_vowels, na_action='ignore'),
+    }, index=contacts_df.index)
+
+
+def render_email_template(template, first, last):
+    """テンプレートをSeries単位で展開する（名前が欠けている行はNaN）"""
+    parts = {
+        '{first}': first,
+        '{last}': last,
+        '{f}': first.str[0],
+        '{l}': last.str[0],
+    }
+    result = pd.Series('', index=first.index, dtype=object)
+    for piece in EMAIL_TEMPLATE_TOKEN.split(template):
+        if piece:
+            result = result + parts.get(piece, piece)
+    return result
+
+
+def parse_registered_pattern(pattern):
+    """手入力のメアドパターンを (テンプレート, ドメイン) にする。解釈できない部分はNone"""
+    pattern = unicodedata.normalize('NFKC', pattern or '').strip().lower()
+    local, _, domain = pattern.partition('@')
+    domain = domain if re.fullmatch(r'[a-z0-9.\-]+\.[a-z]{2,}', domain) else None
+    if EMAIL_TEMPLATE_TOKEN.search(local):
+        return local, domain
+    tokens = re.split(r'([._\-])', local)
+    if not any(token in EMAIL_PATTERN_ALIASES for token in tokens):
+        return None, domain
+    if not all(token in EMAIL_PATTERN_ALIASES or token in '._-' for token in tokens):
+        return None, domain
+    return ''.join(EMAIL_PATTERN_ALIASES.get(token, token) for token in tokens), domain
+
+
+def _confirmed_name_parts(record, contacts_df, romaji_df):
+    """確認済みメールの人物の姓名ローマ字を (first, last, first_short, last_short) で返す"""
+    email_key = normalize_email_key(record.get('email'))
+    if 'email_address' in contacts_df.columns:
+        matched = contacts_df.index[contacts_df['email_address'].map(normalize_email_key, na_action='ignore') == email_key]
+        if len(matched) == 0 and record.get('name') and 'full_name' in contacts_df.columns:
+            name_key = re.sub(r'\s', '', record['name'])
+            matched = contacts_df.index[contacts_df['full_name'].fillna('').str.replace(r'\s', '', regex=True) == name_key]
+        for idx in matched:
+            row = romaji_df.loc[idx]
+            if pd.notna(row['first']) and pd.notna(row['last']):
+                return row['first'], row['last'], row['first_short'], row['last_short']
+
+    # 氏名欄から推定（英字は「名 姓」、かなは「姓 名」の順）
+    words = unicodedata.normalize('NFKC', record.get('name') or '').split()
+    if len(words) == 2:
+        ascii_name = all(re.fullmatch(r'[A-Za-z\-]+', w) for w in words)
+        first, last = (words[0], words[1]) if ascii_name else (words[1], words[0])
+        first, last = romanize_name_part(first), romanize_name_part(last)
+        if first and last:
+            return first, last, shorten_long_vowels(first), shorten_long_vowels(last)
+    return None
+
+
+def infer_email_patterns(confirmed_emails, registered_patterns, contacts_df, romaji_df=None, company_domain=None):
+    """確認済みメール・登録済みパターンから企業のアドレステンプレートを推定
+
+    Returns:
+        DataFrame（template, variant, domain, votes, score）をスコア順に並べたもの。
+        variant は 'full'（長音あり: satou）/ 'short'（長音省略: sato）
+    """
+    if romaji_df is None:
+        romaji_df = contact_romaji_names(contacts_df)
+
+    votes = {}
+    domains = []
+    for record in confirmed_emails:
+        local, _, domain = normalize_email_key(record.get('email')).partition('@')
+        if domain:
+            domains.append(domain)
+        parts = _confirmed_name_parts(record, contacts_df, romaji_df)
+        if not parts:
+            continue
+        first, last, first_short, last_short = parts
+        for variant, (f_name, l_name) in (('full', (first, last)), ('short', (first_short, last_short))):
+            for template in EMAIL_TEMPLATE_PRIORS:
+                rendered = render_email_template(template, pd.Series([f_name]), pd.Series([l_name]))[0]
+                if rendered == local:
+                    votes[(template, variant)] = votes.get((template, variant), 0) + 1
+                    break
+
+    for pattern in registered_patterns:
+        template, domain = parse_registered_pattern(pattern)
+        if domain:
+            domains.append(domain)
+        if template:
+            # 手入力パターンは長音の書き方を区別しないため両方に加点
+            for variant in ('full', 'short'):
+                votes[(template, variant)] = votes.get((template, variant), 0) + EMAIL_REGISTERED_PATTERN_WEIGHT
+
+    domain = pd.Series(domains).value_counts().index[0] if domains else company_domain
+    templates = list(dict.fromkeys([t for t, _ in votes] + list(EMAIL_TEMPLATE_PRIORS)))
+    rows = []
+    total_votes = sum(votes.values())
+    for template in templates:
+        for variant in ('full', 'short'):
+            template_votes = votes.get((template, variant), 0)
+            prior = EMAIL_TEMPLATE_PRIORS.get(template, 0) * (1.0 if variant == 'full' else 0.5)
+            evidence = template_votes / total_votes if total_votes else 0
+            score = EMAIL_EVIDENCE_WEIGHT * evidence + (1 - EMAIL_EVIDENCE_WEIGHT) * prior if total_votes else prior
+            rows.append({'template': template, 'variant': variant, 'domain': domain, 'votes': template_votes, 'score': score})
+    return pd.DataFrame(rows).sort_values(['score', 'votes'], ascending=False, ignore_index=True)
+
+
+def _company_domain(company):
+    """企業URLからドメインを取り出す（https://www.example.co.jp/ → example.co.jp）"""
+    url = (company or {}).get('company_url') or ''
+    host = re.sub(r'^[a-z]+://', '', url.strip().lower()).split('/')[0].split(':')[0]
+    host = re.sub(r'^www\.', '', host)
+    return host if '.' in host else None
+
+
+def generate_email_candidates(contacts_df, patterns_df, excluded_emails=(), confirmed_emails=(), top_n=3):
+    """コンタクトごとに候補メールアドレスをスコア順に top_n 件生成（テンプレート単位でベクトル化）"""
+    columns = ['contact_id', 'full_name', 'rank', 'email', 'template', 'score', 'status']
+    if contacts_df.empty or patterns_df.empty or not patterns_df['domain'].iloc[0]:
+        return pd.DataFrame(columns=columns)
+
+    romaji_df = contact_romaji_names(contacts_df)
+    frames = []
+    for pattern in patterns_df.itertuples():
+        first = romaji_df['first' if pattern.variant == 'full' else 'first_short']
+        last = romaji_df['last' if pattern.variant == 'full' else 'last_short']
+        frames.append(pd.DataFrame({
+            'contact_id': contacts_df['contact_id'],
+            'full_name': contacts_df.get('full_name'),
+            'email': render_email_template(pattern.template, first, last) + '@' + pattern.domain,
+            'template': pattern.template + ('' if pattern.variant == 'full' else '（長音省略）'),
+            'score': pattern.score,
+        }))
+    candidates = pd.concat(frames, ignore_index=True).dropna(subset=['email'])
+
+    # 別人到達済みのアドレスは除外し、同じアドレスはスコアの高いテンプレートのみ残す
+    excluded = {normalize_email_key(e) for e in excluded_emails}
+    candidates = candidates[~candidates['email'].isin(excluded)]
+    candidates = candidates.sort_values('score', ascending=False, kind='stable')
+    candidates = candidates.drop_duplicates(['contact_id', 'email'])
+    candidates['rank'] = candidates.groupby('contact_id').cumcount() + 1
+    candidates = candidates[candidates['rank'] <= top_n]
+
+    confirmed = {normalize_email_key(e) for e in confirmed_emails}
+    current = contacts_df.set_index('contact_id')['email_address'].map(normalize_email_key, na_action='ignore') \
+        if 'email_address' in contacts_df.columns else pd.Series(dtype=object)
+    candidates['status'] = np.select(
+        [candidates['email'].isin(confirmed), candidates['email'].eq(candidates['contact_id'].map(current))],
+        ['実在確認済み', '登録済み'],
+        default=''
+    )
+    return candidates.sort_values(['contact_id', 'rank'], ignore_index=True)[columns]
+
+
+@cache_by_tables(EMAIL_CACHE_TABLES)
+def build_company_email_candidates(company_id, company_name, top_n=3):
+    """企業のコンタクト全員分の候補メールアドレスを生成（企業・関連テーブルのバージョン単位でキャッシュ）
+
+    Returns:
+        (推定パターンのDataFrame, 候補アドレスのDataFrame)
+    """
+    contacts_df = read_table_frame(
+        'contacts',
+        'contact_id, full_name, last_name, first_name, furigana_last_name, furigana_first_name, email_address',
+        filters=lambda q: q.eq('company_id', company_id)
+    )
+    snapshot = load_company_email_snapshot(company_id, company_name)
+    confirmed = snapshot['confirmed']
+    misdelivery = snapshot['misdelivery']
+    registered = [row['pattern'] for row in snapshot['patterns']]
+
+    patterns_df = infer_email_patterns(confirmed, registered, contacts_df, company_domain=_company_domain(snapshot))
+    candidates_df = generate_email_candidates(
+        contacts_df, patterns_df,
+        excluded_emails=[row['email'] for row in misdelivery],
+        confirmed_emails=[row['email'] for row in confirmed],
+        top_n=top_n
+    )
+    return patterns_df, candidates_df
+
+
+def show_email_candidates_tab(company_id, company_name):
+    """候補メールアドレス生成タブ"""
+    st.subheader(f"🧮 {company_name} の候補メールアドレス")
+    st.caption("実在メアド集・メアドパターンから企業のアドレス形式を推定し、コンタクト全員分の候補を生成します（別人到達履歴のアドレスは除外）。")
+
+    top_n = st.slider("1人あたりの候補数", min_value=1, max_value=5, value=3, key=f"email_candidates_top_n_{company_id}")
+    try:
+        patterns_df, candidates_df = build_company_email_candidates(company_id, company_name, top_n)
+    except Exception as e:
+        show_company_email_storage_error(e)
+        return
+
+    if patterns_df.empty or not patterns_df['domain'].iloc[0]:
+        st.info("ドメインが分かりません。実在メアドまたは「*@example.com」形式のメアドパターンを登録してください。")
+        return
+
+    with st.expander("推定したアドレス形式", expanded=False):
+        st.dataframe(
+            patterns_df[patterns_df['score'] > 0].head(10).rename(columns={
+                'template': 'テンプレート', 'variant': '長音', 'domain': 'ドメイン', 'votes': '一致件数', 'score': 'スコア'
+            }),
+            width="stretch",
+            hide_index=True
+        )
+
+    if candidates_df.empty:
+        st.info("候補を生成できるコンタクトがありません（フリガナ・英字氏名が必要です）。")
+        return
+
+    st.write(f"{candidates_df['contact_id'].nunique():,}人分・{len(candidates_df):,}件の候補")
+    display_df = candidates_df.rename(columns={
+        'full_name': '氏名', 'rank': '順位', 'email': '候補アドレス', 'template': '形式', 'score': 'スコア', 'status': '状態'
+    })
+    st.dataframe(display_df.drop(columns=['contact_id']), width="stretch", hide_index=True)
+    st.download_button(
+        label="💾 候補アドレスをCSVでダウンロード",
+        data=display_df.to_csv(index=False).encode('utf-8-sig'),
+        file_name=f"候補メールアドレス_{company_name.replace('/', '_')}.csv",
+        mime="text/csv",
+        key=f"download_email_candidates_{company_id}"
+    )
+
+
 def show_email_patterns_tab(company_id, company_name):
     """メール検索パターンタブ"""
     st.subheader(f"🔍 {company_name} のメアドパターン")
     
-    # 既存パターンの取得（target_companiesテーブルからcompany_nameで取得）
-    result = None
+    # 既存パターンの取得
+    snapshot = {}
     try:
-        # target_companiesテーブルからcompany_nameで取得
-        result = supabase.table('target_companies').select('email_search_patterns').eq('company_name', company_name).execute()
+        snapshot = load_company_email_snapshot(company_id, company_name)
     except Exception as e:
-        st.error(f"データ取得エラー: {str(e)}")
-    
-    existing_patterns = []
-    if result and result.data and len(result.data) > 0 and result.data[0].get('email_search_patterns'):
-        existing_patterns = result.data[0]['email_search_patterns']
+        show_company_email_storage_error(e)
+    existing_patterns = snapshot.get('patterns', [])
     
     # 既存パターンの表示と削除
     if existing_patterns:
         st.write("### 登録済みメアドパターン")
-        patterns_to_keep = existing_patterns.copy()
-        for i, pattern in enumerate(existing_patterns):
+        for pattern in existing_patterns:
             col1, col2 = st.columns([5, 1])
             with col1:
-                st.text(f"• {pattern}")
+                st.text(f"• {pattern['pattern']}")
             with col2:
-                if st.button("🗑️ 削除", key=f"delete_existing_pattern_{company_id}_{i}"):
-                    patterns_to_keep.remove(pattern)
+                if st.button("🗑️ 削除", key=f"delete_existing_pattern_{company_id}_{pattern['pattern_id']}"):
                     try:
-                        # target_companiesテーブルをcompany_nameで更新
-                        supabase.table('target_companies').update({
-                            'email_search_patterns': patterns_to_keep if patterns_to_keep else None
-                        }).eq('company_name', company_name).execute()
+                        delete_company_email('patterns', pattern['pattern_id'])
                         st.success("✅ パターンを削除しました")
                         st.rerun()
                     except Exception as e:
@@ -8975,14 +11001,7 @@ def show_email_patterns_tab(company_id, company_name):
     # メアドサーチ完了日の表示と設定
     st.write("### メアドサーチ完了日")
     
-    # 既存のemail_searchedの取得
-    email_searched = None
-    try:
-        email_result = supabase.table('target_companies').select('email_searched').eq('company_name', company_name).execute()
-        if email_result.data and len(email_result.data) > 0:
-            email_searched = email_result.data[0].get('email_searched')
-    except Exception as e:
-        st.error(f"データ取得エラー: {str(e)}")
+    email_searched = snapshot.get('email_searched')
     
     # 日付入力
     new_email_searched = st.date_input(
@@ -8994,20 +11013,10 @@ def show_email_patterns_tab(company_id, company_name):
     
     if st.button("💾 メアドサーチ完了日を保存", key=f"save_email_searched_{company_id}"):
         try:
-            # target_companiesテーブルをcompany_nameで更新
-            # レコードがない場合は作成
-            check_result = supabase.table('target_companies').select('target_company_id').eq('company_name', company_name).execute()
-            if check_result.data:
-                # 既存レコードを更新
-                supabase.table('target_companies').update({
-                    'email_searched': new_email_searched.isoformat() if new_email_searched else None
-                }).eq('company_name', company_name).execute()
-            else:
-                # 新規レコードを作成
-                supabase.table('target_companies').insert({
-                    'company_name': company_name,
-                    'email_searched': new_email_searched.isoformat() if new_email_searched else None
-                }).execute()
+            # target_companiesの対応レコードを更新（レコードがない場合は作成）
+            save_target_company_fields(company_name, {
+                'email_searched': new_email_searched.isoformat() if new_email_searched else None
+            })
             st.success("✅ メアドサーチ完了日を保存しました")
             st.rerun()
         except Exception as e:
@@ -9024,23 +11033,11 @@ def show_email_patterns_tab(company_id, company_name):
     )
     
     if st.button("➕ メアドパターンを追加", key=f"add_pattern_{company_id}", type="primary"):
-        if new_pattern:
-            updated_patterns = existing_patterns + [new_pattern]
+        if any(p['pattern'] == new_pattern.strip() for p in existing_patterns):
+            st.warning("このパターンは既に登録されています")
+        elif new_pattern.strip():
             try:
-                # target_companiesテーブルをcompany_nameで更新
-                # レコードがない場合は作成
-                check_result = supabase.table('target_companies').select('target_company_id').eq('company_name', company_name).execute()
-                if check_result.data:
-                    # 既存レコードを更新
-                    supabase.table('target_companies').update({
-                        'email_search_patterns': updated_patterns
-                    }).eq('company_name', company_name).execute()
-                else:
-                    # 新規レコードを作成
-                    supabase.table('target_companies').insert({
-                        'company_name': company_name,
-                        'email_search_patterns': updated_patterns
-                    }).execute()
+                add_company_email('patterns', company_id, {'pattern': new_pattern.strip()})
                 st.success("✅ メアドパターンを追加しました")
                 st.rerun()
             except Exception as e:
@@ -9053,25 +11050,17 @@ def show_confirmed_emails_tab(company_id, company_name):
     """確認済みメールタブ"""
     st.subheader(f"✅ {company_name} の実在メアド集")
     
-    # 既存メールの取得（target_companiesテーブルからcompany_nameで取得）
-    result = None
+    # 既存メールの取得（メールアドレスの昇順）
+    existing_emails = []
     try:
-        # target_companiesテーブルからcompany_nameで取得
-        result = supabase.table('target_companies').select('confirmed_emails').eq('company_name', company_name).execute()
+        existing_emails = load_company_email_snapshot(company_id, company_name)['confirmed']
     except Exception as e:
-        st.error(f"データ取得エラー: {str(e)}")
-    
-    existing_emails = []
-    if result and result.data and len(result.data) > 0 and result.data[0].get('confirmed_emails'):
-        existing_emails = result.data[0]['confirmed_emails']
+        show_company_email_storage_error(e)
     
     # 既存メールの表示と削除機能
     if existing_emails:
         st.write("### 登録済み実在メールアドレス")
         
-        # メールアドレスの昇順でソート
-        sorted_emails = sorted(existing_emails, key=lambda x: x.get('email', '').lower())
-        
         # ヘッダー行
         col1, col2, col3, col4, col5, col6, col7 = st.columns([3, 2, 1.5, 1.5, 1.5, 1.5, 0.5])
         with col1:
@@ -9092,9 +11081,7 @@ def show_confirmed_emails_tab(company_id, company_name):
         st.divider()
         
         # 各メールを個別に表示（削除ボタン付き）
-        for email_data in sorted_emails:
-            # 元のリストでのインデックスを取得（削除用）
-            original_index = existing_emails.index(email_data)
+        for email_data in existing_emails:
             col1, col2, col3, col4, col5, col6, col7 = st.columns([3, 2, 1.5, 1.5, 1.5, 1.5, 0.5])
             
             with col1:
@@ -9109,7 +11096,7 @@ def show_confirmed_emails_tab(company_id, company_name):
                 st.write(email_data.get('confirmation_method', ''))
             with col6:
                 # 日付のフォーマット
-                confirmed_date = email_data.get('confirmed_date', '')
+                confirmed_date = email_data.get('confirmed_date') or ''
                 if confirmed_date:
                     try:
                         from datetime import datetime
@@ -9120,13 +11107,9 @@ def show_confirmed_emails_tab(company_id, company_name):
                 else:
                     st.write('')
             with col7:
-                if st.button("🗑️", key=f"delete_email_{company_id}_{original_index}", help=f"{email_data.get('email', '')}を削除"):
-                    updated_emails = [e for j, e in enumerate(existing_emails) if j != original_index]
+                if st.button("🗑️", key=f"delete_email_{company_id}_{email_data['confirmed_email_id']}", help=f"{email_data.get('email', '')}を削除"):
                     try:
-                        # target_companiesテーブルをcompany_nameで更新
-                        supabase.table('target_companies').update({
-                            'confirmed_emails': updated_emails if updated_emails else None
-                        }).eq('company_name', company_name).execute()
+                        delete_company_email('confirmed', email_data['confirmed_email_id'])
                         
                         st.success(f"✅ {email_data.get('email', '')} を削除しました")
                         st.rerun()
@@ -9150,34 +11133,32 @@ def show_confirmed_emails_tab(company_id, company_name):
         method = st.selectbox("確認方法", ["LinkedIn", "企業HP", "名刺交換", "電話確認"], key="new_method")
         confirmed_date = st.date_input("確認日", value=date.today(), key="new_confirmed_date")
     
+    # 他社で同じアドレスが登録されていれば知らせる（別人到達の記録も含む）
+    if email.strip():
+        try:
+            owners = find_email_companies(email)
+            other_companies = sorted({
+                (row.get('companies') or {}).get('company_name', '不明')
+                for rows in owners.values() for row in rows if row['company_id'] != company_id
+            })
+            if other_companies:
+                st.warning(f"⚠️ 同じメールアドレスが他の企業にも登録されています: {', '.join(other_companies)}")
+        except Exception:
+            pass
+    
     if st.button("実在メアドを追加", key="add_email"):
         if email and name:
             new_email = {
-                "email": email,
+                "email": email.strip(),
                 "name": name,
                 "department": department,
                 "position": position,
                 "confirmed_date": confirmed_date.isoformat(),
                 "confirmation_method": method
             }
-            updated_emails = existing_emails + [new_email]
             
             try:
-                # target_companiesテーブルをcompany_nameで更新
-                # レコードがない場合は作成
-                check_result = supabase.table('target_companies').select('target_company_id').eq('company_name', company_name).execute()
-                if check_result.data:
-                    # 既存レコードを更新
-                    supabase.table('target_companies').update({
-                        'confirmed_emails': updated_emails
-                    }).eq('company_name', company_name).execute()
-                else:
-                    # 新規レコードを作成
-                    supabase.table('target_companies').insert({
-                        'company_name': company_name,
-                        'confirmed_emails': updated_emails
-                    }).execute()
-                
+                add_company_email('confirmed', company_id, new_email)
                 st.success("✅ 実在メアドを追加しました")
                 st.rerun()
             except Exception as e:
@@ -9190,25 +11171,17 @@ def show_misdelivery_emails_tab(company_id, company_name):
     """誤送信履歴タブ"""
     st.subheader(f"❌ {company_name} の別人到達履歴")
     
-    # 既存履歴の取得（target_companiesテーブルからcompany_nameで取得）
-    result = None
+    # 既存履歴の取得（メールアドレスの昇順）
+    existing_misdelivery = []
     try:
-        # target_companiesテーブルからcompany_nameで取得
-        result = supabase.table('target_companies').select('misdelivery_emails').eq('company_name', company_name).execute()
+        existing_misdelivery = load_company_email_snapshot(company_id, company_name)['misdelivery']
     except Exception as e:
-        st.error(f"データ取得エラー: {str(e)}")
-    
-    existing_misdelivery = []
-    if result and result.data and len(result.data) > 0 and result.data[0].get('misdelivery_emails'):
-        existing_misdelivery = result.data[0]['misdelivery_emails']
+        show_company_email_storage_error(e)
     
     # 既存履歴の表示と削除機能
     if existing_misdelivery:
         st.write("### 登録済み別人到達履歴")
         
-        # メールアドレスの昇順でソート
-        sorted_misdelivery = sorted(existing_misdelivery, key=lambda x: x.get('email', '').lower())
-        
         # ヘッダー行
         col1, col2, col3, col4, col5 = st.columns([3, 2, 2, 3, 0.5])
         with col1:
@@ -9225,16 +11198,14 @@ def show_misdelivery_emails_tab(company_id, company_name):
         st.divider()
         
         # 各履歴を個別に表示（削除ボタン付き）
-        for sorted_idx, misdelivery_data in enumerate(sorted_misdelivery):
-            # 元のリストでのインデックスを取得（削除用）
-            original_index = existing_misdelivery.index(misdelivery_data)
+        for misdelivery_data in existing_misdelivery:
             col1, col2, col3, col4, col5 = st.columns([3, 2, 2, 3, 0.5])
             
             with col1:
                 st.write(misdelivery_data.get('email', ''))
             with col2:
                 # 日付のフォーマット
-                sent_date = misdelivery_data.get('sent_date', '')
+                sent_date = misdelivery_data.get('sent_date') or ''
                 if sent_date:
                     try:
                         from datetime import datetime
@@ -9245,17 +11216,13 @@ def show_misdelivery_emails_tab(company_id, company_name):
                 else:
                     st.write('')
             with col3:
-                st.write(misdelivery_data.get('reason', ''))
+                st.write(misdelivery_data.get('reason') or '')
             with col4:
-                st.write(misdelivery_data.get('memo', ''))
+                st.write(misdelivery_data.get('memo') or '')
             with col5:
-                if st.button("🗑️", key=f"delete_misdelivery_{company_id}_{sorted_idx}_{original_index}", help=f"{misdelivery_data.get('email', '')}を削除"):
-                    updated_misdelivery = [e for j, e in enumerate(existing_misdelivery) if j != original_index]
+                if st.button("🗑️", key=f"delete_misdelivery_{company_id}_{misdelivery_data['misdelivery_id']}", help=f"{misdelivery_data.get('email', '')}を削除"):
                     try:
-                        # target_companiesテーブルをcompany_nameで更新
-                        supabase.table('target_companies').update({
-                            'misdelivery_emails': updated_misdelivery if updated_misdelivery else None
-                        }).eq('company_name', company_name).execute()
+                        delete_company_email('misdelivery', misdelivery_data['misdelivery_id'])
                         
                         st.success(f"✅ {misdelivery_data.get('email', '')} の記録を削除しました")
                         st.rerun()
@@ -9280,29 +11247,14 @@ def show_misdelivery_emails_tab(company_id, company_name):
     if st.button("別人到達記録を追加", key="add_misdelivery"):
         if wrong_email:
             new_record = {
-                "email": wrong_email,
+                "email": wrong_email.strip(),
                 "sent_date": sent_date.isoformat(),
                 "reason": reason,
                 "memo": memo
             }
-            updated_records = existing_misdelivery + [new_record]
             
             try:
-                # target_companiesテーブルをcompany_nameで更新
-                # レコードがない場合は作成
-                check_result = supabase.table('target_companies').select('target_company_id').eq('company_name', company_name).execute()
-                if check_result.data:
-                    # 既存レコードを更新
-                    supabase.table('target_companies').update({
-                        'misdelivery_emails': updated_records
-                    }).eq('company_name', company_name).execute()
-                else:
-                    # 新規レコードを作成
-                    supabase.table('target_companies').insert({
-                        'company_name': company_name,
-                        'misdelivery_emails': updated_records
-                    }).execute()
-                
+                add_company_email('misdelivery', company_id, new_record)
                 st.success("✅ 別人到達記録を追加しました")
                 st.rerun()
             except Exception as e:
@@ -9315,18 +11267,13 @@ def show_email_memo_section(company_id, company_name):
     """メール検索メモセクション"""
     st.subheader(f"📝 メール検索メモ")
     
-    # 既存メモの取得（target_companiesテーブルからcompany_nameで取得）
-    result = None
+    # 既存メモの取得（企業のメール情報スナップショットから）
+    existing_memo = ""
     try:
-        # target_companiesテーブルからcompany_nameで取得
-        result = supabase.table('target_companies').select('email_search_memo').eq('company_name', company_name).execute()
+        existing_memo = load_company_email_snapshot(company_id, company_name).get('email_search_memo') or ""
     except Exception as e:
         st.error(f"データ取得エラー: {str(e)}")
     
-    existing_memo = ""
-    if result and result.data and len(result.data) > 0 and result.data[0].get('email_search_memo'):
-        existing_memo = result.data[0]['email_search_memo']
-    
     memo = st.text_area(
         "パターンに関する備考",
         value=existing_memo,
@@ -9337,20 +11284,8 @@ def show_email_memo_section(company_id, company_name):
     
     if st.button("💾 メモを保存", key="save_memo", type="secondary"):
         try:
-            # target_companiesテーブルをcompany_nameで更新
-            # レコードがない場合は作成
-            check_result = supabase.table('target_companies').select('target_company_id').eq('company_name', company_name).execute()
-            if check_result.data:
-                # 既存レコードを更新
-                supabase.table('target_companies').update({
-                    'email_search_memo': memo if memo else None
-                }).eq('company_name', company_name).execute()
-            else:
-                # 新規レコードを作成
-                supabase.table('target_companies').insert({
-                    'company_name': company_name,
-                    'email_search_memo': memo if memo else None
-                }).execute()
+            # target_companiesの対応レコードを更新（レコードがない場合は作成）
+            save_target_company_fields(company_name, {'email_search_memo': memo if memo else None})
             
             st.success("✅ メモを保存しました")
         except Exception as e:
@@ -9403,6 +11338,7 @@ def show_company_management():
                     }
                     
                     supabase.table('target_companies').insert(new_company).execute()
+                    invalidate_tables('target_companies')
                     st.success("✅ 企業を追加しました")
                     st.rerun()
                 except Exception as e:
@@ -9411,6 +11347,277 @@ def show_company_management():
                 st.error("企業名は必須です")
 
 
+# =============================================================================
+# マッチング候補者検索
+# =============================================================================
+
+def parse_candidate_age(contact):
+    """候補者の年齢を取得（実年齢 → 推定年齢の代表値の順、不明な場合は30歳）"""
+    age = contact.get('actual_age')
+    if age:
+        return age
+    bounds = parse_age_bounds(contact.get('estimated_age'))
+    return age_bounds_midpoint(*bounds) if bounds else 30
+
+
+def _search_matching_candidates_local(project_id, filters):
+    """全コンタクトを取得してPython側でフィルター（RPC未作成時のフォールバック）"""
+    contacts_data = iter_table_rows(
+        'contacts',
+        'contact_id, full_name, actual_age, estimated_age, department_name, position_name, companies!contacts_company_id_fkey(company_name), target_companies!contacts_target_company_id_fkey(company_name)'
+    )
+
+    # 既に登録済みの候補者IDを取得
+    assigned_contact_ids = set()
+    if filters['exclude_assigned']:
+        assigned_contact_ids = {
+            item['contact_id'] for item in iter_table_rows(
+                'project_assignments', 'assignment_id, contact_id',
+                filters=lambda q: q.eq('project_id', project_id)
+            )
+        }
+
+    candidates = []
+    for c in contacts_data:
+        if c['contact_id'] in assigned_contact_ids:
+            continue
+
+        age = parse_candidate_age(c)
+        if not (filters['min_age'] <= age <= filters['max_age']):
+            continue
+
+        # 統合企業マスタを優先、後方互換性も考慮
+        company_name = ''
+        if c.get('companies'):
+            company_name = c.get('companies', {}).get('company_name', '')
+        elif c.get('target_companies'):
+            company_name = c.get('target_companies', {}).get('company_name', '')
+        department_name = c.get('department_name', '') or ''
+        position_name = c.get('position_name', '') or ''
+        full_name = c.get('full_name', '') or ''
+
+        if filters['name'] and filters['name'].lower() not in full_name.lower():
+            continue
+        if filters['company'] and filters['company'].lower() not in company_name.lower():
+            continue
+        if filters['department'] and filters['department'].lower() not in department_name.lower():
+            continue
+        if filters['position'] and filters['position'].lower() not in position_name.lower():
+            continue
+
+        candidates.append({
+            'contact_id': c['contact_id'],
+            'name': full_name,
+            'age': age,
+            'company': company_name,
+            'department': department_name,
+            'position': position_name
+        })
+    return candidates
+
+
+def search_matching_candidates(project_id, filters, page, page_size):
+    """案件の候補者をサーバー側で検索し、指定ページの候補者と総件数を返す
+
+    フィルター・年齢の正規化・登録済み候補者の除外（アンチジョイン）は
+    search_matching_candidates RPC（matching_candidates_rpc.sql）で実行する。
+    RPCが未作成の場合は全件取得してPython側でフィルターする。
+
+    Args:
+        filters: {'name', 'company', 'department', 'position', 'min_age', 'max_age', 'exclude_assigned'}
+
+    Returns:
+        (候補者リスト, 総件数, サーバー側で検索したか)
+    """
+    params = {
+        'p_project_id': project_id,
+        'p_name': filters['name'] or None,
+        'p_company': filters['company'] or None,
+        'p_department': filters['department'] or None,
+        'p_position': filters['position'] or None,
+        'p_min_age': filters['min_age'],
+        'p_max_age': filters['max_age'],
+        'p_exclude_assigned': filters['exclude_assigned'],
+        'p_limit': page_size,
+        'p_offset': (page - 1) * page_size,
+    }
+    try:
+        rows = supabase.rpc('search_matching_candidates', params).execute().data or []
+    except Exception:
+        candidates = _search_matching_candidates_local(project_id, filters)
+        start = (page - 1) * page_size
+        return candidates[start:start + page_size], len(candidates), False
+
+    candidates = [{
+        'contact_id': row['contact_id'],
+        'name': row.get('full_name') or '',
+        'age': row.get('match_age'),
+        'company': row.get('company_name') or '',
+        'department': row.get('department_name') or '',
+        'position': row.get('position_name') or ''
+    } for row in rows]
+    total = rows[0]['total_count'] if rows else 0
+    return candidates, total, True
+
+
+# マッチ度スコアの重み（合計1.0）
+MATCH_SCORE_WEIGHTS = {
+    'requirements': 0.4,   # 案件要件のキーワード一致率
+    'age': 0.2,            # 年齢要件（min_age〜max_age）との適合度
+    'target_company': 0.2, # ターゲット企業（company_project_roles）に所属
+    'priority': 0.1,       # 優先度
+    'screening': 0.1       # 精査済み
+}
+# 年齢要件から外れた場合に適合度が0になるまでの年数
+MATCH_AGE_TOLERANCE_YEARS = 10
+# 案件要件から抽出するキーワード（英数字の語・カタカナ語・漢字熟語）
+REQUIREMENT_KEYWORD_PATTERN = re.compile(r'[a-z][a-z0-9+#.]*|[ァ-ヶー]{2,}|[一-龥々]{2,}')
+MAX_REQUIREMENT_KEYWORDS = 20
+
+
+def extract_requirement_keywords(requirements):
+    """案件要件の文章からマッチングに使うキーワードを抽出（出現順・重複なし）"""
+    if not requirements:
+        return []
+    keywords = REQUIREMENT_KEYWORD_PATTERN.findall(normalize_search_text(requirements))
+    return list(dict.fromkeys(keywords))[:MAX_REQUIREMENT_KEYWORDS]
+
+
+def _column_values(df, col, default=None):
+    """カラムが無い場合はdefaultで埋めたSeriesを返す"""
+    if col in df.columns:
+        return df[col]
+    return pd.Series(default, index=df.index, dtype=object)
+
+
+@st.cache_resource(max_entries=4)
+def get_candidate_features(_df, data_version):
+    """マッチ度計算用の特徴量配列をデータバージョンごとに一度だけ作成"""
+    df = _df if 'age_min' in _df.columns else add_age_bounds(_df)
+    age = age_bounds_midpoint(df['age_min'].astype(float), df['age_max'].astype(float))
+
+    priority = pd.to_numeric(_column_values(df, 'priority_value'), errors='coerce')
+    priority_max = priority.max()
+    priority_score = priority / priority_max if priority_max and priority_max > 0 else pd.Series(0.0, index=df.index)
+
+    return {
+        'contact_id': pd.to_numeric(_column_values(df, 'contact_id'), errors='coerce').to_numpy(dtype=float),
+        'age': age.to_numpy(dtype=float),
+        'company_id': pd.to_numeric(_column_values(df, 'company_id'), errors='coerce').to_numpy(dtype=float),
+        'target_company_id': pd.to_numeric(_column_values(df, 'target_company_id'), errors='coerce').to_numpy(dtype=float),
+        'priority': priority_score.fillna(0).to_numpy(dtype=float),
+        'screened': _column_values(df, 'screening_status').notna().to_numpy()
+    }
+
+
+def score_candidates(features, keyword_positions, min_age, max_age, target_company_ids):
+    """全候補者のマッチ度（0〜1）をまとめて計算
+
+    Args:
+        keyword_positions: キーワードごとの一致した行位置の配列
+    """
+    size = len(features['contact_id'])
+
+    # 案件要件のキーワード一致率
+    requirement_score = np.zeros(size)
+    for positions in keyword_positions:
+        requirement_score[positions] += 1
+    if keyword_positions:
+        requirement_score /= len(keyword_positions)
+
+    # 年齢要件との適合度（範囲内は1、範囲外は許容年数で線形に減衰、年齢不明は0.5）
+    age = features['age']
+    lower = -np.inf if min_age is None else min_age
+    upper = np.inf if max_age is None else max_age
+    distance = np.maximum(lower - age, 0) + np.maximum(age - upper, 0)
+    age_score = np.clip(1 - distance / MATCH_AGE_TOLERANCE_YEARS, 0, 1)
+    age_score = np.where(np.isnan(age), 0.5, age_score)
+
+    # ターゲット企業への所属
+    targets = np.array(sorted(target_company_ids), dtype=float)
+    target_score = (np.isin(features['company_id'], targets) | np.isin(features['target_company_id'], targets)).astype(float)
+
+    return (
+        MATCH_SCORE_WEIGHTS['requirements'] * requirement_score
+        + MATCH_SCORE_WEIGHTS['age'] * age_score
+        + MATCH_SCORE_WEIGHTS['target_company'] * target_score
+        + MATCH_SCORE_WEIGHTS['priority'] * features['priority']
+        + MATCH_SCORE_WEIGHTS['screening'] * features['screened']
+    )
+
+
+def top_ranked_positions(scores, contact_ids, mask, start, stop):
+    """マスク対象の中からマッチ度順（同点はcontact_id順）で start〜stop 番目の行位置を返す"""
+    candidates = np.flatnonzero(mask)
+    stop = min(stop, len(candidates))
+    if start >= stop:
+        return candidates[:0]
+    # 上位stop件だけを部分ソートで取り出してから並べ替える
+    if stop < len(candidates):
+        top = np.argpartition(-scores[candidates], stop - 1)[:stop]
+        candidates = candidates[top]
+    order = np.lexsort((contact_ids[candidates], -scores[candidates]))
+    return candidates[order][start:stop]
+
+
+def rank_matching_candidates(project, filters, page, page_size):
+    """案件に対するマッチ度順で候補者の指定ページと総件数を返す
+
+    実データに対してのみ順位付けするため、fetch_contacts() と違いサンプルデータには切り替えない
+    （取得エラーは呼び出し元に伝える）。
+    """
+    df = load_contacts_frame()
+    if df.empty:
+        return [], 0
+    data_version = contacts_data_version(df)
+    features = get_candidate_features(df, data_version)
+    search_index = get_contact_search_index(df, data_version)
+
+    project_id = project['project_id']
+    keywords = extract_requirement_keywords(project.get('requirements'))
+    keyword_positions = [df.index.get_indexer(search_index.search(keyword)) for keyword in keywords]
+    target_company_ids = {
+        row['company_id'] for row in iter_table_rows(
+            'company_project_roles', 'id, company_id',
+            filters=lambda q: q.eq('project_id', project_id).eq('role_type', 'target')
+        ) if row.get('company_id') is not None
+    }
+    scores = score_candidates(features, keyword_positions, project.get('min_age'), project.get('max_age'), target_company_ids)
+
+    # 絞り込み条件（年齢不明は従来どおり30歳として判定）
+    filter_age = np.nan_to_num(features['age'], nan=30)
+    mask = (filter_age >= filters['min_age']) & (filter_age <= filters['max_age'])
+    for key, col in [('name', 'full_name'), ('company', 'company_name'), ('department', 'department'), ('position', 'position')]:
+        if filters[key]:
+            mask &= _column_values(df, col).astype('string').str.contains(filters[key], case=False, regex=False, na=False).to_numpy()
+    if filters['exclude_assigned']:
+        assigned_ids = [row['contact_id'] for row in iter_table_rows(
+            'project_assignments', 'assignment_id, contact_id',
+            filters=lambda q: q.eq('project_id', project_id)
+        )]
+        mask &= ~np.isin(features['contact_id'], np.array(assigned_ids, dtype=float))
+
+    start = (page - 1) * page_size
+    positions = top_ranked_positions(scores, features['contact_id'], mask, start, start + page_size)
+
+    keyword_sets = [set(p.tolist()) for p in keyword_positions]
+    candidates = []
+    for position in positions:
+        row = df.iloc[position]
+        age = features['age'][position]
+        candidates.append({
+            'contact_id': int(features['contact_id'][position]),
+            'name': row.get('full_name') or '',
+            'age': None if np.isnan(age) else int(age),
+            'company': row.get('company_name') or '',
+            'department': row.get('department') or '',
+            'position': row.get('position') or '',
+            'score': int(round(scores[position] * 100)),
+            'matched_keywords': [kw for kw, hits in zip(keywords, keyword_sets) if position in hits]
+        })
+    return candidates, int(mask.sum())
+
+
 def show_matching():
     """人材マッチング機能"""
     st.header("🤝 人材マッチング")
@@ -9484,139 +11691,105 @@ def show_matching():
                     exclude_assigned = st.checkbox("この案件の登録済み候補者を除外", value=True, key="exclude_assigned")
             
             # ページネーション設定
-            items_per_page = st.selectbox("表示件数", [10, 20, 50, 100], index=1, key="items_per_page")
+            col_p1, col_p2 = st.columns(2)
+            with col_p1:
+                items_per_page = st.selectbox("表示件数", [10, 20, 50, 100], index=1, key="items_per_page")
+            with col_p2:
+                rank_by_score = st.checkbox(
+                    "🎯 マッチ度順に並べる", value=False, key="matching_rank_by_score",
+                    help="案件の要件・年齢・ターゲット企業・優先度・精査状況からマッチ度を計算します"
+                         "（全コンタクトを読み込むため、通常の検索より時間がかかります）"
+                )
             
-            # 候補者データを取得
+            matching_filters = {
+                'name': name_search,
+                'company': company_filter,
+                'department': department_filter,
+                'position': position_filter,
+                'min_age': age_filter[0],
+                'max_age': age_filter[1],
+                'exclude_assigned': exclude_assigned
+            }
+            
+            # 条件が変わったら1ページ目に戻す
+            filter_key = (selected_project_id, items_per_page, rank_by_score, tuple(sorted(matching_filters.items())))
+            if st.session_state.get('matching_filter_key') != filter_key:
+                st.session_state.matching_filter_key = filter_key
+                st.session_state.current_page = 1
+            
+            def load_candidates(page):
+                if rank_by_score:
+                    return (*rank_matching_candidates(project_details[selected_project_id], matching_filters, page, items_per_page), True)
+                return search_matching_candidates(selected_project_id, matching_filters, page, items_per_page)
+            
+            # 候補者データを取得（指定ページのみ）
             try:
-                contacts_query = supabase.table('contacts').select(
-                    'contact_id, full_name, actual_age, estimated_age, department_name, position_name, companies!contacts_company_id_fkey(company_name), target_companies!contacts_target_company_id_fkey(company_name)'
-                )
-                
-                contacts_result = contacts_query.execute()
-                
-                if contacts_result.data:
-                    # 既に登録済みの候補者IDを取得
-                    assigned_contact_ids = set()
-                    if exclude_assigned:
-                        try:
-                            assigned_result = supabase.table('project_assignments').select('contact_id').eq('project_id', selected_project_id).execute()
-                            if assigned_result.data:
-                                assigned_contact_ids = {item['contact_id'] for item in assigned_result.data}
-                        except:
-                            pass
-                    
-                    candidates = []
-                    for c in contacts_result.data:
-                        # 既に登録済みの候補者をスキップ
-                        if exclude_assigned and c['contact_id'] in assigned_contact_ids:
-                            continue
-                        
-                        # 年齢フィルタ
-                        age = c.get('actual_age')
-                        if not age:
-                            estimated = c.get('estimated_age', '')
-                            if estimated:
-                                try:
-                                    if '歳' in estimated:
-                                        age = int(estimated.split('歳')[0])
-                                    elif '代' in estimated:
-                                        decade = int(estimated.split('代')[0])
-                                        age = decade + 5
-                                    else:
-                                        age = int(estimated)
-                                except (ValueError, IndexError):
-                                    age = 30
-                            else:
-                                age = 30
-                        
-                        if not (age_filter[0] <= age <= age_filter[1]):
-                            continue
-                        
-                        # 各フィルタ条件をチェック（統合企業マスタを優先、後方互換性も考慮）
-                        company_name = ''
-                        if c.get('companies'):
-                            company_name = c.get('companies', {}).get('company_name', '')
-                        elif c.get('target_companies'):
-                            company_name = c.get('target_companies', {}).get('company_name', '')
-                        department_name = c.get('department_name', '') or ''
-                        position_name = c.get('position_name', '') or ''
-                        full_name = c.get('full_name', '') or ''
-                        
-                        # フィルタ条件に合致しない場合はスキップ
-                        if name_search and name_search.lower() not in full_name.lower():
-                            continue
-                        if company_filter and company_filter.lower() not in company_name.lower():
-                            continue
-                        if department_filter and department_filter.lower() not in department_name.lower():
-                            continue
-                        if position_filter and position_filter.lower() not in position_name.lower():
-                            continue
-                        
-                        candidates.append({
-                            'contact_id': c['contact_id'],
-                            'name': full_name,
-                            'age': age,
-                            'company': company_name,
-                            'department': department_name,
-                            'position': position_name
-                        })
-                    
-                    # ページネーション
-                    total_candidates = len(candidates)
-                    total_pages = (total_candidates + items_per_page - 1) // items_per_page
+                current_page = st.session_state.get('current_page', 1)
+                candidates, total_candidates, server_side = load_candidates(current_page)
+                # 追加・削除で件数が減り、ページが範囲外になった場合は1ページ目を再取得
+                if not candidates and current_page > 1:
+                    current_page = st.session_state.current_page = 1
+                    candidates, total_candidates, server_side = load_candidates(current_page)
+                
+                # ページネーション
+                total_pages = (total_candidates + items_per_page - 1) // items_per_page
+                
+                st.write(f"**検索結果: {total_candidates}名**")
+                if not server_side:
+                    st.caption("※ matching_candidates_rpc.sql を実行するとサーバー側で検索されます")
+                
+                if total_candidates > 0:
+                    # ページ選択
+                    if total_pages > 1:
+                        col_page1, col_page2, col_page3 = st.columns([1, 2, 1])
+                        with col_page2:
+                            # 値は session_state.current_page で管理（変更時は再実行で該当ページを取得）
+                            st.number_input(
+                                f"ページ (1-{total_pages})",
+                                min_value=1,
+                                max_value=total_pages,
+                                key="current_page"
+                            )
                     
-                    st.write(f"**検索結果: {total_candidates}名**")
+                    # 現在のページの候補者を表示
+                    start_idx = (current_page - 1) * items_per_page
+                    end_idx = min(start_idx + items_per_page, total_candidates)
                     
-                    if total_candidates > 0:
-                        # ページ選択
-                        if total_pages > 1:
-                            col_page1, col_page2, col_page3 = st.columns([1, 2, 1])
-                            with col_page2:
-                                current_page = st.number_input(
-                                    f"ページ (1-{total_pages})",
-                                    min_value=1,
-                                    max_value=total_pages,
-                                    value=1,
-                                    key="current_page"
-                                )
-                        else:
-                            current_page = 1
-                        
-                        # 現在のページの候補者を表示
-                        start_idx = (current_page - 1) * items_per_page
-                        end_idx = min(start_idx + items_per_page, total_candidates)
-                        page_candidates = candidates[start_idx:end_idx]
-                        
-                        st.write(f"**{start_idx + 1} - {end_idx} 名を表示中 (全{total_candidates}名)**")
-                        
-                        # 候補者リスト表示
-                        for i, candidate in enumerate(page_candidates):
-                            with st.container():
-                                ccol1, ccol2 = st.columns([3, 1])
-                                with ccol1:
+                    st.write(f"**{start_idx + 1} - {end_idx} 名を表示中 (全{total_candidates}名)**")
+                    
+                    # 候補者リスト表示
+                    for i, candidate in enumerate(candidates):
+                        with st.container():
+                            ccol1, ccol2 = st.columns([3, 1])
+                            with ccol1:
+                                if 'score' in candidate:
+                                    st.write(f"**{candidate['name']}** ({candidate['company']}) 　🎯 マッチ度 {candidate['score']}")
+                                else:
                                     st.write(f"**{candidate['name']}** ({candidate['company']})")
-                                    details = []
-                                    if candidate['age']:
-                                        details.append(f"年齢: {candidate['age']}歳")
-                                    if candidate['department']:
-                                        details.append(f"部署: {candidate['department']}")
-                                    if candidate['position']:
-                                        details.append(f"役職: {candidate['position']}")
-                                    if details:
-                                        st.caption(" | ".join(details))
-                                with ccol2:
-                                    if st.button("➕ 追加", key=f"add_{candidate['contact_id']}_{current_page}", type="secondary"):
-                                        add_candidate_to_project(selected_project_id, candidate['contact_id'], candidate['name'])
-                                
-                                if i < len(page_candidates) - 1:  # 最後の要素以外に区切り線を追加
-                                    st.divider()
-                        
-                        # ページネーション情報
-                        if total_pages > 1:
-                            st.caption(f"ページ {current_page} / {total_pages} ({total_candidates} 件中 {start_idx + 1} - {end_idx} 件目)")
-                    else:
-                        st.info("フィルタ条件に合致する候補者が見つかりませんでした。条件を変更してください。")
-                
+                                details = []
+                                if candidate['age']:
+                                    details.append(f"年齢: {candidate['age']}歳")
+                                if candidate['department']:
+                                    details.append(f"部署: {candidate['department']}")
+                                if candidate['position']:
+                                    details.append(f"役職: {candidate['position']}")
+                                if candidate.get('matched_keywords'):
+                                    details.append(f"要件一致: {', '.join(candidate['matched_keywords'])}")
+                                if details:
+                                    st.caption(" | ".join(details))
+                            with ccol2:
+                                if st.button("➕ 追加", key=f"add_{candidate['contact_id']}_{current_page}", type="secondary"):
+                                    add_candidate_to_project(selected_project_id, candidate['contact_id'], candidate['name'])
+                            
+                            if i < len(candidates) - 1:  # 最後の要素以外に区切り線を追加
+                                st.divider()
+                    
+                    # ページネーション情報
+                    if total_pages > 1:
+                        st.caption(f"ページ {current_page} / {total_pages} ({total_candidates} 件中 {start_idx + 1} - {end_idx} 件目)")
+                else:
+                    st.info("フィルタ条件に合致する候補者が見つかりませんでした。条件を変更してください。")
+            
             except Exception as e:
                 st.error(f"候補者データ取得エラー: {str(e)}")
         else:
@@ -9648,6 +11821,7 @@ def add_candidate_to_project(project_id, contact_id, contact_name):
         }
         
         supabase.table('project_assignments').insert(assignment_data).execute()
+        invalidate_tables('project_assignments')
         st.success(f"✅ {contact_name}さんを候補者として追加しました")
         st.rerun()
         
@@ -9732,6 +11906,7 @@ def update_assignment_status(assignment_id, new_status):
             supabase.table('project_assignments').update({
                 'assignment_status': new_status
             }).eq('assignment_id', assignment_id).execute()
+            invalidate_tables('project_assignments')
             st.success(f"✅ ステータスを「{new_status}」に更新しました")
             # rerunの前に少し待機してデータベース更新の完了を待つ
             time.sleep(0.5)
@@ -9752,6 +11927,7 @@ def delete_assignment(assignment_id, contact_name):
     """アサインメントを削除"""
     try:
         supabase.table('project_assignments').delete().eq('assignment_id', assignment_id).execute()
+        invalidate_tables('project_assignments')
         st.success(f"✅ {contact_name}さんを削除しました")
         st.rerun()
     except Exception as e:
@@ -10066,11 +12242,14 @@ def show_contact_project_assignments_summary(contact_id):
 
 
 def check_data_size_and_warn(table_name, record_count):
-    """データサイズを事前チェックして警告"""
+    """データサイズを事前チェックして警告
+
+    エクスポートは一時ファイルへ逐次書き出すため件数によるメモリ不足は起きない。
+    件数が多い場合は処理時間の目安だけを表示する。
+    """
     if record_count > 50000:
-        st.error(f"⚠️ **大量データ警告**: {record_count:,}件のデータがあります。処理に数分かかり、メモリ不足の可能性があります。")
-        st.markdown("**推奨**: より具体的な条件でデータを絞り込んでからエクスポートしてください。")
-        return st.checkbox("⚡ 大量データでも続行する（リスクを承知）", key=f"large_data_warning_{table_name}")
+        st.warning(f"📊 **大量データ**: {record_count:,}件のデータです。処理に数分かかる場合があります。")
+        return st.checkbox("✅ 処理を続行する", value=True, key=f"large_data_continue_{table_name}")
     elif record_count > 10000:
         st.warning(f"📊 **中規模データ**: {record_count:,}件のデータです。処理に1-2分かかる場合があります。")
         return st.checkbox("✅ 処理を続行する", value=True, key=f"medium_data_continue_{table_name}")
@@ -10188,7 +12367,7 @@ def show_project_candidates_export():
 
                                 st.download_button(
                                     label="💾 CSVファイルをダウンロード",
-                                    data=csv_data,
+                                    data=export_download_data(csv_data),
                                     file_name=filename,
                                     mime="text/csv"
                                 )
@@ -10238,7 +12417,7 @@ def show_project_candidates_export():
 
                                 st.download_button(
                                     label="💾 CSVファイルをダウンロード",
-                                    data=csv_data,
+                                    data=export_download_data(csv_data),
                                     file_name=filename,
                                     mime="text/csv"
                                 )
@@ -10348,7 +12527,7 @@ def show_company_contacts_export():
                             
                             st.download_button(
                                 label="💾 CSVファイルをダウンロード",
-                                data=csv_data,
+                                data=export_download_data(csv_data),
                                 file_name=filename,
                                 mime="text/csv"
                             )
@@ -10387,6 +12566,29 @@ def show_full_backup_export():
         list(backup_tables.keys()),
         default=list(backup_tables.keys())
     )
+
+    backup_formats = {
+        "Parquet（テーブル別ZIP・型を保持して再読み込み可能）": "parquet",
+        "CSV（単一ファイル）": "csv"
+    }
+    backup_format = backup_formats[st.radio("バックアップ形式", list(backup_formats.keys()), horizontal=True)]
+    incremental = False
+    if backup_format == "parquet":
+        watermarks = load_backup_watermarks()
+        incremental = st.checkbox(
+            "🔁 差分バックアップ（前回バックアップ以降に更新された行のみ）",
+            value=bool(watermarks),
+            help="前回のParquetバックアップ時点からの更新分と、削除検出用の主キー一覧のみを書き出します。"
+                 "復元時はベースと差分のZIPをまとめて読み込んでください。"
+        )
+        if incremental:
+            for table_name in selected_tables:
+                table_key = backup_tables[table_name]
+                mark = watermarks.get(table_key)
+                if table_key in BACKUP_FULL_ONLY_TABLES:
+                    st.caption(f"{table_name}: 更新日時を記録しないテーブルのため毎回全件")
+                else:
+                    st.caption(f"{table_name}: {'前回 ' + mark + ' 以降の差分' if mark else '前回バックアップなし（全件）'}")
     
     # データサイズ事前チェック
     st.markdown("---")
@@ -10428,26 +12630,39 @@ def show_full_backup_export():
                         progress_text.text("バックアップを開始中... (1/4)")
                         progress_bar.progress(0.1)
                         
-                        csv_data = generate_full_backup_csv_with_progress(selected_tables, backup_tables, progress_bar, progress_text)
+                        if backup_format == "parquet":
+                            backup_data, manifest = generate_full_backup_parquet_with_progress(
+                                selected_tables, backup_tables, progress_bar, progress_text, incremental=incremental
+                            )
+                            extension, mime, label = "zip", "application/zip", "💾 ZIPファイルをダウンロード"
+                        else:
+                            backup_data = generate_full_backup_csv_with_progress(selected_tables, backup_tables, progress_bar, progress_text)
+                            extension, mime, label = "csv", "text/csv", "💾 CSVファイルをダウンロード"
                         
-                        if csv_data:
+                        if backup_data:
                             progress_text.text("ファイルを準備中... (4/4)")
                             progress_bar.progress(0.9)
                             
                             from datetime import datetime
                             timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
-                            filename = f"データバックアップ_{timestamp}.csv"
+                            if backup_format == "parquet":
+                                # 復元時にバックアップ一覧（backup_chain.json）と突き合わせられるよう archive_id を使う
+                                timestamp = manifest['archive_id']
+                            filename = f"データバックアップ_{timestamp}.{extension}"
                             
                             progress_bar.progress(1.0)
                             progress_text.text("✅ 完了！")
                             
                             st.download_button(
-                                label="💾 CSVファイルをダウンロード",
-                                data=csv_data,
+                                label=label,
+                                data=export_download_data(backup_data),
                                 file_name=filename,
-                                mime="text/csv"
+                                mime=mime
                             )
                             st.success("✅ バックアップファイルの準備が完了しました！")
+                            if backup_format == "parquet":
+                                # ダウンロード・保管を確認するまで履歴には記録しない
+                                st.session_state.pending_backup_manifest = manifest
                         else:
                             st.warning("バックアップデータが見つかりませんでした。")
                             
@@ -10459,259 +12674,322 @@ def show_full_backup_export():
         except Exception as e:
             st.error(f"データサイズ確認エラー: {str(e)}")
 
+    show_pending_backup_confirmation()
+
+    chain = backup_chain_manifest()
+    if chain['archives']:
+        with st.expander(f"🗂️ バックアップ履歴（最新のベースから{len(chain['archives'])}件）"):
+            st.dataframe(pd.DataFrame([
+                {'archive_id': a['archive_id'], '種類': a['kind'], '作成日時': a['created_at'][:19].replace('T', ' '),
+                 '件数': sum(t['rows'] for t in a['tables'].values())}
+                for a in chain['archives']
+            ]), width="stretch", hide_index=True)
+            st.download_button(
+                label="📄 バックアップ一覧（backup_chain.json）をダウンロード",
+                data=json.dumps(chain, ensure_ascii=False, indent=2),
+                file_name="backup_chain.json",
+                mime="application/json"
+            )
+
+    st.markdown("---")
+    show_backup_restore()
+
+
+def show_pending_backup_confirmation():
+    """作成したParquetバックアップの保管確認（確認後に履歴へ記録し、次回の差分の起点にする）"""
+    manifest = st.session_state.get('pending_backup_manifest')
+    if not manifest:
+        return
+
+    st.warning(
+        f"⚠️ バックアップ {manifest['archive_id']} はまだ履歴に記録されていません。"
+        "ZIPをダウンロードして保管したら記録してください。"
+        "記録したバックアップは次回の差分バックアップの前のバックアップになるため、"
+        "このZIPがないと以降の差分から復元できなくなります。"
+    )
+    col_confirm, col_discard = st.columns(2)
+    with col_confirm:
+        if st.button("✅ ZIPを保管したので履歴に記録する", key="confirm_backup_archive", type="primary"):
+            record_backup_archive(manifest)
+            del st.session_state.pending_backup_manifest
+            st.success("バックアップ履歴に記録しました")
+            st.rerun()
+    with col_discard:
+        if st.button("🗑️ 記録しない", key="discard_backup_archive"):
+            del st.session_state.pending_backup_manifest
+            st.rerun()
+
+
+def show_backup_restore():
+    """Parquetバックアップ（ZIP）の読み込み・復元"""
+    st.markdown("### 📂 バックアップの読み込み・復元")
+    st.markdown("Parquet形式のバックアップ（ZIP）を読み込み、内容の確認やデータベースへの復元ができます。")
+
+    archive_files = st.file_uploader(
+        "バックアップファイル（ZIP）",
+        type=['zip'],
+        accept_multiple_files=True,
+        key="backup_restore_file",
+        help="差分バックアップはベースから最新までのZIPをまとめて選択してください。"
+    )
+    if not archive_files:
+        return
+
+    try:
+        archives = [load_backup_archive(archive_file) for archive_file in archive_files]
+        frames = merge_backup_chain(archives)
+    except Exception as e:
+        st.error(f"バックアップ読み込みエラー: {str(e)}")
+        return
+
+    labels = {}
+    for manifest, _ in sorted(archives, key=lambda archive: archive[0]['created_at']):
+        kind = "差分" if manifest.get('kind') == 'delta' else "ベース"
+        st.info(f"{kind}: {manifest.get('archive_id', '')}（作成日時: {manifest.get('created_at', '不明')}）")
+        labels.update({table_key: info.get('label', table_key) for table_key, info in manifest['tables'].items()})
+
+    for table_key, df in frames.items():
+        with st.expander(f"{labels.get(table_key, table_key)}（{table_key}）: {len(df):,}件"):
+            st.dataframe(df.head(100), width="stretch")
+
+    restore_tables = st.multiselect("復元するテーブルを選択", list(frames.keys()), key="backup_restore_tables")
+    confirmed = st.checkbox("既存の同じIDの行はバックアップの内容で上書きされることを理解しました", key="backup_restore_confirm")
+    if st.button("♻️ 選択したテーブルを復元", type="primary", disabled=not (restore_tables and confirmed)):
+        progress_text = st.empty()
+        progress_bar = st.progress(0)
+        results = restore_backup_frames({t: frames[t] for t in restore_tables}, progress_bar, progress_text)
+        progress_text.text("✅ 完了！")
+        for table_key, result in results.items():
+            if result['errors']:
+                st.error(f"{table_key}: {result['success_count']:,}件を復元、{len(result['errors'])}件のエラー")
+                for error in result['errors'][:10]:
+                    st.caption(error)
+            else:
+                st.success(f"{table_key}: {result['success_count']:,}件を復元しました")
+
+
+# ============================================
+# CSVエクスポートのストリーミング書き出し
+# ============================================
+
+# これを超えるとスプールがメモリから一時ファイルへ切り替わる
+EXPORT_SPOOL_MAX_BYTES = 8 * 1024 * 1024
+
+PROJECT_CANDIDATES_SELECT = """
+    assignment_id,
+    assignment_status,
+    created_at,
+    contacts(
+        full_name,
+        last_name,
+        first_name,
+        email_address,
+        position_name,
+        profile,
+        screening_status,
+        estimated_age,
+        actual_age,
+        companies!contacts_company_id_fkey(company_name),
+        target_companies!contacts_target_company_id_fkey(company_name)
+    ),
+    projects(
+        project_name,
+        client_companies(company_name)
+    )
+"""
+
+COMPANY_CONTACTS_SELECT = """
+    contact_id,
+    full_name,
+    last_name,
+    first_name,
+    email_address,
+    position_name,
+    department_name,
+    profile,
+    screening_status,
+    estimated_age,
+    actual_age,
+    created_at,
+    companies!contacts_company_id_fkey(company_name),
+    target_companies!contacts_target_company_id_fkey(company_name)
+"""
+
+
+class CsvExportFile:
+    """CSVを1行ずつスプール一時ファイルへ書き出す（Windows対応のUTF-8 BOM付き）
+
+    全件をリストや文字列に溜めずに書き出すため、件数に関わらずメモリ使用量は一定。
+    """
+
+    def __init__(self, max_size=EXPORT_SPOOL_MAX_BYTES):
+        self._spool = tempfile.SpooledTemporaryFile(max_size=max_size, mode='w+b')
+        self._text = io.TextIOWrapper(self._spool, encoding='utf-8-sig', newline='')
+        self._writer = csv.writer(self._text)
+        self.row_count = 0
+
+    def writerow(self, row):
+        self._writer.writerow(row)
+
+    def write_record(self, row):
+        """データ行を書き出す（見出しや区切り行は writerow を使う）"""
+        self._writer.writerow(row)
+        self.row_count += 1
+
+    def finish(self):
+        """書き込みを確定し、先頭に巻き戻したバイナリファイルを返す"""
+        self._text.flush()
+        spool = self._text.detach()
+        spool.seek(0)
+        return spool
+
+    def close(self):
+        self._text.close()
+
+
+def export_download_data(export_file):
+    """st.download_button に渡すデータ（クリック時にスプールから読み出す）
+
+    スプールはセッションごとに1つだけ保持し、次のエクスポートで置き換えるときに閉じる。
+    """
+    previous = st.session_state.get('export_spool')
+    if previous is not None and previous is not export_file:
+        previous.close()
+    st.session_state.export_spool = export_file
+
+    def read_export():
+        export_file.seek(0)
+        return export_file.read()
+    return read_export
+
+
+def read_export_text(export_file):
+    """スプールの内容をBOM付き文字列として返す（レガシー関数用）"""
+    if export_file is None:
+        return None
+    with export_file:
+        return export_file.read().decode('utf-8')
+
+
+def page_progress(progress_bar, start=0.4, end=0.85):
+    """iter_table_rows の on_page に渡すプログレス更新（完了ページ数 / 総ページ数）"""
+    def on_page(pages_done, total_pages):
+        if progress_bar and total_pages:
+            progress_bar.progress(min(end, start + (pages_done / total_pages) * (end - start)))
+    return on_page
+
+
+def _export_value(record, key):
+    value = record.get(key) if record else None
+    return value if value is not None else ''
+
+
+def _contact_company(contact):
+    """統合企業マスタを優先、後方互換性のため旧target_companiesも参照"""
+    return contact.get('companies') or contact.get('target_companies') or {}
+
+
+def project_candidate_csv_row(row, include_client=False):
+    """project_assignments の1件を候補者リストCSVの1行に整形"""
+    contact = row.get('contacts') or {}
+    project = row.get('projects') or {}
+    created_at = row.get('created_at')
+
+    csv_row = [
+        _export_value(contact, 'full_name'),
+        _export_value(contact, 'last_name'),
+        _export_value(contact, 'first_name'),
+        _export_value(contact, 'email_address'),
+        _export_value(_contact_company(contact), 'company_name'),
+        _export_value(contact, 'position_name'),
+        _export_value(contact, 'profile'),
+        contact.get('estimated_age') or contact.get('actual_age') or '',
+        _export_value(contact, 'screening_status'),
+        _export_value(row, 'assignment_status'),
+        _export_value(project, 'project_name')
+    ]
+    if include_client:
+        csv_row.append(_export_value(project.get('client_companies') or {}, 'company_name'))
+    csv_row.append(created_at[:10] if created_at else '')
+    return csv_row
+
+
+def company_contact_csv_row(contact):
+    """contacts の1件をコンタクトリストCSVの1行に整形"""
+    created_at = contact.get('created_at')
+    return [
+        _export_value(contact, 'full_name'),
+        _export_value(contact, 'last_name'),
+        _export_value(contact, 'first_name'),
+        _export_value(contact, 'email_address'),
+        _export_value(_contact_company(contact), 'company_name'),
+        _export_value(contact, 'department_name'),
+        _export_value(contact, 'position_name'),
+        _export_value(contact, 'profile'),
+        contact.get('estimated_age') or contact.get('actual_age') or '',
+        _export_value(contact, 'screening_status'),
+        created_at[:10] if created_at else ''
+    ]
+
+
+def write_rows_csv(rows, headers, to_row):
+    """行を取得しながらCSVへ逐次書き出す。0件の場合はNone"""
+    export_file = CsvExportFile()
+    try:
+        export_file.writerow(headers)
+        for row in rows:
+            if not row:
+                continue
+            export_file.write_record(to_row(row))
+    except Exception:
+        export_file.close()
+        raise
+
+    if export_file.row_count == 0:
+        export_file.close()
+        return None
+    return export_file.finish()
+
 
 def generate_project_candidates_csv_with_progress(project_id, progress_bar, progress_text):
-    """プログレスバー付き案件別候補者データのCSV生成"""
+    """プログレスバー付き案件別候補者データのCSV生成（スプール一時ファイルを返す）"""
     try:
         if progress_text:
-            progress_text.text("データベースからデータを取得中... (2/3)")
+            progress_text.text("データを取得しながらCSVファイルを生成中... (2/3)")
         if progress_bar:
             progress_bar.progress(0.4)
 
-        # ページング機能付きでデータを取得
-        page_size = 1000
-        offset = 0
-        all_data = []
-
-        while True:
-            query = """
-                assignment_id,
-                assignment_status,
-                created_at,
-                contacts(
-                    full_name,
-                    last_name,
-                    first_name,
-                    email_address,
-                    position_name,
-                    profile,
-                    screening_status,
-                    estimated_age,
-                    actual_age,
-                    companies!contacts_company_id_fkey(company_name),
-                    target_companies!contacts_target_company_id_fkey(company_name)
-                ),
-                projects(
-                    project_name,
-                    client_companies(company_name)
-                )
-            """
-            
-            response = supabase.table('project_assignments')\
-                .select(query)\
-                .eq('project_id', project_id)\
-                .range(offset, offset + page_size - 1)\
-                .execute()
-            
-            if not response.data:
-                break
-                
-            all_data.extend(response.data)
-            offset += page_size
-            
-            # プログレス更新
-            if progress_bar:
-                progress_value = min(0.8, 0.4 + (len(all_data) / max(1, len(all_data) + 100)) * 0.4)
-                progress_bar.progress(progress_value)
-        
-        if not all_data:
-            return None
-        
-        if progress_text:
-            progress_text.text("CSVファイルを生成中... (2/3)")
-        if progress_bar:
-            progress_bar.progress(0.7)
-        
-        # CSV用データ整形
-        csv_rows = []
         headers = [
             '候補者氏名', '姓', '名', 'メールアドレス', '企業名', '役職',
             'プロフィール', '年齢', 'スクリーニング状況', 'アサイン状況',
             '案件名', '登録日'
         ]
-        csv_rows.append(headers)
-        
-        for i, row in enumerate(all_data):
-            # プログレス更新（処理の重い部分）
-            if i % 100 == 0 and progress_bar:
-                progress_value = min(0.85, 0.7 + (i / len(all_data)) * 0.15)
-                progress_bar.progress(progress_value)
-            
-            # 安全なデータ取得（Noneチェック）
-            contact = row.get('contacts') if row else None
-            contact = contact if contact is not None else {}
-
-            # 統合企業マスタを優先、後方互換性も考慮
-            company = None
-            if contact.get('companies'):
-                company = contact.get('companies')
-            elif contact.get('target_companies'):
-                company = contact.get('target_companies')
-            company = company if company is not None else {}
-            
-            project = row.get('projects') if row else None
-            project = project if project is not None else {}
-            
-            project_company = project.get('client_companies') if project else None
-            project_company = project_company if project_company is not None else {}
-            
-            csv_row = [
-                contact.get('full_name', '') if contact else '',
-                contact.get('last_name', '') if contact else '',
-                contact.get('first_name', '') if contact else '',
-                contact.get('email_address', '') if contact else '',
-                company.get('company_name', '') if company else '',
-                contact.get('position_name', '') if contact else '',
-                contact.get('profile', '') if contact else '',
-                contact.get('estimated_age', '') or contact.get('actual_age', '') if contact else '',
-                contact.get('screening_status', '') if contact else '',
-                row.get('assignment_status', '') if row else '',
-                project.get('project_name', '') if project else '',
-                row.get('created_at', '')[:10] if row and row.get('created_at') else ''
-            ]
-            csv_rows.append(csv_row)
-        
-        if progress_bar:
-            progress_bar.progress(0.85)
-        
-        # CSV文字列生成（Windows対応のUTF-8 BOM付き）
-        import io
-        output = io.StringIO()
-        import csv
-        writer = csv.writer(output)
-        writer.writerows(csv_rows)
-        
-        # UTF-8 BOM付きで返す
-        return '\ufeff' + output.getvalue()
-        
+        rows = iter_table_rows('project_assignments', PROJECT_CANDIDATES_SELECT,
+            filters=lambda q: q.eq('project_id', project_id),
+            parallel=True, on_page=page_progress(progress_bar))
+        return write_rows_csv(rows, headers, project_candidate_csv_row)
+
     except Exception as e:
         st.error(f"CSV生成エラー: {str(e)}")
         return None
 
 
 def generate_all_project_candidates_csv_with_progress(progress_bar, progress_text):
-    """プログレスバー付きすべての案件の候補者データのCSV生成"""
+    """プログレスバー付きすべての案件の候補者データのCSV生成（スプール一時ファイルを返す）"""
     try:
         if progress_text:
-            progress_text.text("全案件のデータベースからデータを取得中... (2/3)")
+            progress_text.text("全案件のデータを取得しながらCSVファイルを生成中... (2/3)")
         if progress_bar:
             progress_bar.progress(0.4)
 
-        # ページング機能付きでデータを取得（project_idの制限なし）
-        page_size = 1000
-        offset = 0
-        all_data = []
-
-        while True:
-            query = """
-                assignment_id,
-                assignment_status,
-                created_at,
-                contacts(
-                    full_name,
-                    last_name,
-                    first_name,
-                    email_address,
-                    position_name,
-                    profile,
-                    screening_status,
-                    estimated_age,
-                    actual_age,
-                    companies!contacts_company_id_fkey(company_name),
-                    target_companies!contacts_target_company_id_fkey(company_name)
-                ),
-                projects(
-                    project_name,
-                    client_companies(company_name)
-                )
-            """
-
-            response = supabase.table('project_assignments')\
-                .select(query)\
-                .range(offset, offset + page_size - 1)\
-                .execute()
-
-            if not response.data:
-                break
-
-            all_data.extend(response.data)
-            offset += page_size
-
-            # プログレス更新
-            if progress_bar:
-                progress_value = min(0.8, 0.4 + (len(all_data) / max(1, len(all_data) + 100)) * 0.4)
-                progress_bar.progress(progress_value)
-
-        if not all_data:
-            return None
-
-        if progress_text:
-            progress_text.text("全案件CSVファイルを生成中... (2/3)")
-        if progress_bar:
-            progress_bar.progress(0.7)
-
-        # CSV用データ整形
-        csv_rows = []
         headers = [
             '候補者氏名', '姓', '名', 'メールアドレス', '企業名', '役職',
             'プロフィール', '年齢', 'スクリーニング状況', 'アサイン状況',
             '案件名', '依頼企業', '登録日'
         ]
-        csv_rows.append(headers)
-
-        for i, row in enumerate(all_data):
-            # プログレス更新（処理の重い部分）
-            if i % 100 == 0 and progress_bar:
-                progress_value = min(0.85, 0.7 + (i / len(all_data)) * 0.15)
-                progress_bar.progress(progress_value)
-
-            # 安全なデータ取得（Noneチェック）
-            contact = row.get('contacts') if row else None
-            contact = contact if contact is not None else {}
-
-            # 統合企業マスタを優先、後方互換性も考慮
-            company = None
-            if contact.get('companies'):
-                company = contact.get('companies')
-            elif contact.get('target_companies'):
-                company = contact.get('target_companies')
-            company = company if company is not None else {}
-
-            project = row.get('projects') if row else None
-            project = project if project is not None else {}
-
-            project_company = project.get('client_companies') if project else None
-            project_company = project_company if project_company is not None else {}
-
-            csv_row = [
-                contact.get('full_name', '') if contact else '',
-                contact.get('last_name', '') if contact else '',
-                contact.get('first_name', '') if contact else '',
-                contact.get('email_address', '') if contact else '',
-                company.get('company_name', '') if company else '',
-                contact.get('position_name', '') if contact else '',
-                contact.get('profile', '') if contact else '',
-                contact.get('estimated_age', '') or contact.get('actual_age', '') if contact else '',
-                contact.get('screening_status', '') if contact else '',
-                row.get('assignment_status', '') if row else '',
-                project.get('project_name', '') if project else '',
-                project_company.get('company_name', '') if project_company else '',
-                row.get('created_at', '')[:10] if row and row.get('created_at') else ''
-            ]
-            csv_rows.append(csv_row)
-
-        if progress_bar:
-            progress_bar.progress(0.85)
-
-        # CSV文字列生成（Windows対応のUTF-8 BOM付き）
-        import io
-        output = io.StringIO()
-        import csv
-        writer = csv.writer(output)
-        writer.writerows(csv_rows)
-
-        # UTF-8 BOM付きで返す
-        return '\ufeff' + output.getvalue()
+        rows = iter_table_rows('project_assignments', PROJECT_CANDIDATES_SELECT,
+            parallel=True, on_page=page_progress(progress_bar))
+        return write_rows_csv(rows, headers, lambda row: project_candidate_csv_row(row, include_client=True))
 
     except Exception as e:
         st.error(f"全案件CSV生成エラー: {str(e)}")
@@ -10721,115 +12999,33 @@ def generate_all_project_candidates_csv_with_progress(progress_bar, progress_tex
 def generate_project_candidates_csv(project_id):
     """レガシー関数（後方互換性のため）"""
     try:
-        return generate_project_candidates_csv_with_progress(project_id, None, None)
+        return read_export_text(generate_project_candidates_csv_with_progress(project_id, None, None))
     except Exception as e:
         st.error(f"CSV生成エラー: {str(e)}")
         return None
 
 
 def generate_company_contacts_csv_with_progress(company_id, progress_bar, progress_text):
-    """プログレスバー付き企業別コンタクトデータのCSV生成"""
+    """プログレスバー付き企業別コンタクトデータのCSV生成（スプール一時ファイルを返す）"""
     try:
-        progress_text.text("データベースからデータを取得中... (2/3)")
-        progress_bar.progress(0.4)
-
-        # ページング機能付きでデータを取得
-        page_size = 1000
-        offset = 0
-        all_data = []
-
-        while True:
-            # クエリ構築（統一企業マスタを使用、後方互換性も考慮）
-            query = supabase.table('contacts').select("""
-                contact_id,
-                full_name,
-                last_name,
-                first_name,
-                email_address,
-                position_name,
-                department_name,
-                profile,
-                screening_status,
-                estimated_age,
-                actual_age,
-                created_at,
-                companies!contacts_company_id_fkey(company_name),
-                target_companies!contacts_target_company_id_fkey(company_name)
-            """)
-
-            # 企業IDが指定されている場合のみフィルタリング（新旧両方のIDに対応）
-            if company_id is not None:
-                query = query.or_(f'company_id.eq.{company_id},target_company_id.eq.{company_id}')
-
-            response = query.range(offset, offset + page_size - 1).execute()
-            
-            if not response.data:
-                break
-                
-            all_data.extend(response.data)
-            offset += page_size
-            
-            # プログレス更新
-            if progress_bar:
-                progress_value = min(0.8, 0.4 + (len(all_data) / max(1, len(all_data) + 100)) * 0.4)
-                progress_bar.progress(progress_value)
-        
-        if not all_data:
-            return None
-        
         if progress_text:
-            progress_text.text("CSVファイルを生成中... (2/3)")
+            progress_text.text("データを取得しながらCSVファイルを生成中... (2/3)")
         if progress_bar:
-            progress_bar.progress(0.7)
-        
-        # CSV用データ整形
-        csv_rows = []
+            progress_bar.progress(0.4)
+
+        # 企業IDが指定されている場合のみフィルタリング（新旧両方のIDに対応）
+        filters = None
+        if company_id is not None:
+            filters = lambda q: q.or_(f'company_id.eq.{company_id},target_company_id.eq.{company_id}')
+
         headers = [
             '氏名', '姓', '名', 'メールアドレス', '企業名', '部署名', '役職',
             'プロフィール', '年齢', 'スクリーニング状況', '登録日'
         ]
-        csv_rows.append(headers)
-        
-        for i, contact in enumerate(all_data):
-            # プログレス更新（処理の重い部分）
-            if i % 100 == 0 and progress_bar:
-                progress_value = min(0.85, 0.7 + (i / len(all_data)) * 0.15)
-                progress_bar.progress(progress_value)
-            
-            # 安全なデータ取得（統一企業マスタを優先、後方互換性も考慮）
-            company = contact.get('companies') if contact else None
-            if not company:
-                # 統一企業マスタにない場合は旧target_companiesから取得
-                company = contact.get('target_companies') if contact else None
-            company = company if company is not None else {}
-            
-            csv_row = [
-                contact.get('full_name', '') if contact else '',
-                contact.get('last_name', '') if contact else '',
-                contact.get('first_name', '') if contact else '',
-                contact.get('email_address', '') if contact else '',
-                company.get('company_name', '') if company else '',
-                contact.get('department_name', '') if contact else '',
-                contact.get('position_name', '') if contact else '',
-                contact.get('profile', '') if contact else '',
-                contact.get('estimated_age', '') or contact.get('actual_age', '') if contact else '',
-                contact.get('screening_status', '') if contact else '',
-                contact.get('created_at', '')[:10] if contact and contact.get('created_at') else ''
-            ]
-            csv_rows.append(csv_row)
-        
-        if progress_bar:
-            progress_bar.progress(0.85)
-        
-        # CSV文字列生成（Windows対応のUTF-8 BOM付き）
-        import io
-        output = io.StringIO()
-        import csv
-        writer = csv.writer(output)
-        writer.writerows(csv_rows)
-        
-        return '\ufeff' + output.getvalue()
-        
+        rows = iter_table_rows('contacts', COMPANY_CONTACTS_SELECT, filters=filters,
+            parallel=True, on_page=page_progress(progress_bar))
+        return write_rows_csv(rows, headers, company_contact_csv_row)
+
     except Exception as e:
         st.error(f"CSV生成エラー: {str(e)}")
         return None
@@ -10838,90 +13034,55 @@ def generate_company_contacts_csv_with_progress(company_id, progress_bar, progre
 def generate_company_contacts_csv(company_id):
     """レガシー関数（後方互換性のため）"""
     try:
-        return generate_company_contacts_csv_with_progress(company_id, None, None)
+        return read_export_text(generate_company_contacts_csv_with_progress(company_id, None, None))
     except Exception as e:
         st.error(f"CSV生成エラー: {str(e)}")
         return None
 
 
 def generate_full_backup_csv_with_progress(selected_tables, backup_tables, progress_bar, progress_text):
-    """プログレスバー付き全データバックアップCSV生成"""
+    """プログレスバー付き全データバックアップCSV生成（スプール一時ファイルを返す）"""
+    export_file = CsvExportFile()
     try:
-        import io
-        output = io.StringIO()
-        import csv
-        writer = csv.writer(output)
-        
         total_tables = len(selected_tables)
-        
+
         # 各テーブルのデータを連続して出力
         for i, table_name in enumerate(selected_tables):
             table_key = backup_tables[table_name]
-            
+
             if progress_text:
                 progress_text.text(f"テーブル処理中: {table_name} ({i+1}/{total_tables})")
             base_progress = 0.2 + (i / total_tables) * 0.6
             if progress_bar:
                 progress_bar.progress(base_progress)
-            
+
             # テーブル名をヘッダーとして追加
-            writer.writerow([f"=== {table_name} ==="])
-            
-            # ページング機能付きでテーブルデータ取得
-            page_size = 1000
-            offset = 0
-            table_data = []
-            
-            while True:
-                response = supabase.table(table_key)\
-                    .select('*')\
-                    .range(offset, offset + page_size - 1)\
-                    .execute()
-                
-                if not response.data:
-                    break
-                    
-                table_data.extend(response.data)
-                offset += page_size
-                
-                # テーブル内でのプログレス更新
-                if progress_bar:
-                    inner_progress = base_progress + (len(table_data) / max(1, len(table_data) + 100)) * (0.6 / total_tables) * 0.8
-                    progress_bar.progress(min(0.8, inner_progress))
-            
-            if table_data and len(table_data) > 0:
-                # 最初の有効なレコードからヘッダーを取得
-                valid_record = None
-                for record in table_data:
-                    if record:
-                        valid_record = record
-                        break
-                
-                if valid_record:
-                    # ヘッダー行
-                    headers = list(valid_record.keys())
-                    writer.writerow(headers)
-                    
-                    # データ行（安全なアクセス）
-                    for j, row in enumerate(table_data):
-                        if row:
-                            data_row = [str(row.get(header, '')) if row.get(header) is not None else '' for header in headers]
-                            writer.writerow(data_row)
-                        
-                        # 大量データの場合のプログレス更新
-                        if j % 500 == 0 and progress_bar:
-                            write_progress = base_progress + (0.6 / total_tables) * 0.8 + (j / len(table_data)) * (0.6 / total_tables) * 0.2
-                            progress_bar.progress(min(0.8, write_progress))
-            
+            export_file.writerow([f"=== {table_name} ==="])
+
+            # ヘッダーは最初の有効なレコードから決め、以降の行はそのまま書き出す
+            headers = None
+            on_page = page_progress(progress_bar, base_progress, base_progress + 0.6 / total_tables)
+            for row in iter_table_rows(table_key, parallel=True, on_page=on_page):
+                if not row:
+                    continue
+                if headers is None:
+                    headers = list(row.keys())
+                    export_file.writerow(headers)
+                export_file.write_record(['' if row.get(header) is None else str(row.get(header)) for header in headers])
+
             # テーブル間の区切り
-            writer.writerow([])
-        
+            export_file.writerow([])
+
         if progress_bar:
             progress_bar.progress(0.85)
-        
-        return '\ufeff' + output.getvalue()
-        
+
+        if export_file.row_count == 0:
+            export_file.close()
+            return None
+        return export_file.finish()
+
     except Exception as e:
+        export_file.close()
         st.error(f"バックアップ生成エラー: {str(e)}")
         return None
 
@@ -10929,12 +13090,341 @@ def generate_full_backup_csv_with_progress(selected_tables, backup_tables, progr
 def generate_full_backup_csv(selected_tables, backup_tables):
     """レガシー関数（後方互換性のため）"""
     try:
-        return generate_full_backup_csv_with_progress(selected_tables, backup_tables, None, None)
+        return read_export_text(generate_full_backup_csv_with_progress(selected_tables, backup_tables, None, None))
     except Exception as e:
         st.error(f"バックアップ生成エラー: {str(e)}")
         return None
 
 
+# ============================================
+# カラムナ形式バックアップ（Parquet / テーブル別ZIP）
+# ============================================
+
+BACKUP_FORMAT_VERSION = 1
+BACKUP_MANIFEST_NAME = 'manifest.json'
+BACKUP_PARQUET_COMPRESSION = 'zstd'
+
+# 復元時の書き込み順（外部キーの参照先を先に復元する）
+BACKUP_RESTORE_ORDER = [
+    'companies', 'target_companies', 'client_companies', 'search_assignees',
+    'priority_levels', 'approach_methods', 'contacts', 'projects',
+    'project_assignments', 'contact_approaches'
+]
+# 復元時に送らないカラム（GENERATED ALWAYS 列はNULLを含めて値を指定すると書き込みが拒否される）
+BACKUP_GENERATED_COLUMNS = {
+    'contacts': ('search_text', 'age_min', 'age_max'),  # contacts_search_index.sql / contacts_age_bounds.sql
+    'company_confirmed_emails': ('email_key',),  # company_email_tables.sql
+    'company_misdelivery_emails': ('email_key',),
+}
+
+
+def _is_json_value(value):
+    return isinstance(value, (dict, list))
+
+
+def backup_frame_from_rows(rows):
+    """取得行をParquetに書き出せるDataFrameにする
+
+    数値・真偽値はNULLを含んでも型を保つよう nullable 型に変換し、
+    JSONB列（dict/list）はJSON文字列にして列名を返す。
+    """
+    df = pd.DataFrame(rows)
+    json_columns = [
+        col for col in df.columns
+        if df[col].dtype == object and df[col].map(_is_json_value).any()
+    ]
+    for col in json_columns:
+        df[col] = df[col].map(lambda v: json.dumps(v, ensure_ascii=False) if _is_json_value(v) else None)
+    return df.convert_dtypes(), json_columns
+
+
+# バックアップのウォーターマーク・履歴を記録するローカルSQLiteファイル
+BACKUP_STATE_DB_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), '.backup_state.sqlite3')
+
+# 差分バックアップで変更行の判定に使う列
+BACKUP_WATERMARK_COLUMN = 'updated_at'
+# 差分にせず毎回全件を書き出すテーブル
+# （project_assignments は updated_at の自動更新トリガーがなく、ステータス更新でも updated_at を設定しないため）
+BACKUP_FULL_ONLY_TABLES = ('project_assignments',)
+
+
+def _backup_state_connection():
+    """バックアップ履歴DBへの接続を開く（テーブルがなければ作成）"""
+    conn = sqlite3.connect(BACKUP_STATE_DB_PATH, timeout=30)
+    conn.row_factory = sqlite3.Row
+    conn.executescript("""
+        CREATE TABLE IF NOT EXISTS backup_archives (
+            archive_id TEXT PRIMARY KEY,
+            kind TEXT NOT NULL,
+            parent_archive_id TEXT,
+            manifest TEXT NOT NULL,
+            created_at TEXT NOT NULL
+        );
+        CREATE TABLE IF NOT EXISTS backup_watermarks (
+            table_name TEXT PRIMARY KEY,
+            watermark TEXT,
+            archive_id TEXT NOT NULL,
+            updated_at TEXT NOT NULL
+        );
+    """)
+    return conn
+
+
+def load_backup_watermarks():
+    """テーブルごとの前回バックアップのウォーターマーク {テーブル名: 日時文字列}"""
+    with closing(_backup_state_connection()) as conn:
+        rows = conn.execute("SELECT table_name, watermark FROM backup_watermarks WHERE watermark IS NOT NULL").fetchall()
+    return {row['table_name']: row['watermark'] for row in rows}
+
+
+def latest_backup_archive():
+    """最後に作成したバックアップの記録（なければNone）"""
+    with closing(_backup_state_connection()) as conn:
+        row = conn.execute("SELECT * FROM backup_archives ORDER BY created_at DESC LIMIT 1").fetchone()
+    return dict(row) if row else None
+
+
+def record_backup_archive(manifest):
+    """バックアップの manifest を履歴に残し、各テーブルのウォーターマークを進める
+
+    ベースバックアップは新しい系列の起点になるため、含まれないテーブルのウォーターマークは破棄する
+    （次回の差分バックアップでそのテーブルは全件を書き出す）。
+    """
+    with closing(_backup_state_connection()) as conn, conn:
+        if manifest['kind'] == 'base':
+            conn.execute("DELETE FROM backup_watermarks")
+        conn.execute(
+            "INSERT INTO backup_archives (archive_id, kind, parent_archive_id, manifest, created_at) VALUES (?, ?, ?, ?, ?)",
+            (manifest['archive_id'], manifest['kind'], manifest['parent_archive_id'],
+             json.dumps(manifest, ensure_ascii=False), manifest['created_at'])
+        )
+        conn.executemany(
+            """INSERT INTO backup_watermarks (table_name, watermark, archive_id, updated_at) VALUES (?, ?, ?, ?)
+               ON CONFLICT(table_name) DO UPDATE SET
+                   watermark = excluded.watermark, archive_id = excluded.archive_id, updated_at = excluded.updated_at""",
+            [(table_key, info['watermark'], manifest['archive_id'], manifest['created_at'])
+             for table_key, info in manifest['tables'].items()]
+        )
+
+
+def backup_chain_manifest():
+    """最新のベースバックアップから現在までのバックアップ一覧（復元時に順に適用する）"""
+    with closing(_backup_state_connection()) as conn:
+        rows = conn.execute("SELECT archive_id, kind, parent_archive_id, manifest, created_at FROM backup_archives ORDER BY created_at").fetchall()
+
+    chain = []
+    for row in rows:
+        if row['kind'] == 'base':
+            chain = []
+        manifest = json.loads(row['manifest'])
+        chain.append({
+            'archive_id': row['archive_id'],
+            'file_name': f"データバックアップ_{row['archive_id']}.zip",
+            'kind': row['kind'],
+            'parent_archive_id': row['parent_archive_id'],
+            'created_at': row['created_at'],
+            'tables': {table_key: {'mode': info['mode'], 'rows': info['rows'], 'since': info['since'], 'watermark': info['watermark']}
+                       for table_key, info in manifest['tables'].items()}
+        })
+    return {'format_version': BACKUP_FORMAT_VERSION, 'archives': chain}
+
+
+def _backup_watermark(df, watermark_column):
+    """バックアップした行の watermark_column の最大値（DBから返された文字列のまま）"""
+    if watermark_column not in df.columns:
+        return None
+    mark = _updated_at_mark(df[[watermark_column]].rename(columns={watermark_column: 'updated_at'}))
+    return str(mark) if mark is not None else None
+
+
+def generate_full_backup_parquet_with_progress(selected_tables, backup_tables, progress_bar, progress_text, incremental=False):
+    """プログレスバー付き全データバックアップ（テーブルごとのParquetをまとめたZIP）
+
+    ZIPには <テーブル名>.parquet と manifest.json（件数・JSONB列・ウォーターマーク）を格納する。
+    incremental=True の場合、前回バックアップのウォーターマークがあるテーブルは
+    それ以降に更新された行と、削除検出用の主キー一覧（<テーブル名>.keys.parquet）のみを書き出す。
+    スプール一時ファイルと manifest を返し、データがない場合は (None, manifest)。
+    履歴への記録（ウォーターマークの更新）はZIPの保管を確認してから record_backup_archive で行う。
+    """
+    archive_file = tempfile.SpooledTemporaryFile(max_size=EXPORT_SPOOL_MAX_BYTES, mode='w+b')
+    try:
+        watermarks = load_backup_watermarks() if incremental else {}
+        created_at = datetime.now()
+        parent = latest_backup_archive() if incremental else None
+        manifest = {
+            'format_version': BACKUP_FORMAT_VERSION,
+            'archive_id': f"{created_at.strftime('%Y%m%d_%H%M%S')}_{uuid.uuid4().hex[:8]}",
+            'kind': 'base',
+            'parent_archive_id': parent['archive_id'] if parent else None,
+            'created_at': created_at.isoformat(),
+            'tables': {}
+        }
+        total_tables = len(selected_tables)
+        total_rows = 0
+
+        # Parquet内部で圧縮済みのため、ZIPは無圧縮でまとめる
+        with zipfile.ZipFile(archive_file, 'w', compression=zipfile.ZIP_STORED) as archive:
+            for i, table_name in enumerate(selected_tables):
+                table_key = backup_tables[table_name]
+                watermark_column = BACKUP_WATERMARK_COLUMN
+                full_only = table_key in BACKUP_FULL_ONLY_TABLES
+                since = None if full_only else watermarks.get(table_key)
+
+                if progress_text:
+                    progress_text.text(f"テーブル処理中: {table_name} ({i+1}/{total_tables})")
+                base_progress = 0.2 + (i / total_tables) * 0.6
+                on_page = page_progress(progress_bar, base_progress, base_progress + 0.6 / total_tables)
+
+                # 前回以降に遅れてコミットされた行も取りこぼさないよう、ウォーターマークから
+                # SYNC_OVERLAP_SECONDS さかのぼって以上（gte）で取得し、復元時は主キーで置き換える
+                filters = (lambda q, column=watermark_column, mark=_sync_since(since): q.gte(column, mark)) if since else None
+                rows = [row for row in iter_table_rows(table_key, filters=filters, parallel=True, on_page=on_page) if row]
+                df, json_columns = backup_frame_from_rows(rows)
+                del rows
+
+                file_name = f"{table_key}.parquet"
+                with archive.open(file_name, 'w', force_zip64=True) as parquet_file:
+                    df.to_parquet(parquet_file, engine='pyarrow', compression=BACKUP_PARQUET_COMPRESSION, index=False)
+
+                table_info = {
+                    'label': table_name,
+                    'file': file_name,
+                    'rows': len(df),
+                    'json_columns': json_columns,
+                    'mode': 'delta' if since else 'full',
+                    'watermark_column': watermark_column,
+                    'since': since,
+                    # 全件のみのテーブルはウォーターマークを残さない（次回も全件）
+                    'watermark': None if full_only else (_backup_watermark(df, watermark_column) or since)
+                }
+                if since:
+                    # 差分では削除された行を検出できないため、現在の主キー一覧を併せて保存
+                    primary_key = TABLE_PRIMARY_KEYS[table_key]
+                    keys_df = pd.DataFrame({primary_key: [row[primary_key] for row in iter_table_rows(table_key, primary_key, parallel=True)]})
+                    table_info['keys_file'] = f"{table_key}.keys.parquet"
+                    with archive.open(table_info['keys_file'], 'w', force_zip64=True) as keys_file:
+                        keys_df.to_parquet(keys_file, engine='pyarrow', compression=BACKUP_PARQUET_COMPRESSION, index=False)
+                    manifest['kind'] = 'delta'
+
+                manifest['tables'][table_key] = table_info
+                total_rows += len(df)
+
+            if manifest['kind'] == 'base':
+                manifest['parent_archive_id'] = None
+            archive.writestr(BACKUP_MANIFEST_NAME, json.dumps(manifest, ensure_ascii=False, indent=2))
+
+        if progress_bar:
+            progress_bar.progress(0.85)
+
+        if total_rows == 0 and manifest['kind'] == 'base':
+            archive_file.close()
+            return None, manifest
+
+        archive_file.seek(0)
+        return archive_file, manifest
+
+    except Exception as e:
+        archive_file.close()
+        st.error(f"バックアップ生成エラー: {str(e)}")
+        return None, None
+
+
+def load_backup_archive(archive_file, tables=None):
+    """Parquetバックアップ（ZIP）を読み込み、(manifest, {テーブル名: DataFrame}) を返す
+
+    JSONB列はJSON文字列からdict/listに戻す。tables を指定した場合はそのテーブルのみ読み込む。
+    差分バックアップの主キー一覧は manifest['tables'][テーブル名]['keys'] に読み込む。
+    """
+    with zipfile.ZipFile(archive_file) as archive:
+        manifest = json.loads(archive.read(BACKUP_MANIFEST_NAME))
+        if manifest.get('format_version', 0) > BACKUP_FORMAT_VERSION:
+            raise ValueError(f"未対応のバックアップ形式です（version {manifest.get('format_version')}）")
+
+        frames = {}
+        for table_key, info in manifest['tables'].items():
+            if tables is not None and table_key not in tables:
+                continue
+            with archive.open(info['file']) as parquet_file:
+                df = pd.read_parquet(parquet_file, engine='pyarrow')
+            for col in info.get('json_columns', []):
+                df[col] = df[col].map(lambda v: json.loads(v) if isinstance(v, str) else None)
+            frames[table_key] = df
+            if info.get('keys_file'):
+                with archive.open(info['keys_file']) as keys_file:
+                    info['keys'] = pd.read_parquet(keys_file, engine='pyarrow').iloc[:, 0]
+    return manifest, frames
+
+
+def merge_backup_chain(archives):
+    """ベース＋差分バックアップを順に適用し、最新時点の {テーブル名: DataFrame} を返す
+
+    Args:
+        archives: load_backup_archive の戻り値 (manifest, frames) のリスト（順不同）
+    """
+    ordered = sorted(archives, key=lambda archive: archive[0]['created_at'])
+    archive_ids = {manifest.get('archive_id') for manifest, _ in ordered}
+    merged = {}
+    for manifest, frames in ordered:
+        parent_id = manifest.get('parent_archive_id')
+        if manifest.get('kind') == 'delta' and parent_id not in archive_ids:
+            raise ValueError(f"差分バックアップ {manifest.get('archive_id')} の前のバックアップ（{parent_id}）がありません")
+
+        for table_key, df in frames.items():
+            info = manifest['tables'][table_key]
+            if info.get('mode') != 'delta':
+                merged[table_key] = df
+                continue
+            if table_key not in merged:
+                raise ValueError(f"{table_key} のベースバックアップがありません")
+
+            # 削除された行を除外し、更新・追加された行で置き換える
+            primary_key = TABLE_PRIMARY_KEYS[table_key]
+            current = merged[table_key]
+            if 'keys' in info:
+                current = current[current[primary_key].isin(info['keys'])]
+            current = current[~current[primary_key].isin(df[primary_key])] if not df.empty else current
+            merged[table_key] = pd.concat([current, df], ignore_index=True).sort_values(primary_key, ignore_index=True)
+    return merged
+
+
+def backup_frame_records(df):
+    """DataFrameをPostgRESTに送れる辞書のリストにする（NULLはNone、NumPy型はPythonの型）"""
+    return json.loads(df.to_json(orient='records', force_ascii=False, date_format='iso'))
+
+
+def restore_backup_frames(frames, progress_bar=None, progress_text=None):
+    """load_backup_archive で読み込んだテーブルを主キーでupsertして復元する
+
+    Returns:
+        {テーブル名: インポート結果（success_count / errors）}
+    """
+    ordered_tables = sorted(
+        frames,
+        key=lambda t: BACKUP_RESTORE_ORDER.index(t) if t in BACKUP_RESTORE_ORDER else len(BACKUP_RESTORE_ORDER)
+    )
+    results = {}
+    for i, table_key in enumerate(ordered_tables):
+        if progress_text:
+            progress_text.text(f"復元中: {table_key} ({i+1}/{len(ordered_tables)})")
+        if progress_bar:
+            progress_bar.progress(i / len(ordered_tables))
+
+        result = _new_import_result()
+        df = frames[table_key].drop(columns=list(BACKUP_GENERATED_COLUMNS.get(table_key, ())), errors='ignore')
+        records = [([row_number], record) for row_number, record in enumerate(backup_frame_records(df), 1)]
+        for row_numbers, data, error in iter_bulk_writes(table_key, records, on_conflict=TABLE_PRIMARY_KEYS.get(table_key)):
+            if error:
+                result['errors'].append(f"{table_key} {row_numbers[0]}〜{row_numbers[-1]}行目: {error}")
+            else:
+                result['success_count'] += len(row_numbers)
+        results[table_key] = result
+
+    invalidate_tables(*ordered_tables)
+    if progress_bar:
+        progress_bar.progress(1.0)
+    return results
+
+
 def show_masters():
     """マスタ管理画面を表示"""
     st.title("⚙️ マスタ管理")
@@ -11034,10 +13524,10 @@ def show_company_master():
                 if submitted:
                     if new_company_name:
                         try:
-                            # 同名の企業が既に存在するかチェック
-                            existing_response = supabase.table('companies').select('company_id').eq('company_name', new_company_name).execute()
-                            if existing_response.data:
-                                st.warning(f"企業名「{new_company_name}」は既に登録されています")
+                            # 同名の企業（法人格の位置・略記、全角半角、空白の違いを含む）が既に存在するかチェック
+                            existing_id = resolve_company_ids([new_company_name], fuzzy=False).get(new_company_name)
+                            if existing_id is not None:
+                                st.warning(f"企業名「{company_canonical_name(existing_id) or new_company_name}」は既に登録されています")
                             else:
                                 insert_response = supabase.table('companies').insert({
                                     'company_name': new_company_name,
@@ -11052,6 +13542,7 @@ def show_company_master():
                                     'ap_ng_reason': new_ap_ng_reason if new_ap_ng_reason else None
                                 }).execute()
                                 if insert_response.data:
+                                    invalidate_tables('companies')
                                     st.success(f"企業「{new_company_name}」を追加しました")
                                     st.session_state.show_new_company_form = False
                                     st.rerun()
@@ -11221,12 +13712,11 @@ def show_company_master():
                         # target_companiesテーブルからemail_searchedを取得
                         current_email_searched = None
                         try:
-                            target_result = supabase.table('target_companies').select('email_searched').eq('company_name', company.get('company_name')).execute()
-                            if target_result.data and len(target_result.data) > 0:
-                                email_searched_str = target_result.data[0].get('email_searched')
-                                if email_searched_str:
-                                    from datetime import datetime
-                                    current_email_searched = datetime.strptime(email_searched_str, '%Y-%m-%d').date()
+                            target_data = fetch_target_company(company.get('company_name'), 'email_searched')
+                            email_searched_str = target_data.get('email_searched') if target_data else None
+                            if email_searched_str:
+                                from datetime import datetime
+                                current_email_searched = datetime.strptime(email_searched_str, '%Y-%m-%d').date()
                         except Exception:
                             pass
                         
@@ -11284,22 +13774,12 @@ def show_company_master():
                                         # target_companiesテーブルでemail_searchedを更新
                                         email_searched_str = new_email_searched.isoformat() if new_email_searched else None
                                         
-                                        # target_companiesにレコードが存在するかチェック
-                                        target_check = supabase.table('target_companies').select('target_company_id').eq('company_name', new_company_name).execute()
-                                        
-                                        if target_check.data:
-                                            # レコードが存在する場合は更新
-                                            supabase.table('target_companies').update({
-                                                'email_searched': email_searched_str
-                                            }).eq('company_name', new_company_name).execute()
-                                        elif email_searched_str:
-                                            # レコードが存在しない場合で日付が設定されている場合は新規作成
-                                            supabase.table('target_companies').insert({
-                                                'company_name': new_company_name,
-                                                'email_searched': email_searched_str
-                                            }).execute()
+                                        # レコードが存在する場合は更新、存在しない場合は日付が設定されている場合のみ新規作成
+                                        if email_searched_str or fetch_target_company(new_company_name, 'target_company_id'):
+                                            save_target_company_fields(new_company_name, {'email_searched': email_searched_str})
                                         
                                         if update_response.data:
+                                            invalidate_tables('companies')
                                             st.success("企業情報を更新しました")
                                             st.session_state.edit_mode_company = False
                                             st.rerun()
@@ -11316,6 +13796,7 @@ def show_company_master():
                                         else:
                                             delete_response = supabase.table('companies').delete().eq('company_id', company.get('company_id')).execute()
                                             if delete_response.data:
+                                                invalidate_tables('companies')
                                                 st.success("企業を削除しました")
                                                 st.session_state.selected_company_id = None
                                                 st.session_state.edit_mode_company = False
@@ -11330,9 +13811,9 @@ def show_company_master():
                         # target_companiesテーブルからemail_searchedを取得
                         email_searched_date = None
                         try:
-                            target_result = supabase.table('target_companies').select('email_searched').eq('company_name', company.get('company_name')).execute()
-                            if target_result.data and len(target_result.data) > 0:
-                                email_searched_date = target_result.data[0].get('email_searched')
+                            target_data = fetch_target_company(company.get('company_name'), 'email_searched')
+                            if target_data:
+                                email_searched_date = target_data.get('email_searched')
                         except Exception:
                             pass
                         
@@ -11514,147 +13995,130 @@ def show_company_email_info(company_id, company_name):
     st.write("**📧 メール関連情報**")
     
     try:
-        # target_companiesテーブルからメール関連データを取得
-        email_result = supabase.table('target_companies').select(
-            'email_search_patterns, confirmed_emails, misdelivery_emails, email_search_memo, email_searched'
-        ).eq('company_name', company_name).execute()
-        
-        if email_result.data and len(email_result.data) > 0:
-            email_data = email_result.data[0]
-            
-            # メール情報があるかチェック
-            has_email_info = any([
-                email_data.get('email_search_patterns'),
-                email_data.get('confirmed_emails'),
-                email_data.get('misdelivery_emails'),
-                email_data.get('email_search_memo'),
-                email_data.get('email_searched')
-            ])
-            
-            if has_email_info:
-                col_info, col_btn = st.columns([4, 1])
-                
-                with col_info:
-                    # メアドサーチ完了日の表示
-                    email_searched = email_data.get('email_searched')
-                    if email_searched:
-                        st.write("📅 **メアドサーチ完了日**")
-                        st.text(f"  {email_searched}")
-                    
-                    # メアドパターンの表示
-                    patterns = email_data.get('email_search_patterns')
-                    if patterns:
-                        st.write("🔍 **メアドパターン**")
-                        if isinstance(patterns, list):
-                            for pattern in patterns[:3]:  # 最大3個まで表示
-                                st.text(f"  • {pattern}")
-                            if len(patterns) > 3:
-                                st.text(f"  ... 他{len(patterns) - 3}件")
-                        else:
-                            st.text(f"  • {patterns}")
-                    
-                    # 実在メアド集の表示
-                    confirmed = email_data.get('confirmed_emails')
-                    if confirmed:
-                        st.write("✅ **実在メアド集**")
-                        if isinstance(confirmed, list):
-                            for email in confirmed[:3]:  # 最大3個まで表示
-                                if isinstance(email, dict):
-                                    email_addr = email.get('email', 'N/A')
-                                    person = email.get('person_name', '')
-                                    if person:
-                                        st.text(f"  • {email_addr} ({person})")
-                                    else:
-                                        st.text(f"  • {email_addr}")
+        snapshot = load_company_email_snapshot(company_id, company_name)
+        email_data = {
+            'email_search_memo': snapshot['email_search_memo'],
+            'email_searched': snapshot['email_searched'],
+            'email_search_patterns': [row['pattern'] for row in snapshot['patterns']],
+            'confirmed_emails': snapshot['confirmed'],
+            'misdelivery_emails': snapshot['misdelivery']
+        }
+        
+        # メール情報があるかチェック
+        has_email_info = any([
+            email_data.get('email_search_patterns'),
+            email_data.get('confirmed_emails'),
+            email_data.get('misdelivery_emails'),
+            email_data.get('email_search_memo'),
+            email_data.get('email_searched')
+        ])
+        
+        if has_email_info:
+            col_info, col_btn = st.columns([4, 1])
+            
+            with col_info:
+                # メアドサーチ完了日の表示
+                email_searched = email_data.get('email_searched')
+                if email_searched:
+                    st.write("📅 **メアドサーチ完了日**")
+                    st.text(f"  {email_searched}")
+                
+                # メアドパターンの表示
+                patterns = email_data.get('email_search_patterns')
+                if patterns:
+                    st.write("🔍 **メアドパターン**")
+                    if isinstance(patterns, list):
+                        for pattern in patterns[:3]:  # 最大3個まで表示
+                            st.text(f"  • {pattern}")
+                        if len(patterns) > 3:
+                            st.text(f"  ... 他{len(patterns) - 3}件")
+                    else:
+                        st.text(f"  • {patterns}")
+                
+                # 実在メアド集の表示
+                confirmed = email_data.get('confirmed_emails')
+                if confirmed:
+                    st.write("✅ **実在メアド集**")
+                    if isinstance(confirmed, list):
+                        for email in confirmed[:3]:  # 最大3個まで表示
+                            if isinstance(email, dict):
+                                email_addr = email.get('email', 'N/A')
+                                person = email.get('name', '')
+                                if person:
+                                    st.text(f"  • {email_addr} ({person})")
                                 else:
-                                    st.text(f"  • {email}")
-                            if len(confirmed) > 3:
-                                st.text(f"  ... 他{len(confirmed) - 3}件")
-                    
-                    # 別人到達履歴の表示
-                    misdelivery = email_data.get('misdelivery_emails')
-                    if misdelivery:
-                        st.write("❌ **別人到達履歴**")
-                        if isinstance(misdelivery, list):
-                            for mis in misdelivery[:2]:  # 最大2個まで表示
-                                if isinstance(mis, dict):
-                                    email_addr = mis.get('email', 'N/A')
-                                    date = mis.get('date', '')
-                                    if date:
-                                        st.text(f"  • {email_addr} ({date})")
-                                    else:
-                                        st.text(f"  • {email_addr}")
+                                    st.text(f"  • {email_addr}")
+                            else:
+                                st.text(f"  • {email}")
+                        if len(confirmed) > 3:
+                            st.text(f"  ... 他{len(confirmed) - 3}件")
+                
+                # 別人到達履歴の表示
+                misdelivery = email_data.get('misdelivery_emails')
+                if misdelivery:
+                    st.write("❌ **別人到達履歴**")
+                    if isinstance(misdelivery, list):
+                        for mis in misdelivery[:2]:  # 最大2個まで表示
+                            if isinstance(mis, dict):
+                                email_addr = mis.get('email', 'N/A')
+                                date = mis.get('sent_date', '')
+                                if date:
+                                    st.text(f"  • {email_addr} ({date})")
                                 else:
-                                    st.text(f"  • {mis}")
-                            if len(misdelivery) > 2:
-                                st.text(f"  ... 他{len(misdelivery) - 2}件")
-                    
-                    # メール検索メモの表示
-                    memo = email_data.get('email_search_memo')
-                    if memo:
-                        st.write("📝 **メール検索メモ**")
-                        # 長いメモは省略表示
-                        if len(memo) > 100:
-                            st.text(f"  {memo[:100]}...")
-                        else:
-                            st.text(f"  {memo}")
-                
-                with col_btn:
-                    st.write("")  # スペーサー
-                    if st.button("✏️ メール管理", key=f"email_manage_{company_id}", help="メール管理システムで詳細編集"):
-                        # マスタ管理からの遷移であることを記録
-                        st.session_state.from_master_management = True
-                        st.session_state.master_company_id = company_id
-                        st.session_state.master_company_name = company_name
-                        # メール管理システムに遷移
-                        st.session_state.selected_page_key = "email_management"
-                        st.session_state.page_radio_index = 4  # メール管理のインデックス
-                        # 直接企業から選択モードに設定
-                        st.session_state.email_selection_method = "直接企業から選択"
-                        st.query_params.update({
-                            "page": "email_management",
-                            "email_company": str(company_id),
-                            "company_name": company_name
-                        })
-                        st.rerun()
-            else:
-                # メール情報がない場合
-                col_info, col_btn = st.columns([4, 1])
-                with col_info:
-                    st.info("メール関連情報はまだ登録されていません")
-                with col_btn:
-                    if st.button("➕ メール管理", key=f"email_add_{company_id}", help="メール管理システムで追加"):
-                        # マスタ管理からの遷移であることを記録
-                        st.session_state.from_master_management = True
-                        st.session_state.master_company_id = company_id
-                        st.session_state.master_company_name = company_name
-                        # メール管理システムに遷移
-                        st.session_state.selected_page_key = "email_management"
-                        st.session_state.page_radio_index = 4  # メール管理のインデックス
-                        # 直接企業から選択モードに設定
-                        st.session_state.email_selection_method = "直接企業から選択"
-                        st.query_params.update({
-                            "page": "email_management",
-                            "email_company": str(company_id),
-                            "company_name": company_name
-                        })
-                        st.rerun()
+                                    st.text(f"  • {email_addr}")
+                            else:
+                                st.text(f"  • {mis}")
+                        if len(misdelivery) > 2:
+                            st.text(f"  ... 他{len(misdelivery) - 2}件")
+                
+                # メール検索メモの表示
+                memo = email_data.get('email_search_memo')
+                if memo:
+                    st.write("📝 **メール検索メモ**")
+                    # 長いメモは省略表示
+                    if len(memo) > 100:
+                        st.text(f"  {memo[:100]}...")
+                    else:
+                        st.text(f"  {memo}")
+            
+            with col_btn:
+                st.write("")  # スペーサー
+                if st.button("✏️ メール管理", key=f"email_manage_{company_id}", help="メール管理システムで詳細編集"):
+                    # マスタ管理からの遷移であることを記録
+                    st.session_state.from_master_management = True
+                    st.session_state.master_company_id = company_id
+                    st.session_state.master_company_name = company_name
+                    # メール管理システムに遷移
+                    st.session_state.selected_page_key = "email_management"
+                    st.session_state.page_radio_index = 4  # メール管理のインデックス
+                    # 直接企業から選択モードに設定
+                    st.session_state.email_selection_method = "直接企業から選択"
+                    st.query_params.update({
+                        "page": "email_management",
+                        "email_company": str(company_id),
+                        "company_name": company_name
+                    })
+                    st.rerun()
         else:
-            # target_companiesテーブルにレコードがない場合
+            # メール情報がない場合
             col_info, col_btn = st.columns([4, 1])
             with col_info:
                 st.info("メール関連情報はまだ登録されていません")
             with col_btn:
-                if st.button("➕ メール管理", key=f"email_create_{company_id}", help="メール管理システムで追加"):
+                if st.button("➕ メール管理", key=f"email_add_{company_id}", help="メール管理システムで追加"):
                     # マスタ管理からの遷移であることを記録
                     st.session_state.from_master_management = True
                     st.session_state.master_company_id = company_id
+                    st.session_state.master_company_name = company_name
                     # メール管理システムに遷移
                     st.session_state.selected_page_key = "email_management"
                     st.session_state.page_radio_index = 4  # メール管理のインデックス
+                    # 直接企業から選択モードに設定
+                    st.session_state.email_selection_method = "直接企業から選択"
                     st.query_params.update({
                         "page": "email_management",
-                        "email_company": str(company_id)
+                        "email_company": str(company_id),
+                        "company_name": company_name
                     })
                     st.rerun()
     
@@ -0,0 +1,106 @@
+-- メール管理（メアドパターン・実在メアド集・別人到達履歴）の子テーブル化
+-- target_companies の JSONB 配列（email_search_patterns / confirmed_emails / misdelivery_emails）を
+-- companies.company_id をキーにした子テーブルへ移行し、1件単位の追加・削除と
+-- メールアドレスでの企業横断検索（email_key のインデックス）を可能にします
+-- 移行後も JSONB カラムは削除しません（動作確認後に不要であれば手動で削除してください）
+
+-- メアドパターン
+CREATE TABLE IF NOT EXISTS company_email_patterns (
+    pattern_id BIGSERIAL PRIMARY KEY,
+    company_id BIGINT NOT NULL REFERENCES companies(company_id) ON DELETE CASCADE,
+    pattern TEXT NOT NULL,
+    created_at TIMESTAMPTZ DEFAULT NOW(),
+    UNIQUE (company_id, pattern)
+);
+
+-- 実在メアド集
+CREATE TABLE IF NOT EXISTS company_confirmed_emails (
+    confirmed_email_id BIGSERIAL PRIMARY KEY,
+    company_id BIGINT NOT NULL REFERENCES companies(company_id) ON DELETE CASCADE,
+    email TEXT NOT NULL,
+    email_key TEXT GENERATED ALWAYS AS (lower(btrim(email))) STORED,
+    name TEXT,
+    department TEXT,
+    position TEXT,
+    confirmation_method TEXT,
+    confirmed_date DATE,
+    created_at TIMESTAMPTZ DEFAULT NOW()
+);
+
+-- 別人到達履歴
+CREATE TABLE IF NOT EXISTS company_misdelivery_emails (
+    misdelivery_id BIGSERIAL PRIMARY KEY,
+    company_id BIGINT NOT NULL REFERENCES companies(company_id) ON DELETE CASCADE,
+    email TEXT NOT NULL,
+    email_key TEXT GENERATED ALWAYS AS (lower(btrim(email))) STORED,
+    sent_date DATE,
+    reason TEXT,
+    memo TEXT,
+    created_at TIMESTAMPTZ DEFAULT NOW()
+);
+
+-- 企業単位の取得・メールアドレスでの企業横断検索用インデックス
+CREATE INDEX IF NOT EXISTS idx_company_confirmed_emails_company ON company_confirmed_emails(company_id);
+CREATE INDEX IF NOT EXISTS idx_company_confirmed_emails_email_key ON company_confirmed_emails(email_key);
+CREATE INDEX IF NOT EXISTS idx_company_misdelivery_emails_company ON company_misdelivery_emails(company_id);
+CREATE INDEX IF NOT EXISTS idx_company_misdelivery_emails_email_key ON company_misdelivery_emails(email_key);
+
+-- 日付文字列（"2024-01-15" / "2024-01-15T..."）を DATE に変換（不正な値は NULL）
+CREATE OR REPLACE FUNCTION safe_email_date(value TEXT)
+RETURNS DATE
+LANGUAGE plpgsql
+IMMUTABLE
+AS $$
+BEGIN
+    RETURN left(value, 10)::DATE;
+EXCEPTION WHEN others THEN
+    RETURN NULL;
+END;
+$$;
+
+-- JSONB 配列からの移行（アプリと同じく company_name で target_companies と companies を対応付け）
+-- 再実行しても重複しないよう、同じ内容の行が既にある場合は追加しない
+INSERT INTO company_email_patterns (company_id, pattern)
+SELECT DISTINCT c.company_id, p.pattern
+FROM target_companies tc
+JOIN companies c ON c.company_name = tc.company_name
+CROSS JOIN LATERAL jsonb_array_elements_text(
+    CASE WHEN jsonb_typeof(tc.email_search_patterns) = 'array' THEN tc.email_search_patterns ELSE '[]'::jsonb END
+) AS p(pattern)
+WHERE btrim(p.pattern) <> ''
+ON CONFLICT (company_id, pattern) DO NOTHING;
+
+INSERT INTO company_confirmed_emails (company_id, email, name, department, position, confirmation_method, confirmed_date)
+SELECT c.company_id, e->>'email', e->>'name', e->>'department', e->>'position',
+       e->>'confirmation_method', safe_email_date(e->>'confirmed_date')
+FROM target_companies tc
+JOIN companies c ON c.company_name = tc.company_name
+CROSS JOIN LATERAL jsonb_array_elements(
+    CASE WHEN jsonb_typeof(tc.confirmed_emails) = 'array' THEN tc.confirmed_emails ELSE '[]'::jsonb END
+) AS e
+WHERE jsonb_typeof(e) = 'object' AND coalesce(btrim(e->>'email'), '') <> ''
+  AND NOT EXISTS (
+      SELECT 1 FROM company_confirmed_emails x
+      WHERE x.company_id = c.company_id AND x.email_key = lower(btrim(e->>'email'))
+  );
+
+INSERT INTO company_misdelivery_emails (company_id, email, sent_date, reason, memo)
+SELECT c.company_id, e->>'email', safe_email_date(e->>'sent_date'), e->>'reason', e->>'memo'
+FROM target_companies tc
+JOIN companies c ON c.company_name = tc.company_name
+CROSS JOIN LATERAL jsonb_array_elements(
+    CASE WHEN jsonb_typeof(tc.misdelivery_emails) = 'array' THEN tc.misdelivery_emails ELSE '[]'::jsonb END
+) AS e
+WHERE jsonb_typeof(e) = 'object' AND coalesce(btrim(e->>'email'), '') <> ''
+  AND NOT EXISTS (
+      SELECT 1 FROM company_misdelivery_emails x
+      WHERE x.company_id = c.company_id AND x.email_key = lower(btrim(e->>'email'))
+        AND x.sent_date IS NOT DISTINCT FROM safe_email_date(e->>'sent_date')
+  );
+
+-- 確認
+SELECT 'company_email_patterns' AS table_name, COUNT(*) FROM company_email_patterns
+UNION ALL
+SELECT 'company_confirmed_emails', COUNT(*) FROM company_confirmed_emails
+UNION ALL
+SELECT 'company_misdelivery_emails', COUNT(*) FROM company_misdelivery_emails;
@@ -0,0 +1,72 @@
+-- コンタクトの年齢を整数の下限・上限（age_min / age_max）として保持する生成カラム
+-- 推定年齢（"30代" / "30代前半" / "35歳" / "30-35"）の解析をDB側で一度だけ行い、
+-- アプリ・人材マッチングRPCでの文字列解析を不要にします
+-- ※ matching_candidates_rpc.sql 実行後に実行してください
+
+-- 推定年齢を {下限, 上限} に変換（解析できない場合は NULL）
+CREATE OR REPLACE FUNCTION estimated_age_bounds(value TEXT)
+RETURNS INTEGER[]
+LANGUAGE plpgsql
+IMMUTABLE
+AS $$
+DECLARE
+    v TEXT := normalize(COALESCE(value, ''), NFKC);
+    m TEXT[];
+BEGIN
+    -- 範囲（30-35 / 30〜35歳）
+    m := regexp_match(v, '^\s*([0-9]{1,3})\s*(?:歳|才)?\s*[-~〜ー]\s*([0-9]{1,3})');
+    IF m IS NOT NULL THEN
+        RETURN ARRAY[LEAST(m[1]::INTEGER, m[2]::INTEGER), GREATEST(m[1]::INTEGER, m[2]::INTEGER)];
+    END IF;
+
+    -- 年代（30代 / 30代前半 / 30代後半）
+    m := regexp_match(v, '^\s*([0-9]{1,3})\s*代\s*(前半|後半)?');
+    IF m IS NOT NULL THEN
+        RETURN CASE m[2]
+            WHEN '前半' THEN ARRAY[m[1]::INTEGER, m[1]::INTEGER + 4]
+            WHEN '後半' THEN ARRAY[m[1]::INTEGER + 5, m[1]::INTEGER + 9]
+            ELSE ARRAY[m[1]::INTEGER, m[1]::INTEGER + 9]
+        END;
+    END IF;
+
+    -- 単一の年齢（35 / 35歳）
+    m := regexp_match(v, '^\s*([0-9]{1,3})\s*(?:歳|才|$)');
+    IF m IS NOT NULL THEN
+        RETURN ARRAY[m[1]::INTEGER, m[1]::INTEGER];
+    END IF;
+
+    RETURN NULL;
+END;
+$$;
+
+-- 実年齢があれば優先し、なければ推定年齢から算出（コンタクト更新時に自動で再計算）
+-- 生年月日からの年齢は日付に依存するためアプリ側で補正します
+ALTER TABLE contacts
+ADD COLUMN IF NOT EXISTS age_min INTEGER GENERATED ALWAYS AS (
+    COALESCE(actual_age, (estimated_age_bounds(estimated_age))[1])
+) STORED;
+
+ALTER TABLE contacts
+ADD COLUMN IF NOT EXISTS age_max INTEGER GENERATED ALWAYS AS (
+    COALESCE(actual_age, (estimated_age_bounds(estimated_age))[2])
+) STORED;
+
+CREATE INDEX IF NOT EXISTS idx_contacts_age_bounds ON contacts(age_min, age_max);
+
+-- 人材マッチング用ビューを生成カラムに切り替え（代表値は下限・上限の中央、不明な場合は30歳）
+CREATE OR REPLACE VIEW matching_candidates AS
+SELECT
+    c.contact_id,
+    c.full_name,
+    c.department_name,
+    c.position_name,
+    COALESCE(co.company_name, tc.company_name, '') AS company_name,
+    COALESCE((c.age_min + c.age_max + 1) / 2, 30) AS match_age
+FROM contacts c
+LEFT JOIN companies co ON co.company_id = c.company_id
+LEFT JOIN target_companies tc ON tc.target_company_id = c.target_company_id;
+
+-- 確認（解析できない推定年齢）
+SELECT contact_id, full_name, estimated_age
+FROM contacts
+WHERE estimated_age IS NOT NULL AND TRIM(estimated_age) <> '' AND age_min IS NULL;
@@ -0,0 +1,33 @@
+-- コンタクト全項目検索用の検索カラムとtrigramインデックス
+-- secrets.toml に CONTACT_SEARCH_BACKEND = "server" を設定すると、
+-- コンタクト一覧（サーバー側検索モード）の全項目検索がこのカラムを使用します
+
+CREATE EXTENSION IF NOT EXISTS pg_trgm;
+
+-- 検索対象カラムを連結・正規化（NFKC + 小文字化）した生成カラム
+ALTER TABLE contacts
+ADD COLUMN IF NOT EXISTS search_text TEXT GENERATED ALWAYS AS (
+    lower(normalize(
+        coalesce(full_name, '') || E'\n' ||
+        coalesce(furigana, '') || E'\n' ||
+        coalesce(department_name, '') || E'\n' ||
+        coalesce(position_name, '') || E'\n' ||
+        coalesce(profile, '') || E'\n' ||
+        coalesce(email_address, '') || E'\n' ||
+        coalesce(screening_status, '') || E'\n' ||
+        coalesce(primary_screening_comment, '') || E'\n' ||
+        coalesce(work_comment, '') || E'\n' ||
+        coalesce(name_search_key, '') || E'\n' ||
+        coalesce(url, ''),
+        NFKC
+    ))
+) STORED;
+
+-- 部分一致（ILIKE '%...%'）をインデックスで処理するためのGIN trigramインデックス
+CREATE INDEX IF NOT EXISTS idx_contacts_search_text_trgm
+ON contacts USING gin (search_text gin_trgm_ops);
+
+-- 確認
+SELECT column_name, data_type, is_generated
+FROM information_schema.columns
+WHERE table_name = 'contacts' AND column_name = 'search_text';
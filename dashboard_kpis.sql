@@ -0,0 +1,112 @@
+-- ダッシュボードKPIの集計（マテリアライズドビュー + RPC）
+-- アプリの「ダッシュボード」は supabase.rpc('get_dashboard_kpis', ...) で集計済みの値のみを取得します
+-- 集計は p_max_age_seconds（既定300秒）より古い場合にRPC呼び出し時に再集計されます
+
+DROP MATERIALIZED VIEW IF EXISTS dashboard_kpi_snapshot;
+
+CREATE MATERIALIZED VIEW dashboard_kpi_snapshot AS
+WITH assignment_totals AS (
+    SELECT
+        COUNT(*) AS total_candidates,
+        COUNT(*) FILTER (WHERE assignment_status = '成約') AS total_contracts
+    FROM project_assignments
+),
+contact_assignments AS (
+    SELECT
+        contact_id,
+        BOOL_OR(assignment_status = '成約') AS has_contract
+    FROM project_assignments
+    GROUP BY contact_id
+),
+project_candidates AS (
+    SELECT p.project_name, COUNT(pa.assignment_id) AS candidates
+    FROM projects p
+    LEFT JOIN project_assignments pa ON pa.project_id = p.project_id
+    GROUP BY p.project_id, p.project_name
+    ORDER BY candidates DESC, p.project_id
+    LIMIT 10
+)
+SELECT
+    1 AS snapshot_id,
+    NOW() AS refreshed_at,
+    jsonb_build_object(
+        'project_count', (SELECT COUNT(*) FROM projects),
+        'status_counts', COALESCE((
+            SELECT jsonb_object_agg(project_status, n)
+            FROM (SELECT project_status, COUNT(*) AS n FROM projects
+                  WHERE project_status IS NOT NULL GROUP BY project_status) s
+        ), '{}'::jsonb),
+        'total_candidates', (SELECT total_candidates FROM assignment_totals),
+        'total_contracts', (SELECT total_contracts FROM assignment_totals),
+        'project_candidates', COALESCE((
+            SELECT jsonb_agg(jsonb_build_object('project_name', project_name, 'candidates', candidates))
+            FROM project_candidates
+        ), '[]'::jsonb),
+        'contact_count', (SELECT COUNT(*) FROM contacts),
+        'screening_counts', COALESCE((
+            SELECT jsonb_object_agg(screening_status, n)
+            FROM (SELECT screening_status, COUNT(*) AS n FROM contacts
+                  WHERE screening_status IS NOT NULL GROUP BY screening_status) s
+        ), '{}'::jsonb),
+        'active_candidates', (
+            SELECT COUNT(*) FROM contact_assignments ca
+            WHERE EXISTS (SELECT 1 FROM contacts c WHERE c.contact_id = ca.contact_id)
+        ),
+        'contracted_candidates', (
+            SELECT COUNT(*) FROM contact_assignments ca
+            WHERE ca.has_contract AND EXISTS (SELECT 1 FROM contacts c WHERE c.contact_id = ca.contact_id)
+        ),
+        'approach_count', (SELECT COUNT(*) FROM contact_approaches),
+        'approached_contacts', (SELECT COUNT(DISTINCT contact_id) FROM contact_approaches),
+        'method_counts', COALESCE((
+            SELECT jsonb_object_agg(method_name, n)
+            FROM (SELECT COALESCE(am.method_name, '未設定') AS method_name, COUNT(*) AS n
+                  FROM contact_approaches ca
+                  LEFT JOIN approach_methods am ON am.method_id = ca.approach_method_id
+                  GROUP BY 1) m
+        ), '{}'::jsonb),
+        'monthly_approaches', COALESCE((
+            SELECT jsonb_object_agg(month, n)
+            FROM (SELECT to_char(date_trunc('month', approach_date), 'YYYY-MM') AS month, COUNT(*) AS n
+                  FROM contact_approaches
+                  WHERE approach_date IS NOT NULL GROUP BY 1) m
+        ), '{}'::jsonb),
+        'co_performance', COALESCE((
+            SELECT jsonb_object_agg(co_manager, n)
+            FROM (SELECT co_manager, COUNT(*) AS n FROM projects
+                  WHERE project_status = 'CLOSED' AND co_manager IS NOT NULL GROUP BY co_manager) s
+        ), '{}'::jsonb),
+        're_performance', COALESCE((
+            SELECT jsonb_object_agg(re_manager, n)
+            FROM (SELECT re_manager, COUNT(*) AS n FROM projects
+                  WHERE project_status = 'CLOSED' AND re_manager IS NOT NULL GROUP BY re_manager) s
+        ), '{}'::jsonb)
+    ) AS kpis;
+
+-- CONCURRENTLY で再集計できるよう一意インデックスを作成
+CREATE UNIQUE INDEX IF NOT EXISTS idx_dashboard_kpi_snapshot_id ON dashboard_kpi_snapshot(snapshot_id);
+
+-- 集計済みKPIを返す（p_max_age_seconds より古ければ再集計してから返す）
+CREATE OR REPLACE FUNCTION get_dashboard_kpis(p_max_age_seconds INTEGER DEFAULT 300)
+RETURNS JSONB
+LANGUAGE plpgsql
+SECURITY DEFINER
+SET search_path = public
+AS $$
+DECLARE
+    last_refreshed TIMESTAMPTZ;
+BEGIN
+    SELECT refreshed_at INTO last_refreshed FROM dashboard_kpi_snapshot;
+    IF last_refreshed IS NULL OR last_refreshed < NOW() - make_interval(secs => p_max_age_seconds) THEN
+        REFRESH MATERIALIZED VIEW CONCURRENTLY dashboard_kpi_snapshot;
+    END IF;
+
+    RETURN (
+        SELECT kpis || jsonb_build_object('refreshed_at', refreshed_at)
+        FROM dashboard_kpi_snapshot
+    );
+END;
+$$;
+
+-- 確認
+SELECT get_dashboard_kpis(0);
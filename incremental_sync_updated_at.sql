@@ -0,0 +1,33 @@
+-- 差分同期（updated_at による増分取得）用の準備
+-- companies / client_companies / projects にも updated_at 自動更新トリガーを追加し、
+-- updated_at での範囲検索用インデックスを作成します
+
+-- updated_at 自動更新トリガー（contacts / target_companies / search_assignees には既存）
+DROP TRIGGER IF EXISTS update_companies_master_updated_at ON companies;
+CREATE TRIGGER update_companies_master_updated_at
+BEFORE UPDATE ON companies
+FOR EACH ROW EXECUTE FUNCTION update_updated_at_column();
+
+DROP TRIGGER IF EXISTS update_client_companies_updated_at ON client_companies;
+CREATE TRIGGER update_client_companies_updated_at
+BEFORE UPDATE ON client_companies
+FOR EACH ROW EXECUTE FUNCTION update_updated_at_column();
+
+DROP TRIGGER IF EXISTS update_projects_updated_at ON projects;
+CREATE TRIGGER update_projects_updated_at
+BEFORE UPDATE ON projects
+FOR EACH ROW EXECUTE FUNCTION update_updated_at_column();
+
+-- updated_at での増分取得用インデックス
+CREATE INDEX IF NOT EXISTS idx_contacts_updated_at ON contacts(updated_at);
+CREATE INDEX IF NOT EXISTS idx_companies_updated_at ON companies(updated_at);
+CREATE INDEX IF NOT EXISTS idx_target_companies_updated_at ON target_companies(updated_at);
+CREATE INDEX IF NOT EXISTS idx_client_companies_updated_at ON client_companies(updated_at);
+CREATE INDEX IF NOT EXISTS idx_projects_updated_at ON projects(updated_at);
+CREATE INDEX IF NOT EXISTS idx_search_assignees_updated_at ON search_assignees(updated_at);
+
+-- 確認
+SELECT event_object_table, trigger_name
+FROM information_schema.triggers
+WHERE trigger_name LIKE 'update_%updated_at'
+ORDER BY event_object_table;
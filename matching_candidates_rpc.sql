@@ -0,0 +1,86 @@
+-- 人材マッチング用の候補者検索（サーバー側フィルター・ページ分割）
+-- アプリの「人材マッチング」ページから supabase.rpc('search_matching_candidates', ...) で呼び出します
+
+-- 推定年齢（"30歳" / "30代" / "30"）を整数に変換
+CREATE OR REPLACE FUNCTION parse_estimated_age(value TEXT)
+RETURNS INTEGER
+LANGUAGE sql
+IMMUTABLE
+AS $$
+    SELECT CASE
+        WHEN value ~ '^\s*[0-9]+\s*歳' THEN substring(value FROM '[0-9]+')::INTEGER
+        WHEN value ~ '^\s*[0-9]+\s*代' THEN substring(value FROM '[0-9]+')::INTEGER + 5
+        WHEN value ~ '^\s*[0-9]+\s*$' THEN trim(value)::INTEGER
+        ELSE NULL
+    END
+$$;
+
+-- 候補者ビュー（企業名の統合・正規化済み年齢）
+-- 年齢が不明な場合は従来どおり30歳として扱う
+CREATE OR REPLACE VIEW matching_candidates AS
+SELECT
+    c.contact_id,
+    c.full_name,
+    c.department_name,
+    c.position_name,
+    COALESCE(co.company_name, tc.company_name, '') AS company_name,
+    COALESCE(c.actual_age, parse_estimated_age(c.estimated_age), 30) AS match_age
+FROM contacts c
+LEFT JOIN companies co ON co.company_id = c.company_id
+LEFT JOIN target_companies tc ON tc.target_company_id = c.target_company_id;
+
+-- 条件に合致する候補者の指定ページと総件数を返す
+-- 登録済み候補者の除外は project_assignments とのアンチジョインで行う
+CREATE OR REPLACE FUNCTION search_matching_candidates(
+    p_project_id BIGINT,
+    p_name TEXT DEFAULT NULL,
+    p_company TEXT DEFAULT NULL,
+    p_department TEXT DEFAULT NULL,
+    p_position TEXT DEFAULT NULL,
+    p_min_age INTEGER DEFAULT NULL,
+    p_max_age INTEGER DEFAULT NULL,
+    p_exclude_assigned BOOLEAN DEFAULT TRUE,
+    p_limit INTEGER DEFAULT 20,
+    p_offset INTEGER DEFAULT 0
+)
+RETURNS TABLE (
+    contact_id BIGINT,
+    full_name TEXT,
+    match_age INTEGER,
+    company_name TEXT,
+    department_name TEXT,
+    position_name TEXT,
+    total_count BIGINT
+)
+LANGUAGE sql
+STABLE
+AS $$
+    SELECT
+        m.contact_id,
+        m.full_name::TEXT,
+        m.match_age,
+        m.company_name::TEXT,
+        m.department_name::TEXT,
+        m.position_name::TEXT,
+        COUNT(*) OVER () AS total_count
+    FROM matching_candidates m
+    WHERE (p_name IS NULL OR strpos(lower(COALESCE(m.full_name, '')), lower(p_name)) > 0)
+      AND (p_company IS NULL OR strpos(lower(m.company_name), lower(p_company)) > 0)
+      AND (p_department IS NULL OR strpos(lower(COALESCE(m.department_name, '')), lower(p_department)) > 0)
+      AND (p_position IS NULL OR strpos(lower(COALESCE(m.position_name, '')), lower(p_position)) > 0)
+      AND (p_min_age IS NULL OR m.match_age >= p_min_age)
+      AND (p_max_age IS NULL OR m.match_age <= p_max_age)
+      AND (NOT p_exclude_assigned OR NOT EXISTS (
+          SELECT 1 FROM project_assignments pa
+          WHERE pa.project_id = p_project_id AND pa.contact_id = m.contact_id
+      ))
+    ORDER BY m.contact_id
+    LIMIT p_limit OFFSET p_offset
+$$;
+
+-- アンチジョイン用インデックス
+CREATE INDEX IF NOT EXISTS idx_project_assignments_project_contact
+ON project_assignments(project_id, contact_id);
+
+-- 確認
+SELECT * FROM search_matching_candidates(1, p_limit => 5);